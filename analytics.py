@@ -0,0 +1,310 @@
+import argparse
+import json
+import sys
+import time
+
+import numpy as np
+
+from bidtable import BIDS, BID_CONFIDENCE, load_array
+from bitboard import HONORS, LANE, LANE_STRENGTH
+from dealing import BATCH, FairDeal, RiggedDeal, iter_deals
+
+# Batch analytics over deal corpora. A corpus is an (N, 4) uint64 array of
+# hand masks saved as .npy, one row per deal with column 0 the first seat to
+# bid (the dealer's left), so position effects line up across deals. Corpora
+# are opened memory-mapped and analysed in BATCH-row slices, so a corpus much
+# larger than RAM streams through without being copied.
+#
+# Everything below works on whole arrays: suit lengths, honors, hand
+# strength (hand_strength's weights), shapes, and the default bots' auction
+# (targets, winner, contract and trump, as engine.bot_bid/bot_trump decide
+# them), with the bid table's view of the declarer's chances. Run e.g.
+#
+#   python analytics.py make rigged.npy --deals 10000000 --policy rigged
+#   python analytics.py stats rigged.npy fair.npy
+
+POLICIES = {'fair': FairDeal, 'rigged': RiggedDeal}
+SHIFTS = np.array([0, 13, 26, 39], dtype=np.uint64)
+LANE_STRENGTHS = np.asarray(LANE_STRENGTH, dtype=np.int32)
+SIDE_SUITS = np.array([[1, 2, 3], [0, 2, 3], [0, 1, 3], [0, 1, 2]])
+LANE_POINTS = np.array([4 * (l >> 12 & 1) + 3 * (l >> 11 & 1) + 2 * (l >> 10 & 1) + (l >> 9 & 1)
+                        for l in range(1 << 13)], dtype=np.int8)  # A=4 K=3 Q=2 J=1
+
+# --- Corpora ---
+def write_corpus(path, policy, total, seed=None, progress=None):
+    # Deals `total` hands from a deal policy straight into a memory-mapped file
+    out = np.lib.format.open_memmap(path, mode='w+', dtype=np.uint64, shape=(total, 4))
+    at = 0
+    for hands in iter_deals(policy, total, seed):
+        out[at:at + len(hands)] = hands
+        at += len(hands)
+        if progress: progress(at)
+    out.flush()
+    return out
+
+def log_corpus(path, log_path):
+    # The deals of a game log (replay.py), rotated so the first bidder is
+    # column 0. Logs only hold played rounds, so no deal in them is all-pass
+    from replay import read_records, record_offsets
+    out = np.lib.format.open_memmap(path, mode='w+', dtype=np.uint64,
+                                    shape=(len(record_offsets(log_path)), 4))
+    for i, r in enumerate(read_records(log_path)):
+        first = (r.dealer + 1) % 4
+        out[i] = r.hands[first:] + r.hands[:first]
+    out.flush()
+    return out
+
+def open_corpus(path):
+    corpus = np.load(path, mmap_mode='r')
+    if corpus.dtype != np.uint64 or corpus.ndim != 2 or corpus.shape[1] != 4:
+        raise ValueError(f"{path}: not a deal corpus ({corpus.dtype}, shape {corpus.shape})")
+    return corpus
+
+def chunks(corpus, size=BATCH):
+    for at in range(0, len(corpus), size):
+        yield corpus[at:at + size]
+
+# --- Per hand; masks of any shape, results gain a trailing suit axis ---
+def lanes(masks):
+    m = np.asarray(masks, dtype=np.uint64)[..., None]
+    return ((m >> SHIFTS) & np.uint64(LANE)).astype(np.intp)
+
+# numpy reduces a 4-long axis slowly, so the suit axis is folded by hand
+def suit_sum(x):
+    return x[..., 0] + x[..., 1] + x[..., 2] + x[..., 3]
+
+def suit_max(x):
+    return np.maximum(np.maximum(x[..., 0], x[..., 1]), np.maximum(x[..., 2], x[..., 3]))
+
+def suit_lengths(masks):
+    return np.bitwise_count(lanes(masks)).astype(np.int8)
+
+def honor_counts(masks):
+    # J, Q, K, A per suit
+    return np.bitwise_count(lanes(masks) & HONORS).astype(np.int8)
+
+def high_card_points(masks):
+    return suit_sum(LANE_POINTS[lanes(masks)])
+
+def hand_strengths(masks):
+    # bitboard.hand_strength, the key the rigged deal ranks hands by
+    return suit_sum(LANE_STRENGTHS[lanes(masks)])
+
+def shape_codes(lengths):
+    # Suit lengths longest first as one int (4-4-3-2 -> ((4*14+4)*14+3)*14+2)
+    s = -np.sort(-lengths.astype(np.int32), axis=-1)
+    return ((s[..., 0] * 14 + s[..., 1]) * 14 + s[..., 2]) * 14 + s[..., 3]
+
+def shape_name(code):
+    return "-".join(str(code // 14 ** k % 14) for k in (3, 2, 1, 0))
+
+# --- The default bots' auction ---
+_table = None
+
+def bid_array():
+    # (raw (CELLS, 8) table, highest contract each cell bids or 0), or None
+    # without a table (heuristic bids)
+    global _table
+    if _table is None:
+        table = load_array()
+        if table is None:
+            _table = False
+        else:
+            made = table[:, 1:] / 255 >= BID_CONFIDENCE
+            top = len(BIDS) - 1 - made[:, ::-1].argmax(axis=1)
+            _table = table, np.where(made.any(axis=1), BIDS.start + top, 0)
+    return _table or None
+
+def cell_indices(masks):
+    # (..., 4) bid-table cells, one per trump suit, as bidtable.cell_index
+    l = lanes(masks)
+    lengths = np.bitwise_count(l)
+    honors = np.bitwise_count(l & HONORS)
+    aces = l >> 12
+    side_aces = suit_sum(aces)[..., None] - aces
+    short = np.minimum(lengths[..., SIDE_SUITS].min(axis=-1), 3)
+    return ((lengths * 5 + honors) * 4 + side_aces) * 4 + short
+
+def bot_targets(masks):
+    # The contract each hand bids up to: engine.bot_bid's target
+    tables = bid_array()
+    if tables is None:
+        l = lanes(masks)
+        score = suit_max(np.bitwise_count(l) + np.bitwise_count(l & HONORS))
+        return np.select([score >= 9, score >= 8, score >= 6], [9, 8, 7], 0)
+    return suit_max(tables[1][cell_indices(masks)])
+
+def bot_trumps(masks):
+    # engine.bot_trump: most expected tricks, else the longest suit
+    tables = bid_array()
+    if tables is None:
+        return suit_lengths(masks).argmax(axis=-1)
+    return tables[0][cell_indices(masks), 0].argmax(axis=-1)
+
+def auction(hands):
+    # (winner column, contract) of the default bots' auction for (N, 4)
+    # deals, column 0 bidding first; winner is -1 when all four pass. A bot
+    # raises straight to its target when that beats the bid so far and
+    # passes otherwise, so the first seat with the highest target wins it
+    targets = bot_targets(hands)
+    contract = targets.max(axis=1)
+    return np.where(contract > 6, targets.argmax(axis=1), -1), contract
+
+def declarer_outlook(hands, winner, contract):
+    # (expected tricks, chance of making the contract) for the declaring
+    # team by the bid table, in the trump the declarer names; NaN without a
+    # table or a declarer
+    n = len(hands)
+    tables = bid_array()
+    if tables is None:
+        return np.full(n, np.nan), np.full(n, np.nan)
+    table = tables[0]
+    rows = np.arange(n)
+    hand = hands[rows, np.maximum(winner, 0)]
+    cells = cell_indices(hand)[rows, bot_trumps(hand)]
+    expected = table[cells, 0] / 16
+    make = table[cells, 1 + np.clip(contract - BIDS.start, 0, len(BIDS) - 1)] / 255
+    none = winner < 0
+    expected[none] = np.nan
+    make[none] = np.nan
+    return expected, make
+
+# --- Streaming summary ---
+def analyze(corpus, size=BATCH):
+    # One pass over the corpus; returns plain numbers (JSON-ready)
+    n = 0
+    strength = np.zeros(4)
+    strength_sq = np.zeros(4)
+    points = np.zeros(4)
+    honors = np.zeros(4)
+    strongest = np.zeros(4, dtype=np.int64)
+    lengths = np.zeros(14, dtype=np.int64)
+    shapes = {}
+    wins = np.zeros(5, dtype=np.int64)      # all pass, then column 0..3
+    contracts = np.zeros(14, dtype=np.int64)
+    expected = np.zeros(4)
+    made = np.zeros(4)
+    for hands in chunks(corpus, size):
+        n += len(hands)
+        s = hand_strengths(hands)
+        strength += s.sum(axis=0)
+        strength_sq += (s.astype(np.float64) ** 2).sum(axis=0)
+        strongest += np.bincount(s.argmax(axis=1), minlength=4)
+        points += high_card_points(hands).sum(axis=0)
+        honors += honor_counts(hands).sum(axis=(0, 2))
+        l = suit_lengths(hands)
+        lengths += np.bincount(l.ravel(), minlength=14)
+        codes, counts = np.unique(shape_codes(l), return_counts=True)
+        for c, k in zip(codes.tolist(), counts.tolist()):
+            shapes[c] = shapes.get(c, 0) + k
+        winner, contract = auction(hands)
+        wins += np.bincount(winner + 1, minlength=5)
+        contracts += np.bincount(contract[winner >= 0], minlength=14)
+        e, m = declarer_outlook(hands, winner, contract)
+        bid = winner >= 0
+        expected += np.bincount(winner[bid], weights=e[bid], minlength=4)
+        made += np.bincount(winner[bid], weights=m[bid], minlength=4)
+
+    mean = strength / max(n, 1)
+    declared = np.maximum(wins[1:], 1)
+    top = sorted(shapes.items(), key=lambda kv: -kv[1])
+    return {
+        'deals': n,
+        'strength_mean': mean.tolist(),
+        'strength_std': np.sqrt(np.maximum(strength_sq / max(n, 1) - mean ** 2, 0)).tolist(),
+        'strongest_hand': (strongest / max(n, 1)).tolist(),
+        'points_mean': (points / max(n, 1)).tolist(),
+        'honors_mean': (honors / max(n, 1)).tolist(),
+        'suit_lengths': (lengths / max(lengths.sum(), 1)).tolist(),
+        'shapes': {shape_name(c): k / max(4 * n, 1) for c, k in top},
+        'all_pass': wins[0] / max(n, 1),
+        'bid_won': (wins[1:] / max(n, 1)).tolist(),
+        'contracts': {str(b): contracts[b] / max(n - wins[0], 1) for b in BIDS},
+        'declarer_tricks': (expected / declared).tolist(),
+        'declarer_makes': (made / declared).tolist(),
+        'bid_table': bid_array() is not None,
+    }
+
+def report(name, r, top_shapes=8):
+    cols = ''.join(f"{'seat +' + str(i):>10}" for i in range(4))
+    row = lambda label, v, f: f"  {label:22}" + ''.join(format(x, f).rjust(10) for x in v)
+    lines = [f"{name}: {r['deals']} deals (by position from the first bidder)",
+             f"  {'':22}{cols}",
+             row('strength mean', r['strength_mean'], '.1f'),
+             row('strength std', r['strength_std'], '.1f'),
+             row('holds strongest hand', r['strongest_hand'], '.3f'),
+             row('points (A4 K3 Q2 J1)', r['points_mean'], '.2f'),
+             row('honors (J-A)', r['honors_mean'], '.2f'),
+             row('wins the bid', r['bid_won'], '.3f')]
+    if r['bid_table']:
+        lines += [row('declarer exp. tricks', r['declarer_tricks'], '.2f'),
+                  row('declarer makes', r['declarer_makes'], '.3f')]
+    lines.append(f"  all pass (redeal): {r['all_pass']:.3f}; contracts: "
+                 + ", ".join(f"{b} {p:.3f}" for b, p in r['contracts'].items() if p >= 0.0005))
+    lines.append("  suit lengths: " + ", ".join(f"{k} {p:.3f}" for k, p in enumerate(r['suit_lengths']) if p >= 0.0005))
+    lines.append("  shapes: " + ", ".join(f"{s} {p:.3f}" for s, p in list(r['shapes'].items())[:top_shapes]))
+    return "\n".join(lines)
+
+def validate(n=20000, seed=0):
+    # Cross-checks the batch functions against the scalar rules and engine
+    import random
+    from bitboard import hand_strength
+    from engine import TarneebEngine, STATE_BIDDING, bot_bid, bot_trump
+    hands = RiggedDeal().deal_batch(np.random.default_rng(seed), n)
+    s = hand_strengths(hands)
+    targets = bot_targets(hands)
+    trumps = bot_trumps(hands)
+    winner, contract = auction(hands)
+    engine = TarneebEngine(random.Random(seed).getrandbits(32))
+    for i in range(n):
+        row = [int(h) for h in hands[i]]
+        for c in range(4):
+            if hand_strength(row[c]) != s[i, c] or bot_bid(row[c], 6) != targets[i, c] \
+                    or bot_trump(row[c]) != trumps[i, c]:
+                raise AssertionError(f"Deal {i} seat {c}: hand mismatch")
+        engine.set_deal(row, 3)  # seat 0 bids first
+        while engine.state == STATE_BIDDING and not all(engine.passed):
+            engine.step()
+        won = engine.bid_winner if engine.state != STATE_BIDDING else -1
+        if won != winner[i] or (won >= 0 and engine.highest_bid != contract[i]):
+            raise AssertionError(f"Deal {i}: auction {won}/{engine.highest_bid}, batch {winner[i]}/{contract[i]}")
+    return n
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Deal corpora and batch hand analytics")
+    sub = parser.add_subparsers(dest='cmd', required=True)
+    make = sub.add_parser('make', help="deal a corpus from a deal policy")
+    make.add_argument('path')
+    make.add_argument('--deals', type=int, default=1000000)
+    make.add_argument('--policy', choices=POLICIES, default='rigged')
+    make.add_argument('--seed', type=int, default=0)
+    log = sub.add_parser('log', help="build a corpus from a game log")
+    log.add_argument('path')
+    log.add_argument('log')
+    stats = sub.add_parser('stats', help="summarize one or more corpora")
+    stats.add_argument('paths', nargs='+')
+    stats.add_argument('--json', help="also write the summaries to this file")
+    sub.add_parser('validate', help="check the batch functions against the engine")
+    args = parser.parse_args()
+
+    t0 = time.perf_counter()
+    if args.cmd == 'make':
+        corpus = write_corpus(args.path, POLICIES[args.policy](), args.deals, args.seed,
+                              lambda k: print(f"\r{k} deals", end='', file=sys.stderr))
+        print(f"\n{len(corpus)} {args.policy} deals -> {args.path} in {time.perf_counter() - t0:.1f}s")
+    elif args.cmd == 'log':
+        corpus = log_corpus(args.path, args.log)
+        print(f"{len(corpus)} deals from {args.log} -> {args.path}")
+    elif args.cmd == 'stats':
+        results = {}
+        for path in args.paths:
+            results[path] = analyze(open_corpus(path))
+            print(report(path, results[path]))
+        dt = time.perf_counter() - t0
+        total = sum(r['deals'] for r in results.values())
+        print(f"{total} deals in {dt:.1f}s ({total / dt / 1e6:.2f}M deals/s)")
+        if args.json:
+            with open(args.json, 'w') as f:
+                json.dump(results, f, indent=2)
+    else:
+        print(f"validated {validate()} deals against the engine")
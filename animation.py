@@ -0,0 +1,96 @@
+import numpy as np
+
+# Time-based tweening for many sprites at once. Start points, targets and
+# current positions live in (N, 2) float arrays indexed by slot; step(dt)
+# advances every active slot in one vectorized pass. Progress is elapsed time
+# over duration, so motion looks the same at any frame rate.
+
+def linear(t):
+    return t
+
+def ease_out_cubic(t):
+    return 1 - (1 - t) ** 3
+
+def ease_in_out_cubic(t):
+    return np.where(t < 0.5, 4 * t ** 3, 1 - (2 - 2 * t) ** 3 / 2)
+
+def ease_out_back(t, s=1.2):
+    # Overshoots the target slightly before settling
+    u = t - 1
+    return 1 + (s + 1) * u ** 3 + s * u ** 2
+
+EASINGS = [linear, ease_out_cubic, ease_in_out_cubic, ease_out_back]
+EASE = {'linear': 0, 'out_cubic': 1, 'in_out_cubic': 2, 'out_back': 3}
+
+class Animator:
+    def __init__(self, slots):
+        self.pos = np.zeros((slots, 2))
+        self.start = np.zeros((slots, 2))
+        self.target = np.zeros((slots, 2))
+        self.elapsed = np.zeros(slots)
+        self.duration = np.ones(slots)
+        self.ease = np.zeros(slots, dtype=np.int8)
+        self.active = np.zeros(slots, dtype=bool)
+        self.moving = False
+        self.groups = []  # (slots, callback) waiting for all slots to land
+
+    def place(self, slot, x, y):
+        # Jumps without animating, stopping any motion of the slot
+        self.pos[slot] = self.target[slot] = x, y
+        self.active[slot] = False
+
+    def move(self, slots, targets, duration, ease='out_cubic', on_done=None):
+        # Tweens slots from where they are now to targets over duration ms.
+        # on_done() fires once every slot in this call has arrived; a slot
+        # moved again before then delays it until the new motion ends.
+        slots = np.atleast_1d(np.asarray(slots, dtype=np.intp))
+        self.start[slots] = self.pos[slots]
+        self.target[slots] = targets
+        self.elapsed[slots] = 0
+        self.duration[slots] = max(duration, 1e-3)
+        self.ease[slots] = EASE[ease]
+        self.active[slots] = True
+        self.moving = True
+        if on_done is not None:
+            self.groups.append((slots, on_done))
+
+    def cancel(self):
+        # Freezes everything in place and drops pending callbacks
+        self.active[:] = False
+        self.moving = False
+        self.groups = []
+
+    def step(self, dt):
+        # Advances all motion by dt ms, then fires callbacks of finished
+        # groups. Returns True while anything is still moving.
+        if self.moving:
+            idx = np.flatnonzero(self.active)
+            self.moving = idx.size > 0  # place() may have stopped every slot
+        if self.moving:
+            self.elapsed[idx] += dt
+            t = np.minimum(self.elapsed[idx] / self.duration[idx], 1.0)
+            ease = self.ease[idx]
+            first = ease[0]
+            if (ease == first).all():
+                k = EASINGS[first](t)
+            else:
+                k = np.empty_like(t)
+                for e in np.unique(ease):
+                    m = ease == e
+                    k[m] = EASINGS[e](t[m])
+            start = self.start[idx]
+            self.pos[idx] = start + (self.target[idx] - start) * k[:, None]
+            done = t >= 1.0
+            self.pos[idx[done]] = self.target[idx[done]]
+            self.active[idx] = ~done
+            self.moving = not done.all()
+
+        if self.groups:
+            pending, finished = [], []
+            for g in self.groups:
+                (pending if self.active[g[0]].any() else finished).append(g)
+            self.groups = pending
+            # Callbacks may start new motion
+            for _, on_done in finished:
+                on_done()
+        return self.moving
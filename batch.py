@@ -0,0 +1,86 @@
+import sys
+import time
+
+import numpy as np
+
+from bitboard import SUITS, make_card
+from engine import trick_winner
+
+# Vectorized trick resolution for simulation farms: resolves N tricks in one
+# call instead of walking them one at a time in Python.
+#
+# Column j of each row holds the j-th card played, i.e. by seat
+# (leader + j) % 4. Suits are indices into SUITS; a trump of -1 means no trump.
+
+NO_TRUMP = -1
+
+def resolve_tricks(ranks, suits, leaders, trumps):
+    # Returns (winner seats, winning column) as int arrays of shape (N,)
+    ranks = np.asarray(ranks)
+    suits = np.asarray(suits)
+    trumps = np.asarray(trumps).reshape(-1, 1)
+    lead_suit = suits[:, :1]
+
+    # Same ordering as get_trick_winner: any trump beats any non-trump, then
+    # rank decides; off-suit discards can never win
+    key = np.where(suits == trumps, ranks + 16, np.where(suits == lead_suit, ranks, 0))
+    col = key.argmax(axis=1)
+    winners = (np.asarray(leaders) + col) % 4
+    return winners, col
+
+def resolve_tricks_full(ranks, suits, leaders, trumps):
+    # Like resolve_tricks but also returns the winning cards' ranks and suits
+    winners, col = resolve_tricks(ranks, suits, leaders, trumps)
+    rows = np.arange(len(col))
+    return winners, np.asarray(ranks)[rows, col], np.asarray(suits)[rows, col]
+
+def resolve_codes(cards, leaders, trumps):
+    # Same as resolve_tricks for bitboard card codes (suit * 13 + rank - 2)
+    cards = np.asarray(cards)
+    return resolve_tricks(cards % 13 + 2, cards // 13, leaders, trumps)
+
+def random_tricks(n, seed=0):
+    # Random legal-looking tricks: four distinct cards each, random leader/trump
+    rng = np.random.default_rng(seed)
+    cards = rng.random((n, 52)).argsort(axis=1)[:, :4]
+    leaders = rng.integers(0, 4, n)
+    trumps = rng.integers(-1, 4, n)
+    return cards, leaders, trumps
+
+def validate(n=100000, seed=0):
+    # Cross-checks the batch resolver against the scalar engine rules
+    cards, leaders, trumps = random_tricks(n, seed)
+    winners, col = resolve_codes(cards, leaders, trumps)
+    for i in range(n):
+        lead = int(leaders[i])
+        trick = [((lead + j) % 4, int(cards[i, j])) for j in range(4)]
+        trump = int(trumps[i])
+        seat, card = trick_winner(trick, None if trump == NO_TRUMP else trump)
+        if seat != winners[i] or card != cards[i, col[i]]:
+            raise AssertionError(f"Trick {i} mismatch: {trick} trump={trump}")
+    return n
+
+def validate_game_rules(n=20000, seed=0):
+    # Cross-checks against TarneebGame.get_trick_winner itself (needs pygame)
+    from tarneeb import Card, TarneebGame
+    cards, leaders, trumps = random_tricks(n, seed)
+    trumps = np.where(trumps == NO_TRUMP, 0, trumps)
+    winners, col = resolve_codes(cards, leaders, trumps)
+    game = TarneebGame.__new__(TarneebGame)
+    for i in range(n):
+        game.trump_suit = SUITS[trumps[i]]
+        trick = [((int(leaders[i]) + j) % 4, Card(int(c) % 13 + 2, SUITS[int(c) // 13]))
+                 for j, c in enumerate(cards[i])]
+        seat, card = game.get_trick_winner(trick)
+        if seat != winners[i] or make_card(card.rank, SUITS.index(card.suit)) != cards[i, col[i]]:
+            raise AssertionError(f"Trick {i} mismatch against TarneebGame")
+    return n
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    print(f"validated {validate(100000)} tricks against the scalar rules")
+    cards, leaders, trumps = random_tricks(n, 1)
+    t0 = time.perf_counter()
+    resolve_codes(cards, leaders, trumps)
+    dt = time.perf_counter() - t0
+    print(f"{n} tricks in {dt:.3f}s ({n/dt/1e6:.1f}M tricks/s)")
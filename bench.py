@@ -0,0 +1,448 @@
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+
+# Benchmarks for the engine, bots and rendering hot paths. Every benchmark
+# builds its fixtures from a fixed seed, so runs compare like with like.
+#
+#   python bench.py                       run everything, print a table
+#   python bench.py --json out.json       also write machine-readable results
+#   python bench.py --compare base.json   flag benchmarks slower than base
+#
+# Rendering runs under SDL's dummy video driver; no window is opened.
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+os.environ.setdefault('PYGAME_HIDE_SUPPORT_PROMPT', '1')
+
+SEED = 1234
+POSITIONS = 500      # fixture positions for per-decision benchmarks
+MIN_TIME = 0.2       # seconds per timing run
+RUNS = 5
+THRESHOLD = 0.15     # default slowdown that counts as a regression
+
+BENCHMARKS = {}
+
+def bench(name):
+    # Registers setup(seed) -> (fn, ops): fn() does `ops` operations
+    def register(setup):
+        BENCHMARKS[name] = setup
+        return setup
+    return register
+
+_game = None
+
+def ui_game():
+    # One seeded TarneebGame shared by the UI benchmarks
+    global _game
+    if _game is None:
+        import tarneeb
+        _game = tarneeb.TarneebGame(seed=SEED)
+    return _game
+
+def engine_positions(seed, count=POSITIONS):
+    # (hand, trick, trump, seat, HandKnowledge) for successive decisions of
+    # seeded bot games
+    from engine import TarneebEngine, STATE_PLAYING
+    from knowledge import HandKnowledge
+    engine = TarneebEngine(seed)
+    out = []
+    while len(out) < count:
+        while engine.state != STATE_PLAYING:
+            engine.step()
+        while engine.state == STATE_PLAYING and len(out) < count:
+            seat = engine.turn_idx
+            out.append((engine.hands[seat], list(engine.current_trick), engine.trump_suit, seat,
+                        HandKnowledge.from_engine(engine, seat)))
+            engine.step()
+        engine.next_round()
+    return out
+
+def ui_positions(seed):
+    # engine_positions as UI objects: (Player, trick of Cards, trump symbol,
+    # HandKnowledge)
+    from tarneeb import CARDS, Player, SUITS
+    from bitboard import cards_of
+    out = []
+    for hand, trick, trump, seat, k in engine_positions(seed):
+        p = Player("Bench", seat)
+        p.set_hand([CARDS[c] for c in cards_of(hand)])
+        out.append((p, [(s, CARDS[c]) for s, c in trick], SUITS[trump], k))
+    return out
+
+# --- Deals ---
+@bench('deal.reset_round')
+def _(seed):
+    game = ui_game()
+    game.rng.seed(seed)
+    return game.reset_round, 1
+
+@bench('deal.rigged')
+def _(seed):
+    from dealing import RiggedDeal
+    policy, rng = RiggedDeal(), random.Random(seed)
+    return lambda: policy.deal(rng), 1
+
+@bench('deal.batch_rigged')
+def _(seed):
+    import numpy as np
+    from dealing import RiggedDeal
+    policy, gen = RiggedDeal(), np.random.default_rng(seed)
+    return lambda: policy.deal_batch(gen, 10000), 10000
+
+@bench('deal.analyze')
+def _(seed):
+    import numpy as np
+    from analytics import analyze
+    from dealing import RiggedDeal
+    hands = RiggedDeal().deal_batch(np.random.default_rng(seed), 50000)
+    return lambda: analyze(hands), len(hands)
+
+# --- Rules ---
+@bench('rules.get_valid_moves')
+def _(seed):
+    game = ui_game()
+    cases = [(p, trick[0][1].suit if trick else None) for p, trick, _, _ in ui_positions(seed)]
+    def run():
+        for p, lead in cases:
+            game.get_valid_moves(p, lead)
+    return run, len(cases)
+
+@bench('rules.get_trick_winner')
+def _(seed):
+    from tarneeb import CARDS, SUITS
+    from batch import random_tricks
+    game = ui_game()
+    cards, leaders, trumps = random_tricks(POSITIONS, seed)
+    cases = [([((int(l) + j) % 4, CARDS[int(c)]) for j, c in enumerate(row)], SUITS[int(t) % 4])
+             for row, l, t in zip(cards, leaders, trumps)]
+    def run():
+        for trick, trump in cases:
+            game.trump_suit = trump
+            game.get_trick_winner(trick)
+    return run, len(cases)
+
+@bench('rules.evaluate_trick')
+def _(seed):
+    from tarneeb import CARDS, SUITS
+    from batch import random_tricks
+    game = ui_game()
+    game.rng.seed(seed)
+    game.reset_round()  # dealt hands, so no trick ends the round
+    cards, leaders, trumps = random_tricks(POSITIONS, seed)
+    cases = [([((int(l) + j) % 4, CARDS[int(c)]) for j, c in enumerate(row)], SUITS[int(t) % 4])
+             for row, l, t in zip(cards, leaders, trumps)]
+    def run():
+        for trick, trump in cases:
+            game.trump_suit = trump
+            game.current_trick = trick
+            game.evaluate_trick()
+        for p in game.players:
+            p.tricks_won = 0
+    return run, len(cases)
+
+@bench('rules.batch_resolve')
+def _(seed):
+    from batch import random_tricks, resolve_codes
+    cards, leaders, trumps = random_tricks(100000, seed)
+    return lambda: resolve_codes(cards, leaders, trumps), 100000
+
+# --- Bots ---
+@bench('bot.make_bid')
+def _(seed):
+    from tarneeb import CARDS, Player
+    from dealing import RiggedDeal
+    from bitboard import cards_of
+    game = ui_game()
+    rng = random.Random(seed)
+    players = []
+    for i in range(POSITIONS // 4):
+        for seat, hand in enumerate(RiggedDeal().deal(rng)):
+            p = Player("Bench", seat)
+            p.set_hand([CARDS[c] for c in cards_of(hand)])
+            players.append(p)
+    def run():
+        game.highest_bid = 6
+        for p in players:
+            game.bot_make_bid(p)
+    return run, len(players)
+
+@bench('bot.play_card')
+def _(seed):
+    game = ui_game()
+    cases = ui_positions(seed)
+    game.knowledge = [None] * 4
+    def run():
+        for p, trick, trump, k in cases:
+            game.current_trick = trick
+            game.trump_suit = trump
+            game.knowledge[p.id] = k
+            game.bot_play_card(p)
+    return run, len(cases)
+
+@bench('bot.engine_play')
+def _(seed):
+    from engine import bot_play
+    cases = engine_positions(seed)
+    def run():
+        for hand, trick, trump, seat, _ in cases:
+            bot_play(hand, trick, trump, seat)
+    return run, len(cases)
+
+@bench('bot.knowledge')
+def _(seed):
+    # Building a seat's view and the card-counting queries on it
+    cases = [k for *_, k in engine_positions(seed)]
+    def run():
+        for k in cases:
+            for s in range(4):
+                k.boss(s)
+            k.trumps_out()
+            k.partner_winning()
+    return run, len(cases)
+
+@bench('bot.counting_play')
+def _(seed):
+    from engine import TarneebEngine, STATE_PLAYING
+    from policies import CountingPolicy
+    policy, engine = CountingPolicy(), TarneebEngine(seed)
+    snapshots = []
+    while len(snapshots) < POSITIONS:
+        while engine.state != STATE_PLAYING:
+            engine.step()
+        while engine.state == STATE_PLAYING and len(snapshots) < POSITIONS:
+            snapshots.append(engine.copy())
+            engine.step()
+        engine.next_round()
+    def run():
+        for e in snapshots:
+            policy.play(e, e.turn_idx)
+    return run, len(snapshots)
+
+@bench('bot.ismcts_iteration')
+def _(seed):
+    # Card play search iterations on fresh trees, first trick of bot games
+    from engine import TarneebEngine, STATE_PLAYING
+    from ismcts import PlaySearch, Tree
+    rng = random.Random(seed)
+    engines = []
+    for i in range(8):
+        e = TarneebEngine(seed + i)
+        while e.state != STATE_PLAYING:
+            e.step()
+        engines.append(e)
+    def run():
+        for e in engines:
+            search = PlaySearch(Tree(), e, e.turn_idx, rng)
+            search.run(search.iterate, iterations=50)
+    return run, 50 * len(engines)
+
+def learned_cases(seed):
+    # Observations of seeded bot games and an untrained network for them
+    import numpy as np
+    from engine import TarneebEngine, STATE_PLAYING
+    from learned import Evaluator, init_weights, play_observation
+    rng = np.random.default_rng(seed)
+    model = Evaluator({kind: init_weights(kind, 128, rng) for kind in ('play', 'bid')})
+    engine = TarneebEngine(seed)
+    rows = []
+    while len(rows) < POSITIONS:
+        while engine.state != STATE_PLAYING:
+            engine.step()
+        while engine.state == STATE_PLAYING and len(rows) < POSITIONS:
+            rows.append(play_observation(engine, engine.turn_idx))
+            engine.step()
+        engine.next_round()
+    return model, rows
+
+@bench('bot.learned_play')
+def _(seed):
+    model, rows = learned_cases(seed)
+    def run():
+        for obs in rows:
+            model.play_one(obs)
+    return run, len(rows)
+
+@bench('bot.learned_batch')
+def _(seed):
+    from learned import PLAY_COLUMNS, columns
+    model, rows = learned_cases(seed)
+    cols = columns(rows, PLAY_COLUMNS)
+    return lambda: model.play(cols), len(rows)
+
+# --- Headless rounds ---
+@bench('engine.round')
+def _(seed):
+    from engine import TarneebEngine
+    engine = TarneebEngine(seed)
+    def run():
+        for _ in range(20):
+            engine.play_round()
+            engine.next_round()
+    return run, 20
+
+# --- Snapshots ---
+def snapshot_engines(seed, count=64):
+    # Engines stopped at random points of a round, mid-bid and mid-trick
+    from engine import TarneebEngine, STATE_ROUND_END
+    rng = random.Random(seed)
+    engines = []
+    for i in range(count):
+        e = TarneebEngine(seed + i)
+        for _ in range(rng.randrange(60)):
+            if e.state == STATE_ROUND_END: break
+            e.step()
+        engines.append(e)
+    return engines
+
+@bench('snapshot.save')
+def _(seed):
+    from snapshot import save
+    engines = snapshot_engines(seed)
+    def run():
+        for e in engines: save(e)
+    return run, len(engines)
+
+@bench('snapshot.load')
+def _(seed):
+    from snapshot import load, save
+    data = [save(e) for e in snapshot_engines(seed)]
+    def run():
+        for d in data: load(d)
+    return run, len(data)
+
+# --- Rendering ---
+def frame_game(seed):
+    # The shared game mid-play with its cards at rest
+    from tarneeb import card_motion, STATE_PLAYING
+    game = ui_game()
+    game.rng.seed(seed)
+    game.reset_round()
+    card_motion().step(10 ** 6)
+    game.state = STATE_PLAYING
+    game.turn_idx = 1
+    game.draw_scene()
+    return game
+
+@bench('frame.draw_scene_idle')
+def _(seed):
+    game = frame_game(seed)
+    return game.draw_scene, 1
+
+@bench('frame.draw_scene_full')
+def _(seed):
+    game = frame_game(seed)
+    def run():
+        game.renderer.invalidate()
+        game.draw_scene()
+    return run, 1
+
+@bench('frame.animate_52')
+def _(seed):
+    from tarneeb import card_motion
+    game = frame_game(seed)
+    motion = card_motion()
+    rng = random.Random(seed)
+    def run():
+        if not motion.moving:
+            motion.move(range(52), [(rng.randrange(900), rng.randrange(600)) for _ in range(52)], 500)
+        motion.step(16)
+        game.draw_scene()
+    return run, 1
+
+# --- Runner ---
+def time_benchmark(setup, seed=SEED, runs=RUNS, min_time=MIN_TIME):
+    fn, ops = setup(seed)
+    fn()  # warm up caches and lazy tables
+    n = 1
+    while True:
+        t0 = time.perf_counter()
+        for _ in range(n): fn()
+        dt = time.perf_counter() - t0
+        if dt >= min_time / 4: break
+        n *= 2
+    n = max(1, int(n * min_time / 4 / dt * 4))
+    samples = []
+    for _ in range(runs):
+        t0 = time.perf_counter()
+        for _ in range(n): fn()
+        samples.append((time.perf_counter() - t0) / (n * ops) * 1e9)
+    return {'ns_per_op': statistics.median(samples), 'best_ns': min(samples),
+            'spread': (max(samples) - min(samples)) / statistics.median(samples),
+            'ops': n * ops * runs}
+
+def environment():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                                text=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except OSError:
+        commit = ''
+    import numpy
+    import pygame
+    return {'python': platform.python_version(), 'platform': platform.platform(),
+            'numpy': numpy.__version__, 'pygame': pygame.version.ver, 'commit': commit,
+            'seed': SEED, 'time': time.strftime('%Y-%m-%dT%H:%M:%S')}
+
+def run_all(names, runs=RUNS, min_time=MIN_TIME, progress=None):
+    results = {}
+    for name in names:
+        results[name] = time_benchmark(BENCHMARKS[name], runs=runs, min_time=min_time)
+        if progress: progress(name, results[name])
+    return {'environment': environment(), 'results': results}
+
+def compare(current, baseline, threshold=THRESHOLD):
+    # Returns [(name, baseline ns, current ns, ratio, regressed)] for shared names
+    rows = []
+    for name, res in current['results'].items():
+        base = baseline['results'].get(name)
+        if base is None: continue
+        ratio = res['ns_per_op'] / base['ns_per_op']
+        rows.append((name, base['ns_per_op'], res['ns_per_op'], ratio, ratio > 1 + threshold))
+    return rows
+
+def fmt_ns(ns):
+    if ns >= 1e6: return f"{ns / 1e6:.2f} ms"
+    if ns >= 1e3: return f"{ns / 1e3:.2f} us"
+    return f"{ns:.0f} ns"
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Tarneeb benchmark suite")
+    parser.add_argument('-k', '--filter', default='', help="only benchmarks whose name contains this")
+    parser.add_argument('--json', help="write results to this file")
+    parser.add_argument('--compare', help="baseline JSON to check for regressions")
+    parser.add_argument('--threshold', type=float, default=THRESHOLD,
+                        help="relative slowdown counted as a regression (default %(default)s)")
+    parser.add_argument('--runs', type=int, default=RUNS)
+    parser.add_argument('--min-time', type=float, default=MIN_TIME, help="seconds per run")
+    parser.add_argument('--list', action='store_true')
+    args = parser.parse_args()
+
+    names = [n for n in BENCHMARKS if args.filter in n]
+    if args.list:
+        print("\n".join(names))
+        sys.exit()
+    report = run_all(names, args.runs, args.min_time,
+                     lambda name, r: print(f"{name:28} {fmt_ns(r['ns_per_op']):>10}/op  "
+                                           f"(best {fmt_ns(r['best_ns'])}, spread {r['spread']:.0%})"))
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        rows = compare(report, baseline, args.threshold)
+        print(f"\nAgainst {args.compare} (commit {baseline['environment'].get('commit') or '?'}):")
+        for name, base, cur, ratio, regressed in rows:
+            flag = "REGRESSION" if regressed else ("faster" if ratio < 1 - args.threshold else "")
+            print(f"{name:28} {fmt_ns(base):>10} -> {fmt_ns(cur):>10}  {ratio:6.2f}x  {flag}")
+        regressions = [r for r in rows if r[4]]
+        if regressions:
+            print(f"{len(regressions)} regression(s) beyond {args.threshold:.0%}")
+            sys.exit(1)
@@ -0,0 +1,120 @@
+import argparse
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+from bidtable import TABLE_VERSION, TABLE_FILE, SHAPE, CELLS, BIDS, cell_index, table_path
+from dealing import deal
+from engine import TarneebEngine, BotPolicy, STATE_PLAYING
+
+# Offline pipeline for the bid table: deals hands the way the game does, lets
+# every seat declare every trump suit and play the hand out with the default
+# card play, and histograms the declaring team's tricks per feature cell.
+#
+# Deals are split into seeded chunks whose histograms are saved to a work
+# directory as they finish, so an interrupted run resumes where it stopped.
+# Chunk seeds depend only on the master seed and chunk index, so the table is
+# the same for any number of workers.
+
+CHUNK = 1000        # deals per chunk (fixed: it is part of the chunk seeds)
+MIN_SAMPLES = 100   # cells with fewer samples borrow from coarser cells
+
+def chunk_seeds(master_seed, chunks):
+    rng = random.Random(master_seed)
+    return [rng.getrandbits(63) for _ in range(chunks)]
+
+def play_out(engine, policy, hands, declarer, trump):
+    # Tricks the declaring team takes when `declarer` names trump and leads
+    engine.set_deal(hands, 0)
+    engine.bid_winner = declarer
+    engine.trump_suit = trump
+    engine.start_play_phase(declarer)
+    while engine.state == STATE_PLAYING:
+        seat = engine.turn_idx
+        engine.execute_play_card(seat, policy.play(engine, seat))
+    t = engine.tricks_won
+    return t[declarer % 2] + t[declarer % 2 + 2]
+
+def simulate_chunk(seed, deals=CHUNK):
+    # Returns a (CELLS, 14) histogram of declaring-team tricks
+    rng = random.Random(seed)
+    engine = TarneebEngine()
+    policy = BotPolicy()
+    hist = np.zeros((CELLS, 14), dtype=np.int64)
+    for _ in range(deals):
+        hands = deal(rng)
+        for seat in range(4):
+            for trump in range(4):
+                hist[cell_index(hands[seat], trump), play_out(engine, policy, hands, seat, trump)] += 1
+    return hist
+
+def chunk_path(workdir, seed, i):
+    return os.path.join(workdir, f"v{TABLE_VERSION}_seed{seed}_{i:05d}.npy")
+
+def save_chunk(path, hist):
+    # Write then rename, so a killed run never leaves a half-written chunk
+    tmp = path + '.tmp'
+    with open(tmp, 'wb') as f:
+        np.save(f, hist)
+    os.replace(tmp, path)
+
+def run_pipeline(deals, workdir, master_seed=0, workers=None, progress=print):
+    chunks = (deals + CHUNK - 1) // CHUNK
+    seeds = chunk_seeds(master_seed, chunks)
+    os.makedirs(workdir, exist_ok=True)
+    todo = [i for i in range(chunks) if not os.path.exists(chunk_path(workdir, master_seed, i))]
+    progress(f"{chunks - len(todo)}/{chunks} chunks already done")
+    if workers == 1:
+        for n, i in enumerate(todo, 1):
+            save_chunk(chunk_path(workdir, master_seed, i), simulate_chunk(seeds[i]))
+            progress(f"chunk {i} done ({n}/{len(todo)})")
+    elif todo:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = {pool.submit(simulate_chunk, seeds[i]): i for i in todo}
+            for n, fut in enumerate(as_completed(futures), 1):
+                i = futures[fut]
+                save_chunk(chunk_path(workdir, master_seed, i), fut.result())
+                progress(f"chunk {i} done ({n}/{len(todo)})")
+
+    hist = np.zeros((CELLS, 14), dtype=np.int64)
+    for i in range(chunks):
+        hist += np.load(chunk_path(workdir, master_seed, i))
+    return hist
+
+def build_table(hist):
+    # Histograms -> uint8 cells of [expected tricks * 16, P(make k) * 255
+    # for k in BIDS]. Thin cells use the pooled histogram of all hands with
+    # the same trump length and honors, or failing that the same length.
+    h = hist.reshape(SHAPE + (14,)).astype(np.float64)
+    by_lh = np.broadcast_to(h.sum(axis=(2, 3), keepdims=True), h.shape)
+    by_l = np.broadcast_to(h.sum(axis=(1, 2, 3), keepdims=True), h.shape)
+    n = h.sum(axis=-1, keepdims=True)
+    h = np.where(n >= MIN_SAMPLES, h, np.where(by_lh.sum(axis=-1, keepdims=True) >= MIN_SAMPLES, by_lh, by_l))
+    n = np.maximum(h.sum(axis=-1, keepdims=True), 1)
+
+    expected = (h * np.arange(14)).sum(axis=-1) / n[..., 0]
+    at_least = h[..., ::-1].cumsum(axis=-1)[..., ::-1] / n  # P(tricks >= k)
+    table = np.empty(SHAPE + (1 + len(BIDS),), dtype=np.uint8)
+    table[..., 0] = np.rint(expected * 16)
+    table[..., 1:] = np.rint(at_least[..., BIDS.start:BIDS.stop] * 255)
+    return table
+
+def write_table(path, table, deals, master_seed):
+    np.savez_compressed(path, version=TABLE_VERSION, table=table, deals=deals, seed=master_seed)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Simulate deals and build the bid evaluation table")
+    parser.add_argument('--deals', type=int, default=200000)
+    parser.add_argument('--seed', type=int, default=0, help="master seed")
+    parser.add_argument('--workers', type=int, default=None, help="default: one per core")
+    parser.add_argument('--workdir', default='.bidsim', help="chunk results, kept for resuming")
+    parser.add_argument('--out', default=table_path(), help=f"default: {TABLE_FILE} next to the code")
+    args = parser.parse_args()
+
+    t0 = time.perf_counter()
+    hist = run_pipeline(args.deals, args.workdir, args.seed, args.workers)
+    write_table(args.out, build_table(hist), hist.sum() // 16, args.seed)
+    print(f"{hist.sum()} play-outs -> {args.out} in {time.perf_counter() - t0:.0f}s")
@@ -0,0 +1,95 @@
+import os
+import sys
+
+from bitboard import LANE, HONORS
+
+# Bid evaluation table. For a hand and a trump suit it holds the declaring
+# team's expected tricks and its chance of making each contract 7..13,
+# learned by bidsim.py from simulated deals played out with the default card
+# play. Cells are indexed by the hand's shape for that trump (features()).
+#
+# The table ships as bid_table.npz next to this file and is loaded on first
+# use. A table whose version differs from TABLE_VERSION is ignored, and the
+# bots fall back to the old heuristics until it is regenerated.
+
+TABLE_VERSION = 1    # bump when features() or the cell layout changes
+TABLE_FILE = 'bid_table.npz'
+SHAPE = (14, 5, 4, 4)  # trump length, trump honors, side aces, shortest side suit (3 = 3+)
+CELLS = 14 * 5 * 4 * 4
+BIDS = range(7, 14)
+BID_CONFIDENCE = 0.7   # bid the highest contract made at least this often
+
+def features(hand, trump):
+    lane = hand >> (13 * trump) & LANE
+    side_aces = 0
+    short = 3
+    for s in range(4):
+        if s == trump: continue
+        other = hand >> (13 * s) & LANE
+        side_aces += other >> 12
+        n = other.bit_count()
+        if n < short: short = n
+    return lane.bit_count(), (lane & HONORS).bit_count(), side_aces, short
+
+def cell_index(hand, trump):
+    length, honors, aces, short = features(hand, trump)
+    return ((length * 5 + honors) * 4 + aces) * 4 + short
+
+def table_path():
+    # Frozen builds unpack data files under sys._MEIPASS
+    base = getattr(sys, '_MEIPASS', os.path.dirname(os.path.abspath(__file__)))
+    return os.path.join(base, TABLE_FILE)
+
+def load_array(path=None):
+    # The raw (CELLS, 8) uint8 table (expected tricks * 16, then P(make
+    # 7..13) * 255), or None if there is no usable table
+    path = path or table_path()
+    if not os.path.exists(path):
+        return None
+    import numpy as np
+    with np.load(path) as data:
+        version = int(data['version'])
+        if version != TABLE_VERSION:
+            print(f"{path}: table version {version}, expected {TABLE_VERSION}; "
+                  f"using heuristic bids", file=sys.stderr)
+            return None
+        return data['table'].reshape(CELLS, 1 + len(BIDS))
+
+def load_table(path=None):
+    # Returns a list of (expected tricks, (P(make 7), ..., P(make 13))) per
+    # cell, or None if there is no usable table
+    table = load_array(path)
+    if table is None:
+        return None
+    return [(row[0] / 16, tuple(p / 255 for p in row[1:])) for row in table.tolist()]
+
+_table = None
+
+def bid_table():
+    global _table
+    if _table is None:
+        _table = load_table() or False
+    return _table or None
+
+def evaluate(hand, trump):
+    # (expected tricks, make chances for 7..13), or None without a table
+    table = bid_table()
+    return table and table[cell_index(hand, trump)]
+
+def table_bid(hand):
+    # Highest contract some trump suit makes often enough, else 0
+    table = bid_table()
+    best = 0
+    for trump in range(4):
+        chances = table[cell_index(hand, trump)][1]
+        for i in range(len(BIDS) - 1, -1, -1):
+            if chances[i] >= BID_CONFIDENCE:
+                if BIDS[i] > best: best = BIDS[i]
+                break
+    return best
+
+def table_trump(hand):
+    # Suit with the most expected tricks; ties keep the lower suit index
+    table = bid_table()
+    tricks = [table[cell_index(hand, trump)][0] for trump in range(4)]
+    return tricks.index(max(tricks))
@@ -0,0 +1,121 @@
+# Compact card/hand encoding shared by the engine, bots and solvers.
+#
+# A card is an int 0..51: suit_idx * 13 + (rank - 2), suit_idx indexing SUITS.
+# A hand is a 52-bit mask with one 13-bit lane per suit, so bit `card` is set
+# when the hand holds that card. Within a lane bit 0 is the 2 and bit 12 the A.
+
+SUITS = ['♠', '♥', '♣', '♦']
+RANKS = {
+    2: '2', 3: '3', 4: '4', 5: '5', 6: '6', 7: '7', 8: '8', 9: '9',
+    10: '10', 11: 'J', 12: 'Q', 13: 'K', 14: 'A'
+}
+
+LANE = 0x1FFF
+FULL_DECK = (1 << 52) - 1
+SUIT_MASKS = [LANE << (13 * s) for s in range(4)]
+HONORS = 0x1E00  # J, Q, K, A within a lane
+
+DECK = list(range(52))
+RANK_OF = [c % 13 + 2 for c in DECK]
+SUIT_OF = [c // 13 for c in DECK]
+
+# The UI sorts hands by (suit symbol, rank), so bots break rank ties in that
+# order. ORDER_KEY reproduces it: higher key = later in the sorted hand.
+SUIT_SORT_POS = [sorted(SUITS).index(s) for s in SUITS]
+ORDER_KEY = [RANK_OF[c] * 4 + SUIT_SORT_POS[SUIT_OF[c]] for c in DECK]
+HAND_SORT_KEY = [SUIT_SORT_POS[SUIT_OF[c]] * 13 + RANK_OF[c] for c in DECK]
+HIGH_ORDER = sorted(range(4), key=lambda s: -SUIT_SORT_POS[s])  # tie winner first
+LOW_ORDER = HIGH_ORDER[::-1]
+
+def make_card(rank, suit_idx):
+    return suit_idx * 13 + rank - 2
+
+def card_name(card):
+    return RANKS[RANK_OF[card]] + SUITS[SUIT_OF[card]]
+
+# --- Masks ---
+def hand_mask(cards):
+    mask = 0
+    for c in cards:
+        mask |= 1 << c
+    return mask
+
+def cards_of(mask):
+    # Cards in ascending encoding order (suit lanes, then rank)
+    out = []
+    while mask:
+        low = mask & -mask
+        out.append(low.bit_length() - 1)
+        mask ^= low
+    return out
+
+def sorted_cards(mask):
+    # Cards in the UI's hand order
+    return sorted(cards_of(mask), key=HAND_SORT_KEY.__getitem__)
+
+def suit_lane(mask, suit):
+    return (mask >> (13 * suit)) & LANE
+
+def suit_count(mask, suit):
+    return ((mask >> (13 * suit)) & LANE).bit_count()
+
+def suit_counts(mask):
+    return [((mask >> (13 * s)) & LANE).bit_count() for s in range(4)]
+
+def high_count(mask, suit, min_rank=11):
+    return ((mask >> (13 * suit + min_rank - 2)) & (LANE >> (min_rank - 2))).bit_count()
+
+def has_suit(mask, suit):
+    return (mask >> (13 * suit)) & LANE != 0
+
+def valid_mask(mask, lead_suit):
+    # Follow suit if possible, otherwise anything goes
+    if lead_suit is None: return mask
+    follows = mask & SUIT_MASKS[lead_suit]
+    return follows if follows else mask
+
+def top_card(mask, suit):
+    lane = (mask >> (13 * suit)) & LANE
+    return 13 * suit + lane.bit_length() - 1 if lane else -1
+
+def bottom_card(mask, suit):
+    lane = (mask >> (13 * suit)) & LANE
+    return 13 * suit + (lane & -lane).bit_length() - 1 if lane else -1
+
+def highest(mask):
+    # Highest rank in the mask, ties broken like a stable rank sort of the hand
+    best, best_rank = -1, -1
+    for s in HIGH_ORDER:
+        lane = (mask >> (13 * s)) & LANE
+        if lane:
+            r = lane.bit_length()
+            if r > best_rank:
+                best, best_rank = 13 * s + r - 1, r
+    return best
+
+def lowest(mask):
+    best, best_rank = -1, 99
+    for s in LOW_ORDER:
+        lane = (mask >> (13 * s)) & LANE
+        if lane:
+            r = (lane & -lane).bit_length()
+            if r < best_rank:
+                best, best_rank = 13 * s + r - 1, r
+    return best
+
+# --- Lane tables ---
+# Per-lane lookups turn whole-hand scans into four table reads
+def _lane_strength(lane):
+    score = 0
+    for b in range(13):
+        if lane >> b & 1:
+            r = b + 2
+            score += r * r if r >= 10 else r
+    return score
+
+LANE_STRENGTH = [_lane_strength(lane) for lane in range(1 << 13)]
+
+def hand_strength(mask):
+    # Same weighting as TarneebGame.reset_round (10..A count rank squared)
+    return (LANE_STRENGTH[mask & LANE] + LANE_STRENGTH[(mask >> 13) & LANE]
+            + LANE_STRENGTH[(mask >> 26) & LANE] + LANE_STRENGTH[mask >> 39])
@@ -0,0 +1,188 @@
+import random
+import sys
+import time
+
+import numpy as np
+
+from bitboard import DECK, LANE, RANK_OF, LANE_STRENGTH, hand_strength
+
+# Deal generation. A deal policy turns a seeded PRNG into four 52-bit hand
+# masks, one deal at a time with random.Random (engine and UI rounds) or
+# thousands at a time with a numpy Generator (simulations, test corpora).
+#
+#   FairDeal         plain shuffle
+#   RiggedDeal       the game's "lucky player" scheme (default)
+#   ConstrainedDeal  rejection-samples another policy until constraints hold,
+#                    e.g. ConstrainedDeal(SuitLength(0, 0, lo=6))
+
+BATCH = 100000  # deals per array when streaming large batches
+
+# Per-card weights of hand_strength, for batch scoring
+CARD_STRENGTH = np.array([r * r if r >= 10 else r for r in RANK_OF], dtype=np.int32)
+
+def shuffle_hands(rng):
+    # Returns four hand masks. Sorting on random keys is several times
+    # cheaper than random.shuffle
+    rand = rng.random
+    deck = sorted(DECK, key=lambda _: rand())
+    hands = []
+    for i in range(0, 52, 13):
+        mask = 0
+        for c in deck[i:i+13]:
+            mask |= 1 << c
+        hands.append(mask)
+    return hands
+
+def rig_hands(hands, rng):
+    # Same "lucky player" scheme as the original TarneebGame.reset_round: the
+    # best 1-2 hands go to random seats, the rest are spread randomly
+    hands = sorted(hands, key=hand_strength, reverse=True)
+    lucky_count = rng.randint(1, 2)
+    lucky_players = rng.sample([0, 1, 2, 3], lucky_count)
+    final_hands = [None] * 4
+    for i, p_idx in enumerate(lucky_players):
+        final_hands[p_idx] = hands[i]
+    remaining_players = [x for x in range(4) if x not in lucky_players]
+    rng.shuffle(remaining_players)
+    for i, p_idx in enumerate(remaining_players):
+        final_hands[p_idx] = hands[lucky_count + i]
+    return final_hands
+
+def deal(rng, rigged=True):
+    hands = shuffle_hands(rng)
+    return rig_hands(hands, rng) if rigged else hands
+
+CARD_BITS = np.left_shift(np.uint64(1), np.arange(52, dtype=np.uint64))
+
+def shuffled_cards(gen, n):
+    # (n, 4, 13) card codes, one independent permutation of the deck per row
+    # (argsort of random keys beats Generator.permuted row by row)
+    return gen.random((n, 52)).argsort(axis=1).reshape(n, 4, 13)
+
+def cards_to_masks(cards):
+    # (..., 13) card codes -> (...) uint64 hand masks; the bits are disjoint
+    # so a sum is an OR
+    return CARD_BITS[cards].sum(axis=-1, dtype=np.uint64)
+
+def lane_counts(masks, suit):
+    return np.bitwise_count((masks >> np.uint64(13 * suit)) & np.uint64(LANE))
+
+class FairDeal:
+    def deal(self, rng):
+        return shuffle_hands(rng)
+
+    def deal_batch(self, gen, n):
+        # (n, 4) uint64 hand masks
+        return cards_to_masks(shuffled_cards(gen, n))
+
+class RiggedDeal(FairDeal):
+    def deal(self, rng):
+        return rig_hands(shuffle_hands(rng), rng)
+
+    def deal_batch(self, gen, n):
+        cards = shuffled_cards(gen, n)
+        strength = CARD_STRENGTH[cards].sum(axis=2)
+        order = np.argsort(-strength, axis=1, kind='stable')
+        ranked = np.take_along_axis(cards_to_masks(cards), order, axis=1)
+        # Strongest hands to random lucky seats and the rest shuffled over the
+        # others amounts to a uniformly random seat for each ranked hand
+        seats = gen.permuted(np.broadcast_to(np.arange(4), (n, 4)), axis=1)
+        out = np.empty_like(ranked)
+        np.put_along_axis(out, seats, ranked, axis=1)
+        return out
+
+class SuitLength:
+    # `seat` holds lo..hi cards of `suit`
+    def __init__(self, seat, suit, lo=0, hi=13):
+        self.seat, self.suit, self.lo, self.hi = seat, suit, lo, hi
+
+    def test(self, hands):
+        return self.lo <= (hands[self.seat] >> (13 * self.suit) & LANE).bit_count() <= self.hi
+
+    def test_batch(self, hands):
+        n = lane_counts(hands[:, self.seat], self.suit)
+        return (n >= self.lo) & (n <= self.hi)
+
+class Holds:
+    # `seat` holds every card in `cards`
+    def __init__(self, seat, cards):
+        self.seat = seat
+        self.mask = 0
+        for c in cards:
+            self.mask |= 1 << c
+
+    def test(self, hands):
+        return hands[self.seat] & self.mask == self.mask
+
+    def test_batch(self, hands):
+        m = np.uint64(self.mask)
+        return hands[:, self.seat] & m == m
+
+class MinStrength:
+    # `seat` has at least `strength` by hand_strength
+    def __init__(self, seat, strength):
+        self.seat, self.strength = seat, strength
+
+    def test(self, hands):
+        return hand_strength(hands[self.seat]) >= self.strength
+
+    def test_batch(self, hands):
+        table = np.asarray(LANE_STRENGTH)
+        h = hands[:, self.seat]
+        total = sum(table[((h >> np.uint64(13 * s)) & np.uint64(LANE)).astype(np.intp)] for s in range(4))
+        return total >= self.strength
+
+class ConstrainedDeal:
+    # Draws from `base` (fair by default) until every constraint holds; gives
+    # up after max_tries draws in a row fail
+    def __init__(self, *constraints, base=None, max_tries=1000000):
+        self.constraints = constraints
+        self.base = base or FairDeal()
+        self.max_tries = max_tries
+
+    def deal(self, rng):
+        for _ in range(self.max_tries):
+            hands = self.base.deal(rng)
+            if all(c.test(hands) for c in self.constraints):
+                return hands
+        raise ValueError(f"No deal met the constraints in {self.max_tries} tries")
+
+    def deal_batch(self, gen, n):
+        parts, found, misses = [], 0, 0
+        while found < n:
+            size = min(max(n - found, 1024) * 4, BATCH)
+            hands = self.base.deal_batch(gen, size)
+            ok = np.ones(size, dtype=bool)
+            for c in self.constraints:
+                ok &= c.test_batch(hands)
+            hits = int(ok.sum())
+            misses = misses + size if not hits else 0
+            if misses >= self.max_tries:
+                raise ValueError(f"No deal met the constraints in {misses} tries")
+            parts.append(hands[ok])
+            found += hits
+        return np.concatenate(parts)[:n]
+
+def iter_deals(policy, total, seed=None):
+    # Streams `total` deals as (<= BATCH, 4) mask arrays from one seed
+    gen = np.random.default_rng(seed)
+    while total > 0:
+        n = min(total, BATCH)
+        yield policy.deal_batch(gen, n)
+        total -= n
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    policies = [('fair', FairDeal()), ('rigged', RiggedDeal()),
+                ('seat 0 holds 6+ spades', ConstrainedDeal(SuitLength(0, 0, lo=6)))]
+    for name, policy in policies:
+        t0 = time.perf_counter()
+        for _ in iter_deals(policy, n, seed=0):
+            pass
+        dt = time.perf_counter() - t0
+        rng = random.Random(0)
+        t1 = time.perf_counter()
+        for _ in range(10000):
+            policy.deal(rng)
+        dt1 = time.perf_counter() - t1
+        print(f"{name:24} batch {n / dt / 1e6:.2f}M deals/s, one at a time {10000 / dt1 / 1e3:.1f}k deals/s")
@@ -0,0 +1,278 @@
+import argparse
+import asyncio
+import collections
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import numpy as np
+
+from engine import BotPolicy, TarneebEngine, STATE_BIDDING, STATE_PLAYING, STATE_ROUND_END
+from learned import (BID_COLUMNS, PLAY_COLUMNS, Evaluator, bid_observation, columns, evaluator, init_weights,
+                     load_model, play_observation)
+
+# Batched bot decisions for many games at once. Games submit observations
+# (learned.py) and get a Future back; one service thread collects pending
+# requests and evaluates them together, one vectorized pass per kind, which
+# costs a fraction per decision of evaluating each alone.
+#
+# A batch closes when it holds max_batch requests or when the oldest has
+# waited max_wait, so a lone game waits at most max_wait for its move. The
+# service keeps the queue depth at each batch, the batch sizes and the
+# latency from submit to result (see stats()).
+#
+# BatchedPolicy plugs it into anything that takes a policy. Threads (the UI's
+# bot worker, an offload pool) block on a concurrent Future; coroutines (the
+# table server's bot 'batched') submit_async() and await an asyncio Future,
+# so one event loop can keep hundreds of tables' decisions in flight. Results
+# for an event loop are handed over once per batch, not once per request.
+
+MAX_BATCH = 256
+MAX_WAIT = 0.005          # seconds the oldest request may wait for company
+LATENCY_SAMPLES = 100000  # most recent latencies kept for percentiles
+SPECS = {'play': PLAY_COLUMNS, 'bid': BID_COLUMNS}
+
+class DecisionService:
+    def __init__(self, model, max_batch=MAX_BATCH, max_wait=MAX_WAIT):
+        self.model = model
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.requests = queue.SimpleQueue()  # (kind, observation, future, submit time, loop)
+        self.reset()
+        self.thread = threading.Thread(target=self.serve, name="decisions", daemon=True)
+        self.thread.start()
+
+    def submit(self, kind, obs):
+        # kind 'play' or 'bid' with a play_observation() / bid_observation()
+        future = Future()
+        self.requests.put((kind, obs, future, time.perf_counter(), None))
+        return future
+
+    def submit_async(self, kind, obs):
+        # As submit(), for a coroutine on the running event loop
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self.requests.put((kind, obs, future, time.perf_counter(), loop))
+        return future
+
+    def depth(self):
+        return self.requests.qsize()
+
+    def reset(self):
+        # Starts the metrics afresh (e.g. after a warm-up)
+        self.decided = 0
+        self.batches = 0
+        self.batch_sizes = collections.Counter()
+        self.latencies = collections.deque(maxlen=LATENCY_SAMPLES)
+        self.depths = collections.deque(maxlen=LATENCY_SAMPLES)
+        self.busy = 0.0  # seconds spent evaluating
+
+    def close(self):
+        self.requests.put(None)
+        self.thread.join()
+
+    def serve(self):
+        get = self.requests.get
+        while True:
+            first = get()
+            if first is None: return
+            batch = [first]
+            deadline = first[3] + self.max_wait
+            stop = False
+            while len(batch) < self.max_batch:
+                wait = deadline - time.perf_counter()
+                try:
+                    item = get(timeout=wait) if wait > 0 else get(block=False)
+                except queue.Empty:
+                    break
+                if item is None:
+                    stop = True
+                    break
+                batch.append(item)
+            self.depths.append(self.requests.qsize())
+            self.evaluate(batch)
+            if stop: return
+
+    def evaluate(self, batch):
+        t0 = time.perf_counter()
+        loops = {}  # loop -> [(future, action, exception)]
+        for kind in SPECS:
+            part = [r for r in batch if r[0] == kind]
+            if not part: continue
+            try:
+                cols = columns([r[1] for r in part], SPECS[kind])
+                results = [(a, None) for a in (self.model.play if kind == 'play' else self.model.bid)(cols).tolist()]
+            except Exception as exc:
+                results = [(None, exc)] * len(part)
+            for r, (action, exc) in zip(part, results):
+                if r[4] is not None:
+                    loops.setdefault(r[4], []).append((r[2], action, exc))
+                elif exc is None:
+                    r[2].set_result(action)
+                else:
+                    r[2].set_exception(exc)
+        for loop, results in loops.items():
+            try:
+                loop.call_soon_threadsafe(deliver, results)
+            except RuntimeError:
+                pass  # the loop has closed; nobody is waiting
+        done = time.perf_counter()
+        self.busy += done - t0
+        self.latencies.extend(done - r[3] for r in batch)
+        self.decided += len(batch)
+        self.batches += 1
+        self.batch_sizes[len(batch)] += 1
+
+    def stats(self):
+        lat = np.asarray(self.latencies) * 1e3
+        p50, p95, p99 = np.percentile(lat, (50, 95, 99)) if len(lat) else (0.0, 0.0, 0.0)
+        # Batch sizes in power-of-two buckets: 1, 2-3, 4-7, ...
+        buckets = collections.Counter()
+        for size, n in self.batch_sizes.items():
+            buckets[1 << (size.bit_length() - 1)] += n
+        return {'decided': self.decided, 'batches': self.batches,
+                'mean_batch': self.decided / max(self.batches, 1),
+                'batch_sizes': dict(sorted(buckets.items())),
+                'latency_ms': {'p50': float(p50), 'p95': float(p95), 'p99': float(p99),
+                               'max': float(lat.max()) if len(lat) else 0.0},
+                'queue_depth': {'now': self.depth(), 'mean': float(np.mean(self.depths)) if self.depths else 0.0,
+                                'max': max(self.depths, default=0)},
+                'busy_s': self.busy}
+
+def deliver(results):
+    # Runs on the event loop the futures belong to
+    for future, action, exc in results:
+        if future.done(): continue  # cancelled
+        if exc is None: future.set_result(action)
+        else: future.set_exception(exc)
+
+_service = None
+
+def shared_service():
+    # One service per process for the shipped model, or None without one
+    global _service
+    if _service is None:
+        model = evaluator()
+        _service = DecisionService(model) if model else False
+    return _service or None
+
+class BatchedPolicy(BotPolicy):
+    # Bids and plays through a DecisionService; trump, forced cards and
+    # anything the model has no head for are decided at once, as the default
+    # bot would. request() and request_async() are the non-blocking forms:
+    # a Future, or None when the decision should be made inline
+    def __init__(self, service=None):
+        self.service = service or shared_service()
+
+    def observe(self, kind, engine, seat):
+        # The observation to submit, or None to decide inline
+        service = self.service
+        if service is None or kind not in service.model.heads: return None
+        if kind == 'bid':
+            return bid_observation(engine, seat)
+        if kind == 'play':
+            legal = engine.legal_mask(seat)
+            if legal & (legal - 1):
+                return play_observation(engine, seat)
+        return None
+
+    def request(self, kind, engine, seat):
+        obs = self.observe(kind, engine, seat)
+        return None if obs is None else self.service.submit(kind, obs)
+
+    def request_async(self, kind, engine, seat):
+        obs = self.observe(kind, engine, seat)
+        return None if obs is None else self.service.submit_async(kind, obs)
+
+    def bid(self, engine, seat):
+        future = self.request('bid', engine, seat)
+        return future.result() if future is not None else super().bid(engine, seat)
+
+    def play(self, engine, seat):
+        future = self.request('play', engine, seat)
+        if future is not None: return future.result()
+        legal = engine.legal_mask(seat)
+        return legal.bit_length() - 1 if not legal & (legal - 1) else super().play(engine, seat)
+
+# --- Throughput check ---
+async def play_games(policy, games, rounds, seed):
+    # `games` engines on one event loop, every seat played by `policy`;
+    # returns the number of model decisions made
+    decisions = 0
+    async def game(i):
+        nonlocal decisions
+        e = TarneebEngine(seed + i)
+        for _ in range(rounds):
+            while e.state != STATE_ROUND_END:
+                kind = {STATE_BIDDING: 'bid', STATE_PLAYING: 'play'}.get(e.state)
+                seat = e.to_act()
+                if kind == 'bid' and (e.passed[seat] or all(e.passed)
+                                      or e.passed.count(False) == 1 and e.highest_bid > 6):
+                    kind = None  # the engine moves on without asking
+                future = policy.request_async(kind, e, seat) if kind else None
+                if future is None:
+                    e.step()
+                    await asyncio.sleep(0)
+                else:
+                    e.step(await future)
+                    decisions += 1
+            e.next_round()
+    await asyncio.gather(*(game(i) for i in range(games)))
+    return decisions
+
+class DirectService:
+    # Stands in for DecisionService with an already-resolved future per
+    # request, evaluated alone (the unbatched baseline)
+    def __init__(self, model):
+        self.model = model
+
+    def submit_async(self, kind, obs):
+        future = asyncio.get_running_loop().create_future()
+        future.set_result(self.model.play_one(obs) if kind == 'play' else self.model.bid_one(obs))
+        return future
+
+def compare(games, rounds, max_batch=MAX_BATCH, max_wait=MAX_WAIT, model=None, seed=0):
+    # Decisions per second for the same games, batched and one at a time
+    model = model or Evaluator({kind: init_weights(kind, 128, np.random.default_rng(seed))
+                                for kind in ('play', 'bid')})
+    t0 = time.perf_counter()
+    direct = asyncio.run(play_games(BatchedPolicy(DirectService(model)), games, rounds, seed))
+    direct_s = time.perf_counter() - t0
+
+    service = DecisionService(model, max_batch, max_wait)
+    t0 = time.perf_counter()
+    batched = asyncio.run(play_games(BatchedPolicy(service), games, rounds, seed))
+    batched_s = time.perf_counter() - t0
+    service.close()
+    return {'direct_per_s': direct / direct_s, 'batched_per_s': batched / batched_s,
+            'decisions': batched, 'service': service.stats()}
+
+def report(r):
+    s = r['service']
+    lat, depth = s['latency_ms'], s['queue_depth']
+    lines = [f"One at a time: {r['direct_per_s']:.0f} decisions/s",
+             f"Batched:       {r['batched_per_s']:.0f} decisions/s "
+             f"({r['batched_per_s'] / r['direct_per_s']:.1f}x), {s['batches']} batches of {s['mean_batch']:.1f} on average",
+             "Batch sizes: " + ", ".join(f"{lo}-{2 * lo - 1}: {n}" if lo > 1 else f"1: {n}"
+                                         for lo, n in s['batch_sizes'].items()),
+             f"Latency ms: p50 {lat['p50']:.2f}, p95 {lat['p95']:.2f}, p99 {lat['p99']:.2f}, max {lat['max']:.2f}",
+             f"Queue depth at batch start: mean {depth['mean']:.1f}, max {depth['max']}"]
+    return "\n".join(lines)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Batched against one-at-a-time model decisions for many games")
+    parser.add_argument('--games', type=int, default=500, help="concurrent games")
+    parser.add_argument('--rounds', type=int, default=2, help="rounds per game")
+    parser.add_argument('--max-batch', type=int, default=MAX_BATCH)
+    parser.add_argument('--max-wait', type=float, default=MAX_WAIT, help="seconds")
+    parser.add_argument('--model', default=None, help="trained model (default: untrained weights, same cost)")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    model = None
+    if args.model:
+        heads = load_model(args.model)
+        if heads is None:
+            parser.error(f"no usable model at {args.model}")
+        model = Evaluator(heads)
+    print(report(compare(args.games, args.rounds, args.max_batch, args.max_wait, model, args.seed)))
@@ -0,0 +1,328 @@
+import copy
+import random
+import sys
+
+# Headless Tarneeb rules: same bidding, trump, trick and scoring rules as
+# TarneebGame, but no pygame, no rendering and no sleeps. Cards are ints and
+# hands are 52-bit masks (see bitboard.py), so a round costs only int ops.
+
+from bidtable import bid_table, table_bid, table_trump
+from dealing import FairDeal, RiggedDeal
+from bitboard import RANK_OF, SUIT_OF, SUIT_MASKS, LANE, HONORS, cards_of, valid_mask, highest, lowest
+
+# States (shared with the UI)
+STATE_BIDDING = 0
+STATE_CHOOSE_TRUMP = 1
+STATE_PLAYING = 2
+STATE_ANIMATING = 3
+STATE_ROUND_END = 4
+
+# --- Rules ---
+def valid_moves(hand, lead_suit):
+    return cards_of(valid_mask(hand, lead_suit))
+
+def beats(card, best, lead_suit, trump):
+    s = SUIT_OF[card]
+    if s == trump:
+        return SUIT_OF[best] != trump or RANK_OF[card] > RANK_OF[best]
+    return s == lead_suit and SUIT_OF[best] == lead_suit and RANK_OF[card] > RANK_OF[best]
+
+def trick_winner(trick, trump):
+    # trick is a list of (seat, card); returns (winner seat, winning card)
+    winner, best = trick[0]
+    lead_suit = SUIT_OF[best]
+    for p_idx, card in trick[1:]:
+        if beats(card, best, lead_suit, trump):
+            winner, best = p_idx, card
+    return winner, best
+
+def score_round(team_a_tricks, team_b_tricks, bid_winner, bid):
+    # Returns (delta_a, delta_b, message) exactly as calculate_scores
+    if bid_winner in (0, 2):
+        if team_a_tricks >= bid:
+            return team_a_tricks, 0, f"Team A Won! (+{team_a_tricks})"
+        return -bid, team_b_tricks, f"Team A Failed! (-{bid})"
+    if team_b_tricks >= bid:
+        return 0, team_b_tricks, f"Team B Won! (+{team_b_tricks})"
+    return team_a_tricks, -bid, f"Team B Failed! (-{bid})"
+
+# --- Default bots (ports of the TarneebGame heuristics) ---
+def bid_score(hand):
+    # max over suits of (length + honors), as bot_make_bid
+    score = 0
+    for s in range(0, 52, 13):
+        lane = (hand >> s) & LANE
+        n = lane.bit_count() + (lane & HONORS).bit_count()
+        if n > score: score = n
+    return score
+
+def heuristic_bid(hand):
+    # The original thresholds, used when no bid table is available
+    score = bid_score(hand)
+    if score >= 9: return 9
+    if score >= 8: return 8
+    if score >= 6: return 7
+    return 0
+
+def heuristic_trump(hand):
+    # Longest suit
+    counts = [((hand >> s) & LANE).bit_count() for s in range(0, 52, 13)]
+    return counts.index(max(counts))
+
+def bot_bid(hand, highest_bid):
+    # Precomputed table lookup (see bidtable.py); constant time per hand
+    target = table_bid(hand) if bid_table() else heuristic_bid(hand)
+    return target if target > highest_bid else 0
+
+def bot_trump(hand):
+    return table_trump(hand) if bid_table() else heuristic_trump(hand)
+
+def bot_play(hand, trick, trump, seat, winner=None, best=None):
+    # winner/best (seat and card currently taking the trick) may be passed in
+    # when the caller already tracks them, which saves rescanning the trick
+    if not trick:
+        # Leading: play highest card to force others to spend high cards
+        return highest(hand)
+
+    lead_suit = SUIT_OF[trick[0][1]]
+    follows = hand & SUIT_MASKS[lead_suit]
+    if follows:
+        # Single lane: the top and bottom set bits are the cards themselves
+        high = follows.bit_length() - 1
+        low = (follows & -follows).bit_length() - 1
+    else:
+        high, low = highest(hand), lowest(hand)
+    if best is None:
+        winner, best = trick_winner(trick, trump)
+    if winner == (seat + 2) % 4:
+        return low  # Partner is winning, dump trash
+
+    # Same can_win check as bot_play_card
+    if SUIT_OF[high] == trump:
+        can_win = SUIT_OF[best] != trump or RANK_OF[high] > RANK_OF[best]
+    else:
+        can_win = (SUIT_OF[high] == lead_suit and SUIT_OF[best] == lead_suit
+                   and lead_suit != trump and RANK_OF[high] > RANK_OF[best])
+    return high if can_win else low
+
+class BotPolicy:
+    # Seat policy interface: every method gets the engine and the seat to act
+    def bid(self, engine, seat):
+        return bot_bid(engine.hands[seat], engine.highest_bid)
+
+    def choose_trump(self, engine, seat):
+        return bot_trump(engine.hands[seat])
+
+    def play(self, engine, seat):
+        return bot_play(engine.hands[seat], engine.current_trick, engine.trump_suit, seat,
+                        engine.trick_winner_idx, engine.trick_best)
+
+class TarneebEngine:
+    def __init__(self, seed=None, policies=None, rigged=True, deal_policy=None, hands=None, dealer_idx=0):
+        # hands: start on this deal instead of drawing one, dealt by dealer_idx
+        self.rng = random.Random(seed)
+        self.policies = policies or [BotPolicy()] * 4
+        self.deal_policy = deal_policy or (RiggedDeal() if rigged else FairDeal())
+        self.team_a_score = 0
+        self.team_b_score = 0
+        self.dealer_idx = dealer_idx
+        self.redeals = 0
+        self.last_delta = (0, 0)
+        self.reset_round(hands)
+
+    def reset_round(self, hands=None):
+        if hands is None:
+            # Each deal has its own seed so a logged round can be re-dealt alone
+            self.deal_seed = self.rng.getrandbits(63)
+            hands = self.deal_policy.deal(random.Random(self.deal_seed))
+        self.hands = list(hands)
+        self.dealt = tuple(hands)
+        self.tricks_won = [0, 0, 0, 0]
+        self.bids = [0, 0, 0, 0]
+        self.passed = [False] * 4
+
+        self.state = STATE_BIDDING
+        self.current_bidder_idx = (self.dealer_idx + 1) % 4
+        self.highest_bid = 6
+        self.bid_winner = -1
+        self.trump_suit = None
+        self.current_trick = []
+        self.trick_winner_idx = -1
+        self.trick_best = None
+        self.trick_starter = -1
+        self.turn_idx = -1
+        self.message = "Bidding Phase"
+
+        # Public information: cards played so far and suits each seat has
+        # shown out of (bit s set = void in suit s)
+        self.played = 0
+        self.voids = [0, 0, 0, 0]
+
+        # Decision history for logs: (seat, bid) per bidding decision, then
+        # the cards in play order
+        self.bid_log = []
+        self.plays = []
+
+    def set_deal(self, hands, dealer_idx):
+        # Starts a round on given hands instead of a random deal (replays)
+        self.dealer_idx = dealer_idx
+        self.reset_round(hands)
+
+    def copy(self):
+        # Independent copy of the round state; policies and rng are shared
+        other = copy.copy(self)
+        for name in ('hands', 'tricks_won', 'bids', 'passed', 'current_trick', 'voids', 'bid_log', 'plays'):
+            setattr(other, name, getattr(self, name)[:])
+        return other
+
+    def next_round(self):
+        self.dealer_idx = (self.dealer_idx + 1) % 4
+        self.redeals = 0
+        self.reset_round()
+
+    def to_act(self):
+        if self.state == STATE_BIDDING: return self.current_bidder_idx
+        if self.state == STATE_CHOOSE_TRUMP: return self.bid_winner
+        if self.state == STATE_PLAYING: return self.turn_idx
+        return -1
+
+    # --- Driving API ---
+    def step(self, action=None):
+        # Advances one decision. With action=None the seat's policy decides;
+        # otherwise action is a bid (0 = pass), a suit index or a card.
+        if self.state == STATE_BIDDING:
+            self._step_bidding(action)
+        elif self.state == STATE_CHOOSE_TRUMP:
+            if action is None:
+                action = self.policies[self.bid_winner].choose_trump(self, self.bid_winner)
+            if action not in (0, 1, 2, 3):
+                raise ValueError(f"Invalid trump suit: {action}")
+            self.trump_suit = action
+            self.start_play_phase(self.bid_winner)
+        elif self.state == STATE_PLAYING:
+            seat = self.turn_idx
+            if action is None:
+                action = self.policies[seat].play(self, seat)
+            elif not (0 <= action < 52 and self.legal_mask(seat) >> action & 1):
+                raise ValueError(f"Illegal card for seat {seat}: {action}")
+            self.execute_play_card(seat, action)
+        return self.state
+
+    def play_round(self):
+        while self.state != STATE_PLAYING and self.state != STATE_ROUND_END:
+            self.step()
+        # Policy-driven card play skips step()'s dispatch and legality check
+        policies = self.policies
+        while self.state == STATE_PLAYING:
+            seat = self.turn_idx
+            self.execute_play_card(seat, policies[seat].play(self, seat))
+        return self.result()
+
+    def result(self):
+        return {
+            'bid_winner': self.bid_winner,
+            'bid': self.highest_bid,
+            'trump': self.trump_suit,
+            'tricks': self.tricks_won[:],
+            'team_a_score': self.team_a_score,
+            'team_b_score': self.team_b_score,
+            'redeals': self.redeals,
+        }
+
+    # --- Bidding ---
+    def _step_bidding(self, action):
+        if all(self.passed):
+            # Everyone passed: move the deal and reshuffle
+            self.dealer_idx = (self.dealer_idx + 1) % 4
+            self.redeals += 1
+            self.reset_round()
+            return
+
+        active = [i for i in range(4) if not self.passed[i]]
+        if len(active) == 1 and self.highest_bid > 6:
+            self.bid_winner = active[0]
+            self.message = f"Seat {self.bid_winner} wins bid with {self.highest_bid}"
+            self.state = STATE_CHOOSE_TRUMP
+            return
+
+        seat = self.current_bidder_idx
+        if not self.passed[seat]:
+            bid = self.policies[seat].bid(self, seat) if action is None else action
+            if bid and not self.highest_bid < bid <= 13:
+                raise ValueError(f"Invalid bid for seat {seat}: {bid}")
+            self.bid_log.append((seat, bid))
+            if bid > self.highest_bid:
+                self.highest_bid = bid
+                self.bid_winner = seat
+                self.bids[seat] = bid
+            else:
+                self.passed[seat] = True
+        self.current_bidder_idx = (seat + 1) % 4
+
+    # --- Play ---
+    def start_play_phase(self, winner_id):
+        self.state = STATE_PLAYING
+        self.trick_starter = winner_id
+        self.turn_idx = winner_id
+        self.current_trick = []
+        self.trick_best = None
+
+    def lead_suit(self):
+        return SUIT_OF[self.current_trick[0][1]] if self.current_trick else None
+
+    def legal_mask(self, seat):
+        return valid_mask(self.hands[seat], self.lead_suit())
+
+    def legal_moves(self, seat):
+        return cards_of(self.legal_mask(seat))
+
+    def execute_play_card(self, p_idx, card):
+        self.hands[p_idx] &= ~(1 << card)
+        self.played |= 1 << card
+        self.plays.append(card)
+        trick = self.current_trick
+        if trick and SUIT_OF[card] != SUIT_OF[trick[0][1]]:
+            self.voids[p_idx] |= 1 << SUIT_OF[trick[0][1]]
+        trick.append((p_idx, card))
+        # Track the running trick winner so bots and scoring never rescan it
+        best = self.trick_best
+        if best is None or beats(card, best, SUIT_OF[trick[0][1]], self.trump_suit):
+            self.trick_winner_idx, self.trick_best = p_idx, card
+        if len(trick) == 4:
+            self.evaluate_trick()
+        else:
+            self.turn_idx = (p_idx + 1) % 4
+
+    def evaluate_trick(self):
+        winner_idx = self.trick_winner_idx
+        self.tricks_won[winner_idx] += 1
+        self.trick_starter = winner_idx
+        self.turn_idx = winner_idx
+        self.current_trick = []
+        self.trick_best = None
+        if not self.hands[0]:
+            self.calculate_scores()
+            self.state = STATE_ROUND_END
+
+    def calculate_scores(self):
+        t = self.tricks_won
+        da, db, self.message = score_round(t[0] + t[2], t[1] + t[3], self.bid_winner, self.highest_bid)
+        self.last_delta = (da, db)
+        self.team_a_score += da
+        self.team_b_score += db
+
+def simulate(rounds, seed=None, policies=None, rigged=True, deal_policy=None):
+    # Plays `rounds` independent rounds and returns the engine (for scores)
+    engine = TarneebEngine(seed, policies, rigged, deal_policy)
+    for _ in range(rounds):
+        engine.play_round()
+        engine.next_round()
+    return engine
+
+if __name__ == "__main__":
+    import time
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    t0 = time.perf_counter()
+    e = simulate(n, seed=0)
+    dt = time.perf_counter() - t0
+    print(f"{n} rounds in {dt:.2f}s ({n/dt:.0f} rounds/s)  A={e.team_a_score} B={e.team_b_score}")
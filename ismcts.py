@@ -0,0 +1,414 @@
+import argparse
+import math
+import random
+import time
+from array import array
+
+from bitboard import SUIT_OF, FULL_DECK, cards_of, valid_mask
+from engine import BotPolicy, STATE_ROUND_END, beats, bot_bid, bot_play, bot_trump, score_round, trick_winner
+from mcbot import Position, sample_hands
+
+# Information-set Monte Carlo tree search (single observer). Each iteration
+# deals the unseen cards one way consistent with what the seat knows (as
+# mcbot.sample_hands), walks the tree choosing only among moves legal in that
+# deal, adds one node and plays the rest out with the default bots. A child's
+# availability counts the iterations in which it could have been chosen, and
+# stands in for the parent's visits in UCB.
+#
+# Card play keeps one tree per seat for the whole round: when the seat is
+# asked again, the root is advanced along the cards played since, so the
+# statistics gathered under them carry over. Bidding searches one level (the
+# seat's own bid) with the rest of the auction and the play left to the
+# default bots.
+#
+# Nodes live in parallel arrays, not objects: about 34 bytes each. A tree
+# that reaches its node cap drops everything outside the current root, then
+# the least visited nodes, until it is back to half the cap.
+#
+# Rewards are the round's score difference (score_round) for the team that
+# made the move, scaled to 0..1, so contracts count and not just tricks.
+
+DEFAULT_BUDGET = 0.5    # seconds per decision; the UI paces bots at 800 ms
+MAX_NODES = 200000      # per tree, about 7 MB
+EXPLORATION = 0.7
+KEEP = 0.5              # share of the cap an eviction leaves in use
+SPREAD = 52             # score differences run from -26 to 26
+
+class Tree:
+    # Node i: its move and the seat that made it, first child and next
+    # sibling (-1 = none), visits, availability, total reward, and a mask of
+    # the moves already expanded under it
+    FIELDS = (('first', 'i'), ('sibling', 'i'), ('move', 'b'), ('seat', 'b'),
+              ('visits', 'i'), ('avail', 'i'), ('reward', 'd'), ('tried', 'Q'))
+
+    def __init__(self, max_nodes=MAX_NODES, key=None):
+        self.max_nodes = max_nodes
+        self.key = key       # what the tree is valid for (the deal, trump, ...)
+        self.plays = []      # cards played before the root
+        self.evictions = 0
+        self.clear()
+
+    def clear(self):
+        for name, code in self.FIELDS:
+            setattr(self, name, array(code))
+        self.root = self.add(-1, -1)
+
+    def __len__(self):
+        return len(self.visits)
+
+    def nbytes(self):
+        return sum(getattr(self, name).itemsize for name, _ in self.FIELDS) * len(self)
+
+    def add(self, move, seat):
+        self.first.append(-1)
+        self.sibling.append(-1)
+        self.move.append(move)
+        self.seat.append(seat)
+        self.visits.append(0)
+        self.avail.append(0)
+        self.reward.append(0.0)
+        self.tried.append(0)
+        return len(self.visits) - 1
+
+    def add_child(self, parent, move, seat):
+        # -1 when the tree is full
+        if len(self.visits) >= self.max_nodes: return -1
+        n = self.add(move, seat)
+        self.sibling[n] = self.first[parent]
+        self.first[parent] = n
+        self.tried[parent] |= 1 << move
+        return n
+
+    def child(self, node, move):
+        c = self.first[node]
+        while c >= 0 and self.move[c] != move:
+            c = self.sibling[c]
+        return c
+
+    def advance(self, plays):
+        # Moves the root down the cards played since; False if the tree does
+        # not lead there (a different round, or a line it never expanded)
+        n = len(self.plays)
+        if plays[:n] != self.plays: return False
+        for card in plays[n:]:
+            c = self.child(self.root, card)
+            if c < 0: return False
+            self.root = c
+        self.plays = list(plays)
+        return True
+
+    def evict(self):
+        # Rebuilds the arrays from the root's subtree, keeping only nodes
+        # visited more than the cut. A parent has at least its children's
+        # visits, so what is kept is still one tree
+        order = [self.root]
+        for n in order:
+            c = self.first[n]
+            while c >= 0:
+                order.append(c)
+                c = self.sibling[c]
+        keep = int(self.max_nodes * KEEP)
+        cut = sorted((self.visits[n] for n in order), reverse=True)[keep] if len(order) > keep else -1
+        old = {name: getattr(self, name) for name, _ in self.FIELDS}
+        for name, code in self.FIELDS:
+            setattr(self, name, array(code))
+        index = {}
+        for n in order:
+            if n != self.root and old['visits'][n] <= cut: continue
+            i = index[n] = len(self.visits)
+            for name, _ in self.FIELDS:
+                getattr(self, name).append(old[name][n])
+            self.first[i] = self.sibling[i] = -1
+            self.tried[i] = 0
+        # Relink the survivors; dropped children become untried again
+        for n, i in index.items():
+            c = old['first'][n]
+            while c >= 0:
+                j = index.get(c)
+                if j is not None:
+                    self.sibling[j] = self.first[i]
+                    self.first[i] = j
+                    self.tried[i] |= 1 << self.move[j]
+                c = old['sibling'][c]
+        self.root = index[self.root]
+        self.evictions += 1
+
+def playout(hands, trick, seat, trump, win_seat, win_card, a, b):
+    # Default bots play the round out, `seat` to move; team A and B tricks
+    lead = SUIT_OF[trick[0][1]] if trick else -1
+    while hands[seat]:
+        card = bot_play(hands[seat], trick, trump, seat, win_seat, win_card)
+        hands[seat] &= ~(1 << card)
+        if not trick:
+            lead, win_seat, win_card = SUIT_OF[card], seat, card
+        elif beats(card, win_card, lead, trump):
+            win_seat, win_card = seat, card
+        trick.append((seat, card))
+        if len(trick) == 4:
+            if win_seat & 1: b += 1
+            else: a += 1
+            seat, trick = win_seat, []
+        else:
+            seat = (seat + 1) & 3
+    return a, b
+
+def team_a_reward(a, b, bid_winner, bid):
+    da, db, _ = score_round(a, b, bid_winner, bid)
+    return (da - db) / SPREAD + 0.5
+
+def select(tree, node, legal, c_explore):
+    # UCB over the children legal in this iteration's deal; their
+    # availability goes up whether or not they are picked
+    best, best_v = -1, -1.0
+    move, avail, visits, reward = tree.move, tree.avail, tree.visits, tree.reward
+    c = tree.first[node]
+    while c >= 0:
+        if legal >> move[c] & 1:
+            avail[c] += 1
+            n = visits[c]
+            v = reward[c] / n + c_explore * math.sqrt(math.log(avail[c]) / n)
+            if v > best_v: best, best_v = c, v
+        c = tree.sibling[c]
+    return best
+
+def backpropagate(tree, path, r):
+    # r is team A's reward; each node scores it for the team that moved into it
+    visits, reward, seat = tree.visits, tree.reward, tree.seat
+    for n in path:
+        visits[n] += 1
+        reward[n] += 1 - r if seat[n] & 1 else r
+
+def most_visited(tree, legal):
+    best, most = -1, -1
+    c = tree.first[tree.root]
+    while c >= 0:
+        if legal >> tree.move[c] & 1 and tree.visits[c] > most:
+            best, most = tree.move[c], tree.visits[c]
+        c = tree.sibling[c]
+    return best
+
+class Search:
+    # One decision's worth of iterations on a tree. run() stops at the
+    # iteration count if one is given, else when the time budget is spent
+    def __init__(self, tree, rng, c_explore=EXPLORATION):
+        self.tree = tree
+        self.rng = rng
+        self.c_explore = c_explore
+        self.reused = tree.visits[tree.root]
+        self.iterations = 0
+        self.seconds = 0.0
+
+    def run(self, iterate, budget=DEFAULT_BUDGET, iterations=None):
+        t0 = time.perf_counter()
+        deadline = t0 + budget
+        tree = self.tree
+        done = 0
+        while done < iterations if iterations is not None else time.perf_counter() < deadline:
+            if len(tree) >= tree.max_nodes:
+                tree.evict()
+            if not iterate(): break
+            done += 1
+        self.iterations += done
+        self.seconds += time.perf_counter() - t0
+
+    def stats(self):
+        return {'iterations': self.iterations, 'seconds': self.seconds,
+                'per_second': self.iterations / self.seconds if self.seconds else 0.0,
+                'reused': self.reused, 'nodes': len(self.tree), 'bytes': self.tree.nbytes()}
+
+class PlaySearch(Search):
+    def __init__(self, tree, engine, seat, rng, c_explore=EXPLORATION):
+        super().__init__(tree, rng, c_explore)
+        self.pos = Position.from_engine(engine, seat)
+        self.trump = engine.trump_suit
+        self.bid_winner, self.bid = engine.bid_winner, engine.highest_bid
+        t = engine.tricks_won
+        self.a, self.b = t[0] + t[2], t[1] + t[3]
+        trick = engine.current_trick
+        self.winner = trick_winner(trick, self.trump) if trick else (-1, -1)
+        self.legal = engine.legal_mask(seat)
+
+    def iterate(self):
+        pos, tree, trump = self.pos, self.tree, self.trump
+        hands = sample_hands(pos, self.rng)
+        if hands is None: return False
+        trick = list(pos.trick)
+        lead = SUIT_OF[trick[0][1]] if trick else None
+        win_seat, win_card = self.winner
+        seat, a, b = pos.seat, self.a, self.b
+        node = tree.root
+        path = [node]
+        tried = tree.tried
+        # Down the tree until a move is expanded, or the tree is full
+        while hands[seat]:
+            legal = valid_mask(hands[seat], lead)
+            untried = legal & ~tried[node]
+            if untried:
+                card = self.rng.choice(cards_of(untried))
+                node = tree.add_child(node, card, seat)
+                if node < 0: break
+            else:
+                node = select(tree, node, legal, self.c_explore)
+                card = tree.move[node]
+            path.append(node)
+            hands[seat] &= ~(1 << card)
+            if not trick:
+                lead, win_seat, win_card = SUIT_OF[card], seat, card
+            elif beats(card, win_card, lead, trump):
+                win_seat, win_card = seat, card
+            trick.append((seat, card))
+            if len(trick) == 4:
+                if win_seat & 1: b += 1
+                else: a += 1
+                seat, trick, lead = win_seat, [], None
+            else:
+                seat = (seat + 1) & 3
+            if untried: break
+        a, b = playout(hands, trick, seat, trump, win_seat, win_card, a, b)
+        backpropagate(tree, path, team_a_reward(a, b, self.bid_winner, self.bid))
+        return True
+
+    def best(self):
+        return most_visited(self.tree, self.legal)
+
+class BidSearch(Search):
+    # Moves are bids (0 = pass); the tree is the root and one child per bid
+    def __init__(self, tree, engine, seat, rng, c_explore=EXPLORATION):
+        super().__init__(tree, rng, c_explore)
+        self.engine = engine
+        self.seat = seat
+        self.hand = engine.hands[seat]
+        self.unseen = cards_of(FULL_DECK & ~self.hand)
+        self.legal = 1 | ((1 << 14) - (1 << engine.highest_bid + 1) if engine.highest_bid < 13 else 0)
+
+    def deal(self):
+        # The other three hands, 13 cards each
+        self.rng.shuffle(self.unseen)
+        hands = [0, 0, 0, 0]
+        hands[self.seat] = self.hand
+        others = [s for s in range(4) if s != self.seat]
+        for i, c in enumerate(self.unseen):
+            hands[others[i // 13]] |= 1 << c
+        return hands
+
+    def iterate(self):
+        tree, e, seat = self.tree, self.engine, self.seat
+        hands = self.deal()
+        root = tree.root
+        untried = self.legal & ~tree.tried[root]
+        if untried:
+            node = tree.add_child(root, self.rng.choice(cards_of(untried)), seat)
+        else:
+            node = select(tree, root, self.legal, self.c_explore)
+        bid = tree.move[node]
+
+        # The rest of the auction, as TarneebEngine._step_bidding
+        passed, highest, winner = e.passed[:], e.highest_bid, e.bid_winner
+        if bid > highest: highest, winner = bid, seat
+        else: passed[seat] = True
+        bidder = (seat + 1) % 4
+        while True:
+            if all(passed):
+                r = 0.5  # redeal: nobody scores
+                break
+            if passed.count(False) == 1 and highest > 6:
+                trump = bot_trump(hands[winner])
+                a, b = playout(hands, [], winner, trump, -1, -1, 0, 0)
+                r = team_a_reward(a, b, winner, highest)
+                break
+            if not passed[bidder]:
+                v = bot_bid(hands[bidder], highest)
+                if v > highest: highest, winner = v, bidder
+                else: passed[bidder] = True
+            bidder = (bidder + 1) % 4
+        backpropagate(tree, (root, node), r)
+        return True
+
+    def best(self):
+        return most_visited(self.tree, self.legal)
+
+class ISMCTSPolicy(BotPolicy):
+    # Bids and plays by ISMCTS, picks trump like the default bot. With
+    # `iterations` set every decision runs exactly that many (reproducible
+    # for a seed), else each runs for `budget` seconds. last_search holds the
+    # most recent decision's Search for its stats()
+    def __init__(self, budget=DEFAULT_BUDGET, iterations=None, max_nodes=MAX_NODES,
+                 c_explore=EXPLORATION, seed=None):
+        self.budget = budget
+        self.iterations = iterations
+        self.max_nodes = max_nodes
+        self.c_explore = c_explore
+        self.rng = random.Random(seed)
+        self.trees = {}  # seat -> card play tree for the current round
+        self.last_search = None
+
+    def bid(self, engine, seat):
+        if engine.highest_bid >= 13: return 0
+        search = BidSearch(Tree(self.max_nodes), engine, seat, self.rng, self.c_explore)
+        search.run(search.iterate, self.budget, self.iterations)
+        self.last_search = search
+        return search.best()
+
+    def play(self, engine, seat):
+        key = (engine.dealt[seat], engine.trump_suit, engine.bid_winner)
+        tree = self.trees.get(seat)
+        if tree is None or tree.key != key or not tree.advance(engine.plays):
+            tree = self.trees[seat] = Tree(self.max_nodes, key)
+            tree.plays = list(engine.plays)
+        search = PlaySearch(tree, engine, seat, self.rng, self.c_explore)
+        self.last_search = search
+        if search.legal & (search.legal - 1):
+            search.run(search.iterate, self.budget, self.iterations)
+            return search.best()
+        return search.legal.bit_length() - 1  # forced
+
+def duel(rounds, seed=0, **options):
+    # ISMCTS against the default bot on the same deals with the teams
+    # swapped: returns (ISMCTS points minus bot points, per-decision stats)
+    from engine import TarneebEngine
+    diff = 0
+    stats = {'bid': [], 'play': []}
+    for swap in (0, 1):
+        policy = ISMCTSPolicy(seed=seed, **options)
+        seats = [policy, BotPolicy()] * 2 if not swap else [BotPolicy(), policy] * 2
+        engine = TarneebEngine(seed, seats)
+        for _ in range(rounds):
+            while engine.state != STATE_ROUND_END:
+                seat = engine.to_act()
+                before = policy.last_search
+                engine.step()
+                s = policy.last_search
+                if s is not before and seats[seat] is policy and s.iterations:
+                    stats['bid' if isinstance(s, BidSearch) else 'play'].append(s.stats())
+            engine.next_round()
+        mine, theirs = engine.team_a_score, engine.team_b_score
+        diff += mine - theirs if not swap else theirs - mine
+    return diff, stats
+
+def summarize(kind, stats):
+    if not stats: return f"{kind}: no searches"
+    n = len(stats)
+    iterations = sum(s['iterations'] for s in stats)
+    seconds = sum(s['seconds'] for s in stats)
+    line = (f"{kind}: {n} searches, {iterations / n:.0f} iterations each, "
+            f"{iterations / seconds if seconds else 0:.0f} iterations/s")
+    if kind == 'play':
+        line += (f", {sum(s['reused'] for s in stats) / n:.0f} visits reused at the root, "
+                 f"up to {max(s['nodes'] for s in stats)} nodes ({max(s['bytes'] for s in stats) / 2**20:.1f} MB)")
+    return line
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="ISMCTS against the default bot on paired deals")
+    parser.add_argument('--rounds', type=int, default=20, help="rounds per side")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--budget', type=float, default=DEFAULT_BUDGET, help="seconds per decision")
+    parser.add_argument('--iterations', type=int, default=None, help="iterations per decision instead of a time budget")
+    parser.add_argument('--max-nodes', type=int, default=MAX_NODES, help="node cap per tree")
+    parser.add_argument('--c', type=float, default=EXPLORATION, help="UCB exploration constant")
+    args = parser.parse_args()
+
+    diff, stats = duel(args.rounds, args.seed, budget=args.budget, iterations=args.iterations,
+                       max_nodes=args.max_nodes, c_explore=args.c)
+    print(summarize('bid', stats['bid']))
+    print(summarize('play', stats['play']))
+    print(f"ISMCTS minus bot over {2 * args.rounds} rounds: {diff:+d} points ({diff / (2 * args.rounds):+.2f} per round)")
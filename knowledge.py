@@ -0,0 +1,80 @@
+from bitboard import LANE, SUIT_OF, suit_counts, valid_mask
+from engine import beats, trick_winner
+
+# What one seat knows during card play: its own hand, every card played so
+# far, the suits each seat has shown out of and the trick in progress. Every
+# played card is an O(1) observe(), and the questions bots ask (suit counts,
+# the highest card still out in a suit, trumps left, voids, who is winning
+# the trick) are a few bit operations, with no rescanning of hands or tricks.
+
+class HandKnowledge:
+    def __init__(self, seat, hand, trump=None, played=0, voids=(0, 0, 0, 0), trick=()):
+        self.seat = seat
+        self.hand = hand
+        self.counts = suit_counts(hand)
+        self.trump = trump
+        self.played = played        # mask of every card played
+        self.voids = list(voids)    # per seat, bit s set = shown out of suit s
+        self.trick = list(trick)    # (seat, card) so far; cleared on the next lead
+        self.winner, self.best = trick_winner(self.trick, trump) if self.trick else (-1, -1)
+
+    @classmethod
+    def from_engine(cls, engine, seat):
+        return cls(seat, engine.hands[seat], engine.trump_suit, engine.played,
+                   engine.voids, engine.current_trick)
+
+    def observe(self, seat, card):
+        # Call for every card played, by any seat, in play order
+        trick = self.trick
+        if len(trick) == 4:
+            trick.clear()
+        s = SUIT_OF[card]
+        self.played |= 1 << card
+        if seat == self.seat:
+            self.hand &= ~(1 << card)
+            self.counts[s] -= 1
+        if trick:
+            lead = SUIT_OF[trick[0][1]]
+            if s != lead:
+                self.voids[seat] |= 1 << lead
+            if beats(card, self.best, lead, self.trump):
+                self.winner, self.best = seat, card
+        else:
+            self.winner, self.best = seat, card
+        trick.append((seat, card))
+
+    # --- Queries ---
+    def lead_suit(self):
+        # Suit to follow, or None when this seat would lead
+        return SUIT_OF[self.trick[0][1]] if 0 < len(self.trick) < 4 else None
+
+    def legal(self):
+        return valid_mask(self.hand, self.lead_suit())
+
+    def count(self, suit):
+        return self.counts[suit]
+
+    def unplayed(self, suit):
+        # Lane of the suit's cards not yet played, in any hand
+        return ~(self.played >> (13 * suit)) & LANE
+
+    def boss(self, suit):
+        # Highest card of the suit still to be played, or -1
+        lane = self.unplayed(suit)
+        return 13 * suit + lane.bit_length() - 1 if lane else -1
+
+    def is_boss(self, card):
+        return card == self.boss(SUIT_OF[card])
+
+    def outstanding(self, suit):
+        # Cards of the suit the other three seats still hold between them
+        return (~((self.played | self.hand) >> (13 * suit)) & LANE).bit_count()
+
+    def trumps_out(self):
+        return self.outstanding(self.trump) if self.trump is not None else 0
+
+    def is_void(self, seat, suit):
+        return self.voids[seat] >> suit & 1 == 1
+
+    def partner_winning(self):
+        return 0 < len(self.trick) < 4 and self.winner == (self.seat + 2) % 4
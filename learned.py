@@ -0,0 +1,339 @@
+import os
+import sys
+
+import numpy as np
+
+from bitboard import LANE, SUIT_OF, valid_mask
+from engine import BotPolicy
+
+# Learned bid and card evaluators: small two-layer networks in plain NumPy,
+# trained by selfplay.py on recorded self-play decisions. A decision is first
+# written down as an observation record (a row of ints, the columns below).
+# play_features() / bid_features() turn any number of rows into network
+# inputs at once, for training and batched evaluation; a single bot move
+# uses the sparse form of the same inputs (play_active() / bid_active()).
+#
+# Play features put the trump suit first and keep the other suits in order;
+# bid features order the suits longest first. Seats are taken relative to the
+# seat deciding. Outputs are 52 card scores (in the trump-first order) and 8
+# bid scores (pass, 7..13); illegal ones are masked before the argmax.
+#
+# The model ships as bot_model.npz next to this file. Without one (or with
+# one of another MODEL_VERSION) LearnedPolicy plays like the default bot.
+
+MODEL_VERSION = 1    # bump when the features or outputs change
+MODEL_FILE = 'bot_model.npz'
+
+# (name, dtype) of an observation; cards are -1 when absent
+PLAY_COLUMNS = (('deal', 'u8'), ('seat', 'u1'), ('hand', 'u8'), ('played', 'u8'),
+                ('trick0', 'i1'), ('trick1', 'i1'), ('trick2', 'i1'), ('best', 'i1'), ('winner', 'i1'),
+                ('trump', 'u1'), ('declarer', 'u1'), ('bid', 'u1'), ('won_a', 'u1'), ('won_b', 'u1'),
+                ('voids', 'u2'), ('legal', 'u8'))
+BID_COLUMNS = (('deal', 'u8'), ('seat', 'u1'), ('hand', 'u8'), ('highest', 'u1'), ('leader', 'i1'),
+               ('passed', 'u1'), ('legal', 'u2'))
+BIDS = (0, 7, 8, 9, 10, 11, 12, 13)   # bid output i is BIDS[i]; 0 = pass
+
+PLAY_FEATURES = 52 * 4 + 1 + 1 + 4 + 12 + 1 + 7 + 2
+BID_FEATURES = 52 + 4 + 8 + 5 + 3
+
+SHIFTS = np.arange(4, dtype=np.uint64) * np.uint64(13)
+BITS = np.arange(52, dtype=np.uint64)
+POPCOUNT = np.array([bin(lane).count('1') for lane in range(1 << 13)], dtype=np.int64)
+# CANON[t, s]: position of suit s when trump t goes first; SUIT_AT is its inverse
+CANON = np.array([[0 if s == t else s + (s < t) for s in range(4)] for t in range(4)])
+SUIT_AT = np.argsort(CANON, axis=1)
+SUIT_OF_NP = np.array(SUIT_OF)
+BID_BITS = np.array(BIDS, dtype=np.uint64)
+
+# --- Observations ---
+def play_observation(engine, seat):
+    e = engine
+    trick = e.current_trick
+    cards = [c for _, c in trick] + [-1] * (3 - len(trick))
+    winner, best = (e.trick_winner_idx, e.trick_best) if trick else (-1, -1)
+    played = e.played
+    for _, c in trick: played &= ~(1 << c)
+    t = e.tricks_won
+    voids = e.voids[0] | e.voids[1] << 4 | e.voids[2] << 8 | e.voids[3] << 12
+    return (e.deal_seed, seat, e.hands[seat], played, *cards, best, winner, e.trump_suit, e.bid_winner,
+            e.highest_bid, t[0] + t[2], t[1] + t[3], voids, e.legal_mask(seat))
+
+def bid_observation(engine, seat):
+    # legal: bit 0 to pass, bit b to bid b
+    e = engine
+    legal = 1 | ((1 << 14) - (1 << e.highest_bid + 1) if e.highest_bid < 13 else 0)
+    passed = sum(1 << s for s in range(4) if e.passed[s])
+    leader = e.bid_winner if e.highest_bid > 6 else -1
+    return (e.deal_seed, seat, e.hands[seat], e.highest_bid, leader, passed, legal)
+
+def columns(rows, spec):
+    # Observation tuples (possibly with more fields after) -> named arrays
+    if not rows:
+        return {name: np.zeros(0, dtype=dtype) for name, dtype in spec}
+    cols = list(zip(*rows))
+    return {name: np.array(col, dtype=dtype) for (name, dtype), col in zip(spec, cols)}
+
+# --- Features ---
+def bits(masks):
+    return ((masks[:, None] >> BITS) & np.uint64(1)).astype(np.float32)
+
+def suit_lanes(masks):
+    return ((masks[:, None] >> SHIFTS) & np.uint64(LANE)).astype(np.int64)
+
+def reorder(masks, positions):
+    # Masks with suit s moved to lane positions[:, s]
+    lanes = suit_lanes(masks).astype(np.uint64)
+    return (lanes << (positions.astype(np.uint64) * np.uint64(13))).sum(axis=1, dtype=np.uint64)
+
+def card_mask(cards):
+    c = cards.astype(np.int64)
+    return np.where(c >= 0, np.uint64(1) << np.maximum(c, 0).astype(np.uint64), np.uint64(0))
+
+def one_hot(index, size):
+    # Rows with index < 0 stay zero
+    out = np.zeros((len(index), size), dtype=np.float32)
+    rows = np.flatnonzero(index >= 0)
+    out[rows, index[rows]] = 1
+    return out
+
+def play_features(cols):
+    seat = cols['seat'].astype(np.int64)
+    trump = cols['trump'].astype(np.int64)
+    pos = CANON[trump]
+    table = card_mask(cols['trick0']) | card_mask(cols['trick1']) | card_mask(cols['trick2'])
+    best = cols['best'].astype(np.int64)
+    best_c = np.where(best >= 0, pos[np.arange(len(best)), SUIT_OF_NP[np.maximum(best, 0)]] * 13 + best % 13, -1)
+    lead = cols['trick0'].astype(np.int64)
+    lead_c = np.where(lead >= 0, pos[np.arange(len(lead)), SUIT_OF_NP[np.maximum(lead, 0)]], -1)
+    winner = cols['winner'].astype(np.int64)
+    partner_winning = (winner >= 0) & ((winner - seat) % 4 == 2)
+
+    # Voids of the next three seats, in trump-first suit order
+    voids = cols['voids'].astype(np.int64)
+    others = (seat[:, None] + np.arange(1, 4)) % 4
+    v = (voids[:, None] >> (4 * others)) & 15
+    shown = (v[:, :, None] >> SUIT_AT[trump][:, None, :]) & 1
+
+    us = seat % 2
+    won_us = np.where(us == 0, cols['won_a'], cols['won_b'])
+    won_them = np.where(us == 0, cols['won_b'], cols['won_a'])
+    return np.hstack([
+        bits(reorder(cols['hand'], pos)),
+        bits(reorder(cols['played'], pos)),
+        bits(reorder(table, pos)),
+        one_hot(best_c, 52),
+        partner_winning[:, None],
+        (lead < 0)[:, None],
+        one_hot(lead_c, 4),
+        shown.reshape(-1, 12),
+        ((cols['declarer'].astype(np.int64) - seat) % 2 == 0)[:, None],
+        one_hot(cols['bid'].astype(np.int64) - 7, 7),
+        won_us[:, None] / 13,
+        won_them[:, None] / 13,
+    ]).astype(np.float32)
+
+def bid_order(masks):
+    # Per row, the suits longest first (ties: higher cards first)
+    lanes = suit_lanes(masks)
+    order = np.argsort(-(POPCOUNT[lanes] << 13 | lanes), axis=1, kind='stable')
+    return np.argsort(order, axis=1), POPCOUNT[np.take_along_axis(lanes, order, axis=1)]
+
+def bid_features(cols):
+    seat = cols['seat'].astype(np.int64)
+    pos, lengths = bid_order(cols['hand'])
+    leader = cols['leader'].astype(np.int64)
+    passed = cols['passed'].astype(np.int64)
+    others = (seat[:, None] + np.arange(1, 4)) % 4
+    return np.hstack([
+        bits(reorder(cols['hand'], pos)),
+        lengths / 13,
+        one_hot(cols['highest'].astype(np.int64) - 6, 8),
+        one_hot(np.where(leader >= 0, 1 + (leader - seat) % 4, 0), 5),
+        (passed[:, None] >> others) & 1,
+    ]).astype(np.float32)
+
+def legal_outputs(cols, kind):
+    # (n, outputs) bool: which outputs are legal, in the network's order
+    legal = cols['legal']
+    if kind == 'bid':
+        return ((legal.astype(np.uint64)[:, None] >> BID_BITS) & np.uint64(1)).astype(bool)
+    return bits(reorder(legal, CANON[cols['trump'].astype(np.int64)])).astype(bool)
+
+def action_index(cols, actions, kind):
+    # Recorded actions -> output index
+    a = np.asarray(actions).astype(np.int64)
+    if kind == 'bid':
+        return np.where(a == 0, 0, a - 6)
+    suit = CANON[cols['trump'].astype(np.int64), SUIT_OF_NP[a]]
+    return suit * 13 + a % 13
+
+FEATURES = {'play': play_features, 'bid': bid_features}
+
+# --- One observation ---
+# The same features for a single decision, as the indices of the inputs that
+# are 1 plus (index, value) for the rest. With them the first layer is a sum
+# of weight rows, which is what keeps a bot move in the tens of microseconds;
+# per-row NumPy calls on the batch code above cost several times that.
+CANON_ROWS = CANON.tolist()
+
+def canonical(mask, positions, base=0):
+    # Indices of the set bits once suit s is moved to lane positions[s]
+    out = []
+    for s in range(4):
+        lane = mask >> 13 * s & LANE
+        at = base + 13 * positions[s]
+        while lane:
+            low = lane & -lane
+            out.append(at + low.bit_length() - 1)
+            lane ^= low
+    return out
+
+def play_active(obs):
+    _, seat, hand, played, t0, t1, t2, best, winner, trump, declarer, bid, won_a, won_b, voids, _ = obs
+    pos = CANON_ROWS[trump]
+    table = sum(1 << c for c in (t0, t1, t2) if c >= 0)
+    ones = canonical(hand, pos) + canonical(played, pos, 52) + canonical(table, pos, 104)
+    if best >= 0: ones.append(156 + 13 * pos[SUIT_OF[best]] + best % 13)
+    if winner >= 0 and (winner - seat) % 4 == 2: ones.append(208)
+    if t0 < 0: ones.append(209)
+    else: ones.append(210 + pos[SUIT_OF[t0]])
+    for k in range(3):
+        v = voids >> 4 * ((seat + 1 + k) % 4) & 15
+        ones += [214 + 4 * k + pos[s] for s in range(4) if v >> s & 1]
+    if (declarer - seat) % 2 == 0: ones.append(226)
+    ones.append(227 + bid - 7)
+    won_us, won_them = (won_a, won_b) if seat % 2 == 0 else (won_b, won_a)
+    return ones, ((234, won_us / 13), (235, won_them / 13))
+
+def bid_active(obs):
+    _, seat, hand, highest, leader, passed, _ = obs
+    lanes = [hand >> 13 * s & LANE for s in range(4)]
+    order = sorted(range(4), key=lambda s: -(lanes[s].bit_count() << 13 | lanes[s]))
+    pos = [order.index(s) for s in range(4)]
+    ones = canonical(hand, pos)
+    ones.append(56 + highest - 6)
+    ones.append(64 + (1 + (leader - seat) % 4 if leader >= 0 else 0))
+    ones += [69 + k for k in range(3) if passed >> (seat + 1 + k) % 4 & 1]
+    return ones, tuple((52 + i, lanes[s].bit_count() / 13) for i, s in enumerate(order))
+
+ACTIVE = {'play': play_active, 'bid': bid_active}
+
+# --- Networks ---
+def init_weights(kind, hidden, rng):
+    n_in = PLAY_FEATURES if kind == 'play' else BID_FEATURES
+    n_out = 52 if kind == 'play' else len(BIDS)
+    return {'w1': (rng.standard_normal((n_in, hidden)) * np.sqrt(2 / n_in)).astype(np.float32),
+            'b1': np.zeros(hidden, dtype=np.float32),
+            'w2': (rng.standard_normal((hidden, n_out)) * np.sqrt(1 / hidden)).astype(np.float32),
+            'b2': np.zeros(n_out, dtype=np.float32)}
+
+def forward(w, x):
+    # (hidden activations, output scores)
+    h = np.maximum(x @ w['w1'] + w['b1'], 0)
+    return h, h @ w['w2'] + w['b2']
+
+def model_path():
+    # Frozen builds unpack data files under sys._MEIPASS
+    base = getattr(sys, '_MEIPASS', os.path.dirname(os.path.abspath(__file__)))
+    return os.path.join(base, MODEL_FILE)
+
+def save_model(path, heads):
+    # heads: kind -> weights; written then renamed, as the shards are
+    flat = {f'{kind}_{k}': v for kind, w in heads.items() for k, v in w.items()}
+    tmp = path + '.tmp'
+    with open(tmp, 'wb') as f:
+        np.savez(f, version=MODEL_VERSION, **flat)
+    os.replace(tmp, path)
+
+def load_model(path=None):
+    # kind -> weights, or None if there is no usable model
+    path = path or model_path()
+    if not os.path.exists(path):
+        return None
+    with np.load(path) as data:
+        version = int(data['version'])
+        if version != MODEL_VERSION:
+            print(f"{path}: model version {version}, expected {MODEL_VERSION}; "
+                  f"using the default bot", file=sys.stderr)
+            return None
+        heads = {}
+        for key in data.files:
+            kind, _, name = key.partition('_')
+            if name: heads.setdefault(kind, {})[name] = data[key]
+    return heads
+
+class Evaluator:
+    # Chooses actions for a batch of observation columns in one pass per head
+    def __init__(self, heads):
+        self.heads = heads
+
+    def scores(self, cols, kind):
+        _, z = forward(self.heads[kind], FEATURES[kind](cols))
+        return np.where(legal_outputs(cols, kind), z, -np.inf)
+
+    def play(self, cols):
+        best = self.scores(cols, 'play').argmax(axis=1)
+        suit = SUIT_AT[cols['trump'].astype(np.int64), best // 13]
+        return suit * 13 + best % 13
+
+    def bid(self, cols):
+        return np.asarray(BIDS)[self.scores(cols, 'bid').argmax(axis=1)]
+
+    def scores_one(self, obs, kind):
+        w = self.heads[kind]
+        ones, values = ACTIVE[kind](obs)
+        pre = w['b1'] + w['w1'][ones].sum(axis=0)
+        for i, x in values:
+            pre += x * w['w1'][i]
+        return np.maximum(pre, 0) @ w['w2'] + w['b2']
+
+    def play_one(self, obs):
+        # Best legal card for one play_observation()
+        trump, legal = obs[9], obs[-1]
+        moves = canonical(legal, CANON_ROWS[trump])
+        z = self.scores_one(obs, 'play')
+        best = moves[int(z[moves].argmax())]
+        return int(SUIT_AT[trump, best // 13]) * 13 + best % 13
+
+    def bid_one(self, obs):
+        legal = obs[-1]
+        moves = [i for i, b in enumerate(BIDS) if legal >> b & 1]
+        z = self.scores_one(obs, 'bid')
+        return BIDS[moves[int(z[moves].argmax())]]
+
+_model = None
+
+def evaluator():
+    # Shared Evaluator for the shipped model, or None without one
+    global _model
+    if _model is None:
+        heads = load_model()
+        _model = Evaluator(heads) if heads else False
+    return _model or None
+
+def use_model(path):
+    # Makes the model at `path` the shared one instead of the shipped file
+    global _model
+    heads = load_model(path)
+    if heads is None:
+        raise ValueError(f"{path}: no usable model")
+    _model = Evaluator(heads)
+
+class LearnedPolicy(BotPolicy):
+    # Bids and plays with the model's heads (each falls back to the default
+    # bot when the model lacks it); picks trump like the default bot
+    def __init__(self, model=None):
+        self.model = model or evaluator()
+
+    def bid(self, engine, seat):
+        if self.model is None or 'bid' not in self.model.heads:
+            return super().bid(engine, seat)
+        return self.model.bid_one(bid_observation(engine, seat))
+
+    def play(self, engine, seat):
+        legal = valid_mask(engine.hands[seat], engine.lead_suit())
+        if not legal & (legal - 1):
+            return legal.bit_length() - 1  # forced
+        if self.model is None or 'play' not in self.model.heads:
+            return super().play(engine, seat)
+        return self.model.play_one(play_observation(engine, seat))
@@ -0,0 +1,250 @@
+import argparse
+import asyncio
+import json
+import multiprocessing as mp
+import os
+import random
+import resource
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from bitboard import SUIT_OF, cards_of, valid_mask
+from engine import bot_bid, bot_trump
+from server import TableServer, encode
+
+# Load generator for the table server. Starts a server in its own process on
+# loopback, then fills it from client processes with scripted players that
+# bid and pick trump like the default bot and play a random legal card. Each
+# client works out its legal cards from its own hand and the trick, as
+# get_valid_moves does, and checks them against the server's.
+#
+# Reports per-action latency (from sending an action to seeing the server
+# broadcast it), tricks per second over the measured window, server memory
+# per table and the server's event-loop lag. Run e.g.
+#
+#   python loadtest.py --tables 1000 --humans 2 --duration 20
+
+LAG_INTERVAL = 0.01    # seconds between event-loop lag probes
+CONNECT_LIMIT = 200    # concurrent connection attempts per client process
+BACKLOG = 4096
+KINDS = ('join', 'bid', 'trump', 'play')
+
+def rss_bytes():
+    # Current resident set size (Linux), else the peak
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+def percentiles(samples, qs=(50, 95, 99)):
+    if not len(samples):
+        return [0.0] * (len(qs) + 1)
+    a = np.asarray(samples)
+    return [float(v) for v in np.percentile(a, qs)] + [float(a.max())]
+
+# --- Server process ---
+async def monitor_lag(lags):
+    # Appends how late each LAG_INTERVAL sleep wakes up, in ms
+    loop = asyncio.get_running_loop()
+    while True:
+        t0 = loop.time()
+        await asyncio.sleep(LAG_INTERVAL)
+        lags.append((loop.time() - t0 - LAG_INTERVAL) * 1e3)
+
+def server_main(pipe, bot, seed, model=None):
+    # Serves until told to stop; answers 'stats' and 'reset' over the pipe
+    if model:
+        from learned import use_model
+        use_model(model)
+    async def main():
+        loop = asyncio.get_running_loop()
+        server = TableServer(bot, seed=seed)
+        srv = await server.start('127.0.0.1', 0, backlog=BACKLOG)
+        lags = []
+        probe = asyncio.create_task(monitor_lag(lags))
+        base_rss = rss_bytes()
+        pipe.send(srv.sockets[0].getsockname()[1])
+        while True:
+            cmd = await loop.run_in_executor(None, pipe.recv)
+            if cmd == 'reset':
+                lags.clear()
+                if server.decision_stats() is not None:
+                    from decisions import shared_service
+                    shared_service().reset()
+            elif cmd == 'stats':
+                pipe.send({'tables': len(server.tables), 'connections': server.connections,
+                           'tricks': server.tricks, 'rounds': server.rounds, 'time': time.perf_counter(),
+                           'rss': rss_bytes(), 'base_rss': base_rss, 'lag': percentiles(lags),
+                           'decisions': server.decision_stats()})
+            else:
+                break
+        probe.cancel()
+        srv.close()
+    asyncio.run(main())
+
+# --- Client processes ---
+class Stats:
+    def __init__(self):
+        self.latency = {k: [] for k in KINDS}
+        self.mismatches = 0
+        self.errors = []
+        self.rounds = 0
+
+async def load_client(host, port, table, seat, deadline, stats, connect_slots, rng):
+    async with connect_slots:
+        t0 = time.perf_counter()
+        reader, writer = await asyncio.open_connection(host, port)
+        writer.write(encode({'op': 'join', 'table': table, 'seat': seat}))
+        reply = json.loads(await reader.readline())
+    if reply['t'] != 'joined':
+        stats.errors.append(reply.get('msg', reply['t']))
+        writer.close()
+        return
+    stats.latency['join'].append((time.perf_counter() - t0) * 1e3)
+    seat = reply['seat']
+    hand, lead, in_trick, sent = 0, None, 0, 0.0
+    async for line in reader:
+        msg = json.loads(line)
+        t = msg['t']
+        if t == 'play':
+            if in_trick == 0: lead = SUIT_OF[msg['card']]
+            in_trick = (in_trick + 1) % 4
+            if msg['seat'] == seat:
+                hand &= ~(1 << msg['card'])
+                if sent: stats.latency['play'].append((time.perf_counter() - sent) * 1e3)
+                sent = 0.0
+        elif t == 'deal':
+            hand, in_trick = msg['hand'], 0
+        elif t in ('bid', 'trump'):
+            if msg['seat'] == seat:
+                # Moves the server made for us (a forced pass or card) were never sent
+                if sent: stats.latency[t].append((time.perf_counter() - sent) * 1e3)
+                sent = 0.0
+        elif t == 'turn':
+            if time.perf_counter() >= deadline: break
+            kind = msg['kind']
+            if kind == 'bid':
+                action = {'op': 'bid', 'bid': bot_bid(hand, msg['highest'])}
+            elif kind == 'trump':
+                action = {'op': 'trump', 'suit': bot_trump(hand)}
+            else:
+                legal = valid_mask(hand, lead if in_trick else None)
+                if legal != msg['legal']:
+                    stats.mismatches += 1
+                    legal = msg['legal']
+                action = {'op': 'play', 'card': rng.choice(cards_of(legal))}
+            sent = time.perf_counter()
+            writer.write(encode(action))
+        elif t == 'round':
+            stats.rounds += 1
+        elif t == 'error':
+            stats.errors.append(msg['msg'])
+    writer.close()
+
+def client_main(job):
+    # Runs one process's share of the clients; returns their samples
+    host, port, seats, deadline, seed = job
+    async def main():
+        stats = Stats()
+        slots = asyncio.Semaphore(CONNECT_LIMIT)
+        rng = random.Random(seed)
+        results = await asyncio.gather(*(load_client(host, port, table, seat, deadline, stats, slots, rng)
+                                         for table, seat in seats), return_exceptions=True)
+        stats.errors += [repr(r) for r in results if isinstance(r, BaseException)]
+        return stats
+    stats = asyncio.run(main())
+    return stats.latency, stats.mismatches, stats.errors[:20], stats.rounds
+
+def run_load(tables, humans, duration, warmup=2.0, procs=None, bot='bot', seed=0, model=None, progress=print):
+    pipe, child = mp.Pipe()
+    server = mp.Process(target=server_main, args=(child, bot, seed, model), daemon=True)
+    server.start()
+    port = pipe.recv()
+
+    procs = procs or max(1, (os.cpu_count() or 2) - 1)
+    seats = [(f"load{t}", s) for t in range(tables) for s in range(humans)]
+    deadline = time.perf_counter() + warmup + duration  # perf_counter is system-wide on Linux
+    jobs = [('127.0.0.1', port, seats[i::procs], deadline, seed + i) for i in range(procs)]
+    progress(f"{len(seats)} clients at {tables} tables from {procs} processes; "
+             f"{warmup:.0f}s warm-up, {duration:.0f}s measured")
+    with ProcessPoolExecutor(procs) as pool:
+        futures = [pool.submit(client_main, job) for job in jobs]
+        time.sleep(warmup)
+        pipe.send('reset')
+        pipe.send('stats')
+        before = pipe.recv()
+        time.sleep(max(0.0, deadline - time.perf_counter()))
+        pipe.send('stats')
+        after = pipe.recv()
+        parts = [f.result() for f in futures]
+    pipe.send('stop')
+    server.join(5)
+
+    latency = {k: [] for k in KINDS}
+    mismatches, errors, rounds = 0, [], 0
+    for lat, mis, err, r in parts:
+        for k in KINDS: latency[k] += lat[k]
+        mismatches += mis
+        errors += err
+        rounds += r
+    dt = after['time'] - before['time']
+    return {
+        'tables': tables, 'clients': len(seats), 'bot': bot,
+        'tables_open': after['tables'],
+        'tricks_per_s': (after['tricks'] - before['tricks']) / dt,
+        'rounds_per_s': (after['rounds'] - before['rounds']) / dt,
+        'latency_ms': {k: dict(zip(('p50', 'p95', 'p99', 'max'), percentiles(v)), n=len(v))
+                       for k, v in latency.items()},
+        'loop_lag_ms': dict(zip(('p50', 'p95', 'p99', 'max'), after['lag'])),
+        'rss_mb': after['rss'] / 2**20,
+        'kb_per_table': (after['rss'] - after['base_rss']) / max(after['tables'], 1) / 1024,
+        'legal_mismatches': mismatches,
+        'decisions': after['decisions'],
+        'errors': errors,
+    }
+
+def report(r):
+    lines = [f"{r['clients']} clients at {r['tables']} tables ({r['tables_open']} open when measured), "
+             f"bots: {r['bot']}",
+             f"Throughput: {r['tricks_per_s']:.0f} tricks/s, {r['rounds_per_s']:.1f} rounds/s",
+             f"{'latency ms':12}{'n':>9}{'p50':>9}{'p95':>9}{'p99':>9}{'max':>9}"]
+    for k, v in r['latency_ms'].items():
+        lines.append(f"  {k:10}{v['n']:9d}{v['p50']:9.2f}{v['p95']:9.2f}{v['p99']:9.2f}{v['max']:9.2f}")
+    lag = r['loop_lag_ms']
+    lines.append(f"Event-loop lag ms: p50 {lag['p50']:.2f}, p95 {lag['p95']:.2f}, "
+                 f"p99 {lag['p99']:.2f}, max {lag['max']:.2f}")
+    lines.append(f"Server memory: {r['rss_mb']:.1f} MB RSS, {r['kb_per_table']:.1f} KB per table")
+    d = r.get('decisions')
+    if d:
+        lat, depth = d['latency_ms'], d['queue_depth']
+        lines.append(f"Bot decisions: {d['decided']} in {d['batches']} batches of {d['mean_batch']:.1f} on average; "
+                     f"latency ms p50 {lat['p50']:.2f}, p99 {lat['p99']:.2f}, max {lat['max']:.2f}; "
+                     f"queue depth mean {depth['mean']:.1f}, max {depth['max']}")
+    lines.append(f"Legal-move mismatches: {r['legal_mismatches']}, errors: {len(r['errors'])}")
+    lines += [f"  {e}" for e in r['errors'][:5]]
+    return "\n".join(lines)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load-test the table server on loopback")
+    parser.add_argument('--tables', type=int, default=500)
+    parser.add_argument('--humans', type=int, default=2, help="scripted clients per table (1-4)")
+    parser.add_argument('--duration', type=float, default=10.0, help="measured seconds")
+    parser.add_argument('--warmup', type=float, default=2.0, help="seconds before measuring")
+    parser.add_argument('--procs', type=int, default=None, help="client processes (default: cores - 1)")
+    parser.add_argument('--bot', default='bot', help="policy for empty seats")
+    parser.add_argument('--model', default=None, help="model for the learned and batched bots (selfplay.py)")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', help="also write the results to this file")
+    args = parser.parse_args()
+    if not 1 <= args.humans <= 4:
+        parser.error("--humans must be 1-4")
+
+    result = run_load(args.tables, args.humans, args.duration, args.warmup, args.procs, args.bot, args.seed,
+                      args.model)
+    print(report(result))
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(result, f, indent=2)
@@ -0,0 +1,217 @@
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from bitboard import SUIT_OF, SUIT_MASKS, FULL_DECK, cards_of
+from engine import BotPolicy, beats, bot_play
+import dds
+
+# Monte Carlo card play: deal the unseen cards to the other three seats in
+# ways consistent with what has been played and with revealed voids, score
+# every legal card on each sample, and play the best average.
+#
+# Searches are anytime: MonteCarloSearch.run() can be called repeatedly and
+# best() is valid after the first sample. With workers > 0 the samples are
+# spread over a process pool, so more cores give more samples per move.
+
+DEFAULT_BUDGET = 0.5   # seconds per move; the UI paces bots at 800 ms
+SOLVE_BELOW = 5        # tricks left at which samples are solved exactly
+
+class Position:
+    # Everything the bot at `seat` is allowed to know, as plain picklable ints
+    def __init__(self, seat, hand, hand_sizes, played, voids, trick, leader, trump):
+        self.seat = seat
+        self.hand = hand
+        self.hand_sizes = hand_sizes
+        self.played = played
+        self.voids = voids
+        self.trick = tuple(trick)
+        self.leader = leader
+        self.trump = trump
+
+    @classmethod
+    def from_engine(cls, engine, seat):
+        return cls(seat, engine.hands[seat], [h.bit_count() for h in engine.hands],
+                   engine.played, list(engine.voids), engine.current_trick,
+                   engine.trick_starter, engine.trump_suit)
+
+    def legal_moves(self):
+        if not self.trick: return cards_of(self.hand)
+        return cards_of(self.hand & SUIT_MASKS[SUIT_OF[self.trick[0][1]]] or self.hand)
+
+def sample_hands(pos, rng, tries=50):
+    # Random deal of the unseen cards respecting hand sizes and voids, or
+    # None if the constraints could not be met in `tries` attempts
+    unseen = cards_of(FULL_DECK & ~pos.played & ~pos.hand)
+    others = [s for s in range(4) if s != pos.seat]
+    for _ in range(tries):
+        rng.shuffle(unseen)
+        # Place the most constrained cards first
+        unseen.sort(key=lambda c: sum(1 for s in others if pos.voids[s] >> SUIT_OF[c] & 1), reverse=True)
+        room = {s: pos.hand_sizes[s] for s in others}
+        hands = [0, 0, 0, 0]
+        hands[pos.seat] = pos.hand
+        ok = True
+        for c in unseen:
+            seats = [s for s in others if room[s] and not pos.voids[s] >> SUIT_OF[c] & 1]
+            if not seats:
+                ok = False
+                break
+            # Weight by free room so long hands absorb proportionally more
+            total = sum(room[s] for s in seats)
+            r = rng.randrange(total)
+            for s in seats:
+                r -= room[s]
+                if r < 0: break
+            hands[s] |= 1 << c
+            room[s] -= 1
+        if ok: return hands
+    return None
+
+def rollout(hands, trick, trump, seat_team):
+    # Plays the position out with the default bots; tricks for seat_team
+    h = list(hands)
+    trick = list(trick)
+    seat = (trick[-1][0] + 1) % 4 if trick else None
+    won = 0
+    while True:
+        if len(trick) == 4:
+            w = trick[0]
+            lead_suit = SUIT_OF[w[1]]
+            for p, c in trick[1:]:
+                if beats(c, w[1], lead_suit, trump): w = (p, c)
+            won += w[0] % 2 == seat_team
+            seat = w[0]
+            trick = []
+        if not h[seat]: return won
+        c = bot_play(h[seat], trick, trump, seat)
+        h[seat] &= ~(1 << c)
+        trick.append((seat, c))
+        seat = (seat + 1) % 4
+
+def score_sample(pos, hands, moves, solver=None, deadline=None):
+    # Tricks my team takes after each candidate move on one sampled deal, or
+    # None if the perf_counter() deadline passes first
+    team = pos.seat % 2
+    if hands[pos.seat].bit_count() <= SOLVE_BELOW:
+        solver = solver or dds.DoubleDummy(pos.trump)
+        scores = solver.score_moves(hands, pos.leader, pos.trick)
+        return [scores[m] for m in moves]
+    out = []
+    for m in moves:
+        if deadline is not None and time.perf_counter() >= deadline: return None
+        h = list(hands)
+        h[pos.seat] &= ~(1 << m)
+        out.append(rollout(h, pos.trick + ((pos.seat, m),), pos.trump, team))
+    return out
+
+class MonteCarloSearch:
+    def __init__(self, pos, seed=None):
+        self.pos = pos
+        self.moves = pos.legal_moves()
+        self.totals = [0] * len(self.moves)
+        self.samples = 0
+        self.rng = random.Random(seed)
+        self.solver = None
+
+    def run(self, budget, max_samples=None):
+        # Adds samples until `budget` seconds pass; returns samples added. A
+        # sample still being scored at the deadline is dropped
+        if len(self.moves) == 1: return 0
+        deadline = time.perf_counter() + budget
+        added = 0
+        if self.solver is None:
+            self.solver = dds.DoubleDummy(self.pos.trump)
+        while time.perf_counter() < deadline and (max_samples is None or added < max_samples):
+            hands = sample_hands(self.pos, self.rng)
+            if hands is None: break
+            scores = score_sample(self.pos, hands, self.moves, self.solver, deadline)
+            if scores is None: break
+            for i, v in enumerate(scores):
+                self.totals[i] += v
+            self.samples += 1
+            added += 1
+        return added
+
+    def merge(self, totals, samples):
+        for i, v in enumerate(totals):
+            self.totals[i] += v
+        self.samples += samples
+
+    def scores(self):
+        n = max(self.samples, 1)
+        return {m: t / n for m, t in zip(self.moves, self.totals)}
+
+    def best(self):
+        # Ties keep the earlier legal card
+        best_i = max(range(len(self.moves)), key=lambda i: (self.totals[i], -i))
+        return self.moves[best_i]
+
+def _worker_search(job):
+    # The deadline is a perf_counter() time, which is system-wide on Linux,
+    # so time spent queued for a worker counts against the move
+    pos, deadline, seed = job
+    search = MonteCarloSearch(pos, seed)
+    search.run(deadline - time.perf_counter())
+    return search.totals, search.samples
+
+class MonteCarloPolicy(BotPolicy):
+    # Bids and picks trump like the default bot; card play is sampled
+    def __init__(self, budget=DEFAULT_BUDGET, workers=0, seed=None):
+        self.budget = budget
+        self.workers = workers
+        self.rng = random.Random(seed)
+        self.pool = None
+        self.last_search = None
+        if workers:
+            self.start_pool()
+
+    def start_pool(self):
+        # Started and warmed up before any move, so none pays for process start-up
+        self.pool = ProcessPoolExecutor(max_workers=self.workers)
+        for f in [self.pool.submit(int) for _ in range(self.workers)]: f.result()
+
+    def search(self, engine, seat):
+        pos = Position.from_engine(engine, seat)
+        search = MonteCarloSearch(pos, self.rng.getrandbits(32))
+        self.last_search = search
+        if len(search.moves) == 1:
+            return search
+        if self.workers:
+            if self.pool is None:
+                self.start_pool()  # only after close()
+            # Leave headroom for process round-trips inside the budget
+            deadline = time.perf_counter() + self.budget * 0.8
+            jobs = [(pos, deadline, self.rng.getrandbits(32)) for _ in range(self.workers)]
+            for totals, samples in self.pool.map(_worker_search, jobs):
+                search.merge(totals, samples)
+        else:
+            search.run(self.budget)
+        return search
+
+    def play(self, engine, seat):
+        return self.search(engine, seat).best()
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.shutdown()
+            self.pool = None
+
+if __name__ == "__main__":
+    import sys
+    from engine import TarneebEngine, STATE_PLAYING
+    workers = int(sys.argv[1]) if len(sys.argv) > 1 else 0
+    policy = MonteCarloPolicy(workers=workers, seed=0)
+    engine = TarneebEngine(seed=0, policies=[policy, BotPolicy(), BotPolicy(), BotPolicy()])
+    while engine.state != STATE_PLAYING:
+        engine.step()
+    while engine.state == STATE_PLAYING:
+        if engine.turn_idx == 0:
+            t0 = time.perf_counter()
+            engine.step()
+            s = policy.last_search
+            print(f"{len(s.moves)} moves, {s.samples} samples in {time.perf_counter() - t0:.3f}s")
+        else:
+            engine.step()
+    print(engine.result())
+    policy.close()
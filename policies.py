@@ -0,0 +1,124 @@
+import random
+
+from bitboard import SUIT_OF, RANK_OF, bottom_card, cards_of, highest, lowest
+from engine import BotPolicy, beats, bot_bid, heuristic_bid, heuristic_trump
+from knowledge import HandKnowledge
+
+# Seat policies for the headless engine. A policy answers bid / choose_trump /
+# play for the seat it is asked about; see engine.BotPolicy for the interface.
+
+class RandomPolicy(BotPolicy):
+    # Uniformly random legal card; bids like the default bot
+    def __init__(self, seed=None):
+        self.rng = random.Random(seed)
+
+    def play(self, engine, seat):
+        return self.rng.choice(engine.legal_moves(seat))
+
+class LowestPolicy(BotPolicy):
+    # Never spends a high card unless forced: always plays the lowest legal card
+    def play(self, engine, seat):
+        return lowest(engine.legal_mask(seat))
+
+class TimidPolicy(BotPolicy):
+    # Default card play, but only bids when the bot bid clears the current
+    # highest bid by two
+    def bid(self, engine, seat):
+        return bot_bid(engine.hands[seat], engine.highest_bid + 1)
+
+class HeuristicBidPolicy(BotPolicy):
+    # Default card play with the original threshold bidding and longest-suit
+    # trump, for measuring the bid table against
+    def bid(self, engine, seat):
+        target = heuristic_bid(engine.hands[seat])
+        return target if target > engine.highest_bid else 0
+
+    def choose_trump(self, engine, seat):
+        return heuristic_trump(engine.hands[seat])
+
+class CountingPolicy(BotPolicy):
+    # Default bidding; card play that counts cards. Leads a card that is the
+    # highest still out in its suit when no opponent is known to be able to
+    # ruff it, otherwise leads low from its longest side suit, and playing
+    # last wins the trick with the cheapest card that does it
+    def play(self, engine, seat):
+        k = HandKnowledge.from_engine(engine, seat)
+        lead = k.lead_suit()
+        if lead is None:
+            return self.lead(k)
+        legal = k.legal()
+        if k.partner_winning():
+            return lowest(legal)
+        winners = [c for c in cards_of(legal) if beats(c, k.best, lead, k.trump)]
+        if not winners:
+            return lowest(legal)
+        if len(k.trick) == 3:
+            # Following suit is cheaper than ruffing, then lower ranks first
+            return min(winners, key=lambda c: (SUIT_OF[c] == k.trump, RANK_OF[c]))
+        high = highest(legal)
+        return high if high in winners else max(winners, key=RANK_OF.__getitem__)
+
+    def lead(self, k):
+        opponents = ((k.seat + 1) % 4, (k.seat + 3) % 4)
+        no_ruffs = k.trumps_out() == 0
+        for s in sorted(range(4), key=lambda s: s == k.trump):
+            b = k.boss(s)
+            if b >= 0 and k.hand >> b & 1:
+                if s == k.trump or no_ruffs or not any(k.is_void(o, s) for o in opponents):
+                    return b
+        side = [s for s in range(4) if s != k.trump and k.count(s)]
+        if side:
+            return bottom_card(k.hand, max(side, key=k.count))
+        return highest(k.hand)
+
+class OraclePolicy(BotPolicy):
+    # Cheats: sees every hand and plays double-dummy perfect cards once the
+    # hand is short enough to solve in time. A ceiling for bot strength tests.
+    def __init__(self, max_tricks=None):
+        import dds
+        self.dds = dds
+        self.max_tricks = max_tricks or dds.MAX_TRICKS
+        self.solver = None
+
+    def play(self, engine, seat):
+        if engine.hands[seat].bit_count() > self.max_tricks:
+            return super().play(engine, seat)
+        if self.solver is None or self.solver.trump != engine.trump_suit:
+            self.solver = self.dds.DoubleDummy(engine.trump_suit)
+        return self.solver.best_move(*self.dds.engine_position(engine))
+
+def _mc_policy(seed):
+    from mcbot import MonteCarloPolicy
+    return MonteCarloPolicy(budget=0.05, seed=seed)  # short budget for bulk runs
+
+def _ismcts_policy(seed):
+    from ismcts import ISMCTSPolicy
+    return ISMCTSPolicy(iterations=200, seed=seed)  # fixed work per decision, so runs reproduce
+
+def _learned_policy(seed):
+    from learned import LearnedPolicy
+    return LearnedPolicy()
+
+def _batched_policy(seed):
+    from decisions import BatchedPolicy
+    return BatchedPolicy()  # all seats share the process's decision service
+
+# name -> factory(seed); seeded so tournaments stay reproducible
+POLICIES = {
+    'bot': lambda seed: BotPolicy(),
+    'random': lambda seed: RandomPolicy(seed),
+    'lowest': lambda seed: LowestPolicy(),
+    'timid': lambda seed: TimidPolicy(),
+    'heuristic': lambda seed: HeuristicBidPolicy(),
+    'counting': lambda seed: CountingPolicy(),
+    'oracle': lambda seed: OraclePolicy(),
+    'mc': lambda seed: _mc_policy(seed),
+    'ismcts': lambda seed: _ismcts_policy(seed),
+    'learned': lambda seed: _learned_policy(seed),
+    'batched': lambda seed: _batched_policy(seed),
+}
+
+def make_policy(name, seed=None):
+    if name not in POLICIES:
+        raise ValueError(f"Unknown policy '{name}' (choose from {', '.join(POLICIES)})")
+    return POLICIES[name](seed)
@@ -0,0 +1,225 @@
+import json
+import os
+import sys
+import threading
+import time
+from time import perf_counter_ns
+
+import numpy as np
+
+# Frame-loop instrumentation. The game wraps each phase of a frame in
+# `with prof.span(name):` and bot decisions in prof.wrap(). While disabled a
+# span is one attribute test returning a shared no-op context manager.
+#
+# Enabled, the profiler keeps the last HISTORY frames' total time and
+# per-span time for percentiles and the on-screen overlay, and, if tracing,
+# every span as a Chrome trace event (chrome://tracing, Perfetto).
+#
+# StartupTimer times the cold start: from process start (Linux; else from
+# the first mark) through imports and display set-up to the first frame.
+
+HISTORY = 600          # frames kept for percentiles (10 s at 60 FPS)
+MAX_EVENTS = 1000000   # trace events kept; later ones are dropped
+WAIT = 'wait'          # span name for the frame-cap sleep, excluded from work time
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+NULL_SPAN = _NullSpan()
+
+class _Span:
+    __slots__ = ('prof', 'name', 't0')
+
+    def __init__(self, prof, name):
+        self.prof = prof
+        self.name = name
+
+    def __enter__(self):
+        self.t0 = perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        self.prof.record(self.name, self.t0, perf_counter_ns())
+        return False
+
+class Profiler:
+    def __init__(self, history=HISTORY):
+        self.enabled = False
+        self.overlay = False
+        self.trace = None      # list of trace events while tracing
+        self.frames = np.zeros(history)  # ms per frame, ring buffer
+        self.spans = {}        # span name -> ring buffer of ms per frame
+        self.count = 0         # frames recorded
+        self.current = {}      # span name -> ns so far this frame
+        self.lock = threading.Lock()  # record() also runs on bot worker threads
+        self.frame_start = None
+
+    def _update_enabled(self):
+        self.enabled = self.overlay or self.trace is not None
+        if not self.enabled:
+            self.frame_start = None
+
+    def toggle_overlay(self):
+        self.overlay = not self.overlay
+        self._update_enabled()
+
+    def start_trace(self):
+        self.trace = []
+        self._update_enabled()
+
+    def span(self, name):
+        if not self.enabled:
+            return NULL_SPAN
+        return _Span(self, name)
+
+    def wrap(self, name, fn):
+        # fn timed as span `name` wherever it runs (bot worker threads too)
+        if not self.enabled:
+            return fn
+        def timed(*args, **kwargs):
+            with _Span(self, name):
+                return fn(*args, **kwargs)
+        return timed
+
+    def record(self, name, t0, t1):
+        with self.lock:
+            self.current[name] = self.current.get(name, 0) + t1 - t0
+            trace = self.trace
+            if trace is not None and len(trace) < MAX_EVENTS:
+                trace.append((name, t0, t1, threading.get_ident()))
+
+    def frame(self):
+        # Call once at the top of every frame; closes the previous one
+        if not self.enabled:
+            return
+        now = perf_counter_ns()
+        if self.frame_start is not None:
+            i = self.count % len(self.frames)
+            self.frames[i] = (now - self.frame_start) / 1e6
+            with self.lock:
+                current, self.current = self.current, {}
+            for name, ns in current.items():
+                ring = self.spans.get(name)
+                if ring is None:
+                    ring = self.spans[name] = np.zeros(len(self.frames))
+                ring[i] = ns / 1e6
+            for name, ring in self.spans.items():
+                if name not in current: ring[i] = 0
+            if self.trace is not None and len(self.trace) < MAX_EVENTS:
+                self.trace.append(('frame', self.frame_start, now, None))
+            self.count += 1
+        else:
+            with self.lock:
+                self.current = {}
+        self.frame_start = now
+
+    def window(self):
+        # Index range of the recorded frames in the ring buffers
+        return min(self.count, len(self.frames))
+
+    def percentiles(self, qs=(50, 95, 99)):
+        # {'frame': (p50, p95, p99), 'work': (...)} in ms, or None before two frames
+        n = self.window()
+        if not n:
+            return None
+        frames = self.frames[:n]
+        work = frames - self.spans[WAIT][:n] if WAIT in self.spans else frames
+        return {'frame': tuple(np.percentile(frames, qs)), 'work': tuple(np.percentile(work, qs))}
+
+    def span_means(self):
+        # Mean ms per frame of each span, largest first
+        n = self.window()
+        means = [(name, float(ring[:n].mean())) for name, ring in self.spans.items()] if n else []
+        return sorted(means, key=lambda m: -m[1])
+
+    def summary(self):
+        p = self.percentiles()
+        if p is None:
+            return ["no frames yet"]
+        lines = ["frame p50/95/99 " + "/".join(f"{v:.1f}" for v in p['frame']) + " ms",
+                 "work  p50/95/99 " + "/".join(f"{v:.1f}" for v in p['work']) + " ms"]
+        lines += [f"  {name:<15}{ms:6.2f} ms" for name, ms in self.span_means()]
+        return lines
+
+    def save_trace(self, path):
+        # Writes the Chrome trace event format (JSON); timestamps in us
+        pid = os.getpid()
+        main = threading.main_thread().ident
+        names = {t.ident: t.name for t in threading.enumerate()}
+        events = []
+        for tid in {e[3] for e in self.trace if e[3] is not None} | {main}:
+            events.append({'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': tid,
+                           'args': {'name': names.get(tid, str(tid))}})
+        for name, t0, t1, tid in self.trace:
+            if tid is None:
+                # Frames also go on a counter track, as frame time in ms
+                events.append({'name': 'frame ms', 'ph': 'C', 'pid': pid, 'ts': t0 / 1e3,
+                               'args': {'ms': round((t1 - t0) / 1e6, 3)}})
+                tid = main
+            events.append({'name': name, 'ph': 'X', 'pid': pid, 'tid': tid,
+                           'ts': t0 / 1e3, 'dur': (t1 - t0) / 1e3})
+        with open(path, 'w') as f:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f)
+        return len(events)
+
+def process_start_ns():
+    # perf_counter_ns() at this process's start, or None where /proc is not
+    # available. A onefile build runs as a child of the bootloader that
+    # unpacked it, so its start counts from that parent
+    try:
+        pid = 'self'
+        if getattr(sys, 'frozen', False) and os.readlink(f'/proc/{os.getppid()}/exe') == os.readlink('/proc/self/exe'):
+            pid = os.getppid()
+        with open(f'/proc/{pid}/stat') as f:
+            start = int(f.read().rsplit(')', 1)[1].split()[19]) / os.sysconf('SC_CLK_TCK')
+        age = time.clock_gettime(time.CLOCK_BOOTTIME) - start
+    except (OSError, AttributeError, ValueError, IndexError):
+        return None
+    return perf_counter_ns() - int(age * 1e9)
+
+class StartupTimer:
+    # Named milestones up to the first frame; mark() each as it is reached
+    def __init__(self, imported=None):
+        # imported: perf_counter_ns() taken before the game's imports
+        self.origin = process_start_ns()
+        self.marks = []
+        if imported is not None:
+            self.marks.append(('python', imported))
+        self.marks.append(('imports', perf_counter_ns()))
+        if self.origin is None:
+            self.origin = self.marks[0][1]
+        self.done = False
+
+    def mark(self, name):
+        self.marks.append((name, perf_counter_ns()))
+
+    def finish(self):
+        self.mark('first frame')
+        self.done = True
+
+    def steps(self):
+        # [(name, ms since the previous mark, ms since the origin)]
+        out, prev = [], self.origin
+        for name, t in self.marks:
+            out.append((name, (t - prev) / 1e6, (t - self.origin) / 1e6))
+            prev = t
+        return out
+
+    def report(self):
+        frozen = " (frozen)" if getattr(sys, 'frozen', False) else ""
+        lines = [f"Startup{frozen}, ms{'':>14}step     total"]
+        lines += [f"  {name:<20}{step:8.1f}{total:10.1f}" for name, step, total in self.steps()]
+        return "\n".join(lines)
+
+    def save(self, path):
+        # Appends one JSON line, so runs can be tracked over time
+        with open(path, 'a') as f:
+            f.write(json.dumps({'time': time.time(), 'frozen': bool(getattr(sys, 'frozen', False)),
+                                'platform': sys.platform,
+                                'ms': {name: round(total, 2) for name, _, total in self.steps()}}) + "\n")
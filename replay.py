@@ -0,0 +1,265 @@
+import argparse
+import os
+import struct
+import sys
+import time
+
+from bitboard import SUITS, card_name, cards_of
+from engine import TarneebEngine, STATE_BIDDING, STATE_ROUND_END
+from policies import POLICIES, make_policy
+
+# Compact append-only game logs. A log is an 8-byte header followed by one
+# length-prefixed record per round, so logs stream record by record and a
+# round can be found by hopping over length fields without parsing:
+#
+#   u16  length of the rest of the record
+#   u64  deal seed, u8 dealer, u8 all-pass redeals before this deal
+#   4 x u64  hands as dealt (52-bit masks)
+#   u8 bid winner, u8 bid, u8 trump suit
+#   4 x u8 tricks won, 2 x i16 score change, 2 x i32 scores after
+#   u8 n, then n bidding decisions as seat << 4 | bid (0 = pass)
+#   u8 n, then n card codes in play order
+#
+# Plays carry no seats: who leads each trick follows from the rules.
+
+MAGIC = b'TRNB'
+VERSION = 1
+HEADER = struct.Struct('<4sB3x')
+LENGTH = struct.Struct('<H')
+FIXED = struct.Struct('<QBB4QBBB4B2h2i')
+
+SNAPSHOT_EVERY = 4  # tricks between replay snapshots
+
+class RoundRecord:
+    def __init__(self, seed, dealer, redeals, hands, bid_winner, bid, trump,
+                 tricks, delta, scores, bids, plays):
+        self.seed = seed
+        self.dealer = dealer
+        self.redeals = redeals
+        self.hands = tuple(hands)
+        self.bid_winner = bid_winner
+        self.bid = bid
+        self.trump = trump
+        self.tricks = tuple(tricks)
+        self.delta = tuple(delta)
+        self.scores = tuple(scores)
+        self.bids = tuple(bids)
+        self.plays = bytes(plays)
+
+    @classmethod
+    def from_engine(cls, engine):
+        # Call at STATE_ROUND_END, before next_round()
+        return cls(engine.deal_seed, engine.dealer_idx, engine.redeals, engine.dealt,
+                   engine.bid_winner, engine.highest_bid, engine.trump_suit, engine.tricks_won, engine.last_delta,
+                   (engine.team_a_score, engine.team_b_score), engine.bid_log, engine.plays)
+
+    def pack(self):
+        body = FIXED.pack(self.seed, self.dealer, self.redeals, *self.hands,
+                          self.bid_winner, self.bid, self.trump,
+                          *self.tricks, *self.delta, *self.scores)
+        bids = bytes(seat << 4 | bid for seat, bid in self.bids)
+        body += bytes((len(bids),)) + bids + bytes((len(self.plays),)) + self.plays
+        return LENGTH.pack(len(body)) + body
+
+    @classmethod
+    def unpack(cls, body):
+        f = FIXED.unpack_from(body)
+        at = FIXED.size
+        n = body[at]
+        bids = [(b >> 4, b & 15) for b in body[at + 1:at + 1 + n]]
+        at += 1 + n
+        plays = body[at + 1:at + 1 + body[at]]
+        return cls(f[0], f[1], f[2], f[3:7], f[7], f[8], f[9], f[10:14], f[14:16], f[16:18], bids, plays)
+
+class LogWriter:
+    # Appends records; buffered, so call flush() where a crash must not lose
+    # the last rounds
+    def __init__(self, path):
+        if os.path.exists(path) and os.path.getsize(path):
+            # A record torn by a crash is cut off, or everything written
+            # behind it would read back as garbage
+            end = scan_records(path)[1]
+            if end < os.path.getsize(path):
+                os.truncate(path, end)
+            self.file = open(path, 'ab')
+        else:
+            self.file = open(path, 'wb')
+            self.file.write(HEADER.pack(MAGIC, VERSION))
+        self.rounds = 0
+
+    def write(self, record):
+        self.file.write(record.pack())
+        self.rounds += 1
+
+    def flush(self):
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def check_header(data, path):
+    if len(data) < HEADER.size:
+        raise ValueError(f"{path}: not a Tarneeb log")
+    magic, version = HEADER.unpack(data)
+    if magic != MAGIC:
+        raise ValueError(f"{path}: not a Tarneeb log")
+    if version != VERSION:
+        raise ValueError(f"{path}: unsupported log version {version}")
+
+def read_records(path, start=0):
+    # Streams records from round `start` on; a torn last record is ignored
+    with open(path, 'rb', buffering=1 << 20) as f:
+        check_header(f.read(HEADER.size), path)
+        i = 0
+        while True:
+            head = f.read(LENGTH.size)
+            if len(head) < LENGTH.size: return
+            n = LENGTH.unpack(head)[0]
+            if i < start:
+                f.seek(n, os.SEEK_CUR)
+            else:
+                body = f.read(n)
+                if len(body) < n: return
+                yield RoundRecord.unpack(body)
+            i += 1
+
+def record_offsets(path):
+    # File offset of every complete record, for random access by round
+    return scan_records(path)[0]
+
+def scan_records(path):
+    # (offset of every complete record, end of the last one)
+    offsets = []
+    size = os.path.getsize(path)
+    with open(path, 'rb') as f:
+        check_header(f.read(HEADER.size), path)
+        at = HEADER.size
+        while at + LENGTH.size <= size:
+            f.seek(at)
+            n = LENGTH.unpack(f.read(LENGTH.size))[0]
+            if at + LENGTH.size + n > size: break
+            offsets.append(at)
+            at += LENGTH.size + n
+    return offsets, at
+
+def read_record_at(path, offset):
+    with open(path, 'rb') as f:
+        f.seek(offset)
+        n = LENGTH.unpack(f.read(LENGTH.size))[0]
+        return RoundRecord.unpack(f.read(n))
+
+class Replay:
+    # Re-executes a record through the engine, checking every decision is
+    # legal and the result matches, and keeps engine copies every
+    # `snapshot_every` tricks (0 = none) so any trick is a few steps away
+    def __init__(self, record, snapshot_every=SNAPSHOT_EVERY):
+        self.record = record
+        self.snapshot_every = snapshot_every
+        engine = TarneebEngine(hands=record.hands, dealer_idx=record.dealer)
+        bids = iter(record.bids)
+        while engine.state == STATE_BIDDING:
+            seat = engine.current_bidder_idx
+            active = engine.passed.count(False)
+            if engine.passed[seat] or (active == 1 and engine.highest_bid > 6):
+                engine.step()
+            else:
+                logged = next(bids, None)
+                if logged is None:
+                    raise ValueError(f"Log ends its bidding before seat {seat} has bid")
+                logged_seat, bid = logged
+                if logged_seat != seat:
+                    raise ValueError(f"Log has seat {logged_seat} bidding, rules say seat {seat}")
+                engine.step(bid)
+        engine.step(record.trump)
+
+        self.snapshots = []
+        for i, card in enumerate(record.plays):
+            if snapshot_every and i % (4 * snapshot_every) == 0:
+                self.snapshots.append(engine.copy())
+            engine.step(card)
+        self.engine = engine
+        if engine.state == STATE_ROUND_END and (tuple(engine.tricks_won) != record.tricks
+                                                or engine.last_delta != record.delta):
+            raise ValueError("Replayed result differs from the log")
+
+    def at_trick(self, trick):
+        # Engine positioned at the start of `trick` (0-based)
+        if not self.snapshots:
+            raise ValueError("Replay was built without snapshots")
+        snap = min(trick // self.snapshot_every, len(self.snapshots) - 1)
+        engine = self.snapshots[snap].copy()
+        plays = self.record.plays
+        for i in range(snap * self.snapshot_every * 4, min(trick * 4, len(plays))):
+            engine.step(plays[i])
+        return engine
+
+def record_games(path, rounds, seed=0, seats=('bot',) * 4):
+    policies = [make_policy(name, seed + i) for i, name in enumerate(seats)]
+    engine = TarneebEngine(seed, policies)
+    with LogWriter(path) as log:
+        for _ in range(rounds):
+            engine.play_round()
+            log.write(RoundRecord.from_engine(engine))
+            engine.next_round()
+    return engine
+
+def describe(engine):
+    lines = [f"Trump {SUITS[engine.trump_suit]}, seat {engine.bid_winner} bid {engine.highest_bid}, "
+             f"tricks {engine.tricks_won}, seat {engine.to_act()} to act"]
+    for seat in range(4):
+        lines.append(f"  seat {seat}: {' '.join(card_name(c) for c in cards_of(engine.hands[seat]))}")
+    return "\n".join(lines)
+
+def replay_ui(path, round_idx=0, trick=0, speed=1.0):
+    from tarneeb import ReplayGame
+    if round_idx >= len(record_offsets(path)):
+        raise ValueError(f"{path} has no round {round_idx}")
+    ReplayGame(read_records(path, round_idx), trick, speed).run()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Record and replay Tarneeb game logs")
+    sub = parser.add_subparsers(dest='cmd', required=True)
+    rec = sub.add_parser('record', help="play bot rounds into a log")
+    rec.add_argument('log')
+    rec.add_argument('--rounds', type=int, default=1000)
+    rec.add_argument('--seed', type=int, default=0)
+    rec.add_argument('--seats', default='bot,bot,bot,bot')
+    ver = sub.add_parser('verify', help="re-execute every round headlessly")
+    ver.add_argument('log')
+    show = sub.add_parser('show', help="print the position at a trick")
+    ui = sub.add_parser('ui', help="watch a log in the game window")
+    for p in (show, ui):
+        p.add_argument('log')
+        p.add_argument('--round', type=int, default=0)
+        p.add_argument('--trick', type=int, default=0)
+    ui.add_argument('--speed', type=float, default=1.0)
+    args = parser.parse_args()
+
+    if args.cmd == 'record':
+        seats = args.seats.split(',')
+        if len(seats) != 4 or any(s not in POLICIES for s in seats):
+            parser.error(f"--seats needs four of: {', '.join(POLICIES)}")
+        t0 = time.perf_counter()
+        record_games(args.log, args.rounds, args.seed, seats)
+        print(f"{args.rounds} rounds logged in {time.perf_counter() - t0:.2f}s")
+    elif args.cmd == 'verify':
+        t0 = time.perf_counter()
+        n = 0
+        for record in read_records(args.log):
+            Replay(record, snapshot_every=0)
+            n += 1
+        dt = time.perf_counter() - t0
+        print(f"{n} rounds replayed OK in {dt:.2f}s ({n / dt:.0f} rounds/s)")
+    elif args.cmd == 'show':
+        offsets = record_offsets(args.log)
+        if not 0 <= args.round < len(offsets):
+            sys.exit(f"Log has {len(offsets)} rounds")
+        print(describe(Replay(read_record_at(args.log, offsets[args.round])).at_trick(args.trick)))
+    else:
+        replay_ui(args.log, args.round, args.trick, args.speed)
@@ -0,0 +1,370 @@
+import argparse
+import glob
+import multiprocessing as mp
+import os
+import queue
+import random
+import time
+import zipfile
+
+import numpy as np
+
+from engine import BotPolicy, TarneebEngine
+from learned import (BID_COLUMNS, PLAY_COLUMNS, FEATURES, action_index, bid_observation, columns, forward,
+                     init_weights, legal_outputs, model_path, play_observation, save_model)
+from policies import POLICIES, make_policy
+from tournament import shard_seeds
+
+# Self-play data for the learned bots (learned.py). Worker processes play
+# headless rounds and record every bid and card decision: the observation,
+# the legal actions, the action taken and how the round went for the
+# deciding seat's team. Records go to the parent in column batches through a
+# bounded queue; the parent writes them out as compressed shards, so workers
+# never wait on the disk, only (briefly) on a full queue, and that wait is
+# reported.
+#
+# A data directory holds bid-00000.npz, play-00000.npz, ... with one array
+# per column. Training maps them into memory: each shard is unpacked once
+# into plain .npy files under .unpacked/, which np.load can map.
+#
+# Rounds are split into fixed jobs seeded from the master seed, so the data
+# is the same for any number of workers (only the shard boundaries move).
+#
+# Training is advantage-weighted imitation: the network learns the recorded
+# actions, each weighted by how much better than average its round went, so
+# with some exploration in the data it can learn to beat the policy that
+# played.
+
+OUTCOME_COLUMNS = (('action', 'u1'), ('tricks', 'i1'), ('margin', 'i1'))
+SPECS = {'play': PLAY_COLUMNS + OUTCOME_COLUMNS, 'bid': BID_COLUMNS + OUTCOME_COLUMNS}
+JOB_ROUNDS = 100        # rounds per job (fixed: it is part of the job seeds)
+BATCH_ROUNDS = 20       # rounds per batch a worker sends
+SHARD_ROWS = 1 << 18    # rows per shard file
+QUEUE_SIZE = 64         # batches in flight before workers wait
+EXPLORE = 0.05          # chance a recorded decision is a random legal one
+
+HIDDEN = 128
+EPOCHS = 3
+BATCH = 4096
+LEARNING_RATE = 1e-3
+BETA = 1.0              # sharpness of the advantage weights
+MAX_WEIGHT = 20.0
+
+# --- Recording ---
+class Recorder(BotPolicy):
+    # Wraps a seat's policy, noting each decision. With probability
+    # `explore` it takes a random legal action instead, and notes that
+    def __init__(self, policy, rows, explore, rng):
+        self.policy = policy
+        self.rows = rows
+        self.explore = explore
+        self.rng = rng
+
+    def bid(self, engine, seat):
+        obs = bid_observation(engine, seat)
+        if self.rng.random() < self.explore:
+            legal = obs[-1]
+            bid = self.rng.choice([b for b in range(14) if legal >> b & 1])
+        else:
+            bid = self.policy.bid(engine, seat)
+            if bid <= engine.highest_bid: bid = 0
+        self.rows['bid'].append(obs + (bid,))
+        return bid
+
+    def choose_trump(self, engine, seat):
+        return self.policy.choose_trump(engine, seat)
+
+    def play(self, engine, seat):
+        obs = play_observation(engine, seat)
+        if self.rng.random() < self.explore:
+            legal = obs[-1]
+            card = self.rng.choice([c for c in range(52) if legal >> c & 1])
+        else:
+            card = self.policy.play(engine, seat)
+        self.rows['play'].append(obs + (card,))
+        return card
+
+def label(rows, start, engine):
+    # Adds the round's outcome to the decisions recorded since `start`.
+    # Bids on a deal that everyone passed get tricks -1 and margin 0
+    t = engine.tricks_won
+    tricks = (t[0] + t[2], t[1] + t[3])
+    da, db = engine.last_delta
+    margin = (da - db, db - da)
+    for kind, out in rows.items():
+        for i in range(start[kind], len(out)):
+            row = out[i]
+            team = row[1] % 2
+            if row[0] == engine.deal_seed:
+                out[i] = row + (tricks[team], margin[team])
+            else:
+                out[i] = row + (-1, 0)
+
+def worker_main(out, worker, jobs, seats, explore):
+    # Plays its jobs and sends ('rows', kind, columns) batches, then
+    # ('done', worker, stats)
+    stalled = 0.0
+    sent = 0
+    def send(rows):
+        nonlocal stalled, sent
+        for kind, spec in SPECS.items():
+            if rows[kind]:
+                batch = columns(rows[kind], spec)
+                t0 = time.perf_counter()
+                out.put(('rows', kind, batch))
+                stalled += time.perf_counter() - t0
+                sent += len(rows[kind])
+                rows[kind] = []
+
+    rows = {'bid': [], 'play': []}
+    rounds = 0
+    for seed, n in jobs:
+        rng = random.Random(seed)
+        policies = [Recorder(make_policy(name, seed + i), rows, explore, rng) for i, name in enumerate(seats)]
+        engine = TarneebEngine(seed, policies)
+        for r in range(n):
+            start = {kind: len(v) for kind, v in rows.items()}
+            engine.play_round()
+            label(rows, start, engine)
+            engine.next_round()
+            rounds += 1
+            if rounds % BATCH_ROUNDS == 0:
+                send(rows)
+    send(rows)
+    out.put(('done', worker, {'rounds': rounds, 'rows': sent, 'stalled': stalled}))
+
+# --- Shards ---
+def shard_paths(directory, kind):
+    return sorted(glob.glob(os.path.join(directory, f"{kind}-[0-9][0-9][0-9][0-9][0-9].npz")))
+
+class ShardWriter:
+    # Buffers column batches of one kind and writes them out SHARD_ROWS at
+    # a time, numbering on from any shards already in the directory
+    def __init__(self, directory, kind, rows_per_shard=SHARD_ROWS):
+        self.directory = directory
+        self.kind = kind
+        self.rows_per_shard = rows_per_shard
+        self.index = len(shard_paths(directory, kind))
+        self.pending = []
+        self.buffered = 0
+        self.written = 0
+        self.bytes = 0
+
+    def add(self, batch):
+        self.pending.append(batch)
+        self.buffered += len(batch['action'])
+        if self.buffered >= self.rows_per_shard:
+            self.flush()
+
+    def flush(self):
+        if not self.buffered: return
+        cols = {k: np.concatenate([b[k] for b in self.pending]) for k in self.pending[0]}
+        path = os.path.join(self.directory, f"{self.kind}-{self.index:05d}.npz")
+        # Write then rename, so a killed run never leaves a half-written shard
+        tmp = path + '.tmp'
+        with open(tmp, 'wb') as f:
+            np.savez_compressed(f, **cols)
+        os.replace(tmp, path)
+        self.index += 1
+        self.written += self.buffered
+        self.bytes += os.path.getsize(path)
+        self.pending, self.buffered = [], 0
+
+def generate(directory, rounds, seats, workers=None, explore=EXPLORE, master_seed=0,
+             rows_per_shard=SHARD_ROWS, queue_size=QUEUE_SIZE, progress=print):
+    os.makedirs(directory, exist_ok=True)
+    jobs = (rounds + JOB_ROUNDS - 1) // JOB_ROUNDS
+    seeds = shard_seeds(master_seed, jobs)
+    sizes = [min(JOB_ROUNDS, rounds - i * JOB_ROUNDS) for i in range(jobs)]
+    workers = max(1, min(workers or os.cpu_count() or 1, jobs))
+
+    out = mp.Queue(queue_size)
+    procs = [mp.Process(target=worker_main, daemon=True,
+                        args=(out, w, list(zip(seeds[w::workers], sizes[w::workers])), seats, explore))
+             for w in range(workers)]
+    writers = {kind: ShardWriter(directory, kind, rows_per_shard) for kind in SPECS}
+    t0 = time.perf_counter()
+    for p in procs: p.start()
+    done = {}
+    depth = []
+    while len(done) < workers:
+        try:
+            msg = out.get(timeout=1.0)
+        except queue.Empty:
+            dead = [p for p in procs if p.exitcode not in (None, 0)]
+            if dead:
+                raise RuntimeError(f"self-play worker exited with code {dead[0].exitcode}")
+            continue
+        depth.append(out.qsize())
+        if msg[0] == 'rows':
+            writers[msg[1]].add(msg[2])
+        else:
+            done[msg[1]] = msg[2]
+            progress(f"worker {msg[1]}: {msg[2]['rounds']} rounds, {msg[2]['rows']} records, "
+                     f"{msg[2]['stalled']:.2f}s waiting on the queue")
+    for w in writers.values(): w.flush()
+    for p in procs: p.join()
+    seconds = time.perf_counter() - t0
+    records = sum(w.written for w in writers.values())
+    return {'rounds': rounds, 'seconds': seconds, 'records': records,
+            'records_per_s': records / seconds, 'bytes': sum(w.bytes for w in writers.values()),
+            'rows': {kind: w.written for kind, w in writers.items()},
+            'stalled': sum(d['stalled'] for d in done.values()),
+            'mean_queue_depth': float(np.mean(depth)) if depth else 0.0}
+
+# --- Loading ---
+def unpack(path):
+    # Directory of plain .npy files for a shard, extracted on first use
+    target = os.path.join(os.path.dirname(path), '.unpacked', os.path.basename(path)[:-4])
+    if not os.path.isdir(target) or os.path.getmtime(target) < os.path.getmtime(path):
+        tmp = target + '.tmp'
+        with zipfile.ZipFile(path) as z:
+            z.extractall(tmp)
+        if os.path.isdir(target):
+            for name in os.listdir(target): os.remove(os.path.join(target, name))
+            os.rmdir(target)
+        os.replace(tmp, target)
+    return target
+
+class Dataset:
+    # Every shard of one kind, columns memory-mapped
+    def __init__(self, directory, kind):
+        self.kind = kind
+        self.shards = []
+        for path in shard_paths(directory, kind):
+            target = unpack(path)
+            self.shards.append({name: np.load(os.path.join(target, name + '.npy'), mmap_mode='r')
+                                for name, _ in SPECS[kind]})
+        self.sizes = [len(s['action']) for s in self.shards]
+
+    def __len__(self):
+        return sum(self.sizes)
+
+    def column(self, name):
+        return np.concatenate([s[name] for s in self.shards]) if self.shards else np.zeros(0)
+
+    def batches(self, size, rng):
+        # Shards in random order, each in random batches; rows within a
+        # batch are read in file order
+        for i in rng.permutation(len(self.shards)):
+            shard, n = self.shards[i], self.sizes[i]
+            order = rng.permutation(n)
+            for at in range(0, n, size):
+                idx = np.sort(order[at:at + size])
+                yield {name: col[idx] for name, col in shard.items()}
+
+# --- Training ---
+def advantage_weights(margin, mean, std, beta=BETA):
+    return np.minimum(np.exp(beta * (margin - mean) / std), MAX_WEIGHT).astype(np.float32)
+
+def train(dataset, hidden=HIDDEN, epochs=EPOCHS, batch=BATCH, lr=LEARNING_RATE, beta=BETA, seed=0,
+          progress=print):
+    # Weights for one head (the dataset's kind), fitted with Adam
+    kind = dataset.kind
+    rng = np.random.default_rng(seed)
+    w = init_weights(kind, hidden, rng)
+    m = {k: np.zeros_like(v) for k, v in w.items()}
+    v = {k: np.zeros_like(v) for k, v in w.items()}
+    margin = dataset.column('margin').astype(np.float64)
+    mean, std = margin.mean(), max(margin.std(), 1.0)
+    step = 0
+    for epoch in range(epochs):
+        loss_sum, hits, seen = 0.0, 0, 0
+        for cols in dataset.batches(batch, rng):
+            x = FEATURES[kind](cols)
+            legal = legal_outputs(cols, kind)
+            target = action_index(cols, cols['action'], kind)
+            weight = advantage_weights(cols['margin'].astype(np.float64), mean, std, beta)
+            weight /= weight.sum()
+            rows = np.arange(len(target))
+
+            # Softmax over the legal outputs, cross-entropy on the recorded action
+            h, z = forward(w, x)
+            z = np.where(legal, z, -np.inf)
+            z -= z.max(axis=1, keepdims=True)
+            p = np.exp(z)
+            p /= p.sum(axis=1, keepdims=True)
+            loss_sum += -(weight * np.log(p[rows, target] + 1e-12)).sum() * len(target)
+            hits += (z.argmax(axis=1) == target).sum()
+            seen += len(target)
+
+            dz = p
+            dz[rows, target] -= 1
+            dz *= weight[:, None]
+            dh = (dz @ w['w2'].T) * (h > 0)
+            grads = {'w2': h.T @ dz, 'b2': dz.sum(axis=0), 'w1': x.T @ dh, 'b1': dh.sum(axis=0)}
+            step += 1
+            for k, g in grads.items():
+                m[k] = 0.9 * m[k] + 0.1 * g
+                v[k] = 0.999 * v[k] + 0.001 * g * g
+                w[k] -= lr * (m[k] / (1 - 0.9 ** step)) / (np.sqrt(v[k] / (1 - 0.999 ** step)) + 1e-8)
+        progress(f"{kind} epoch {epoch + 1}: loss {loss_sum / max(seen, 1):.4f}, "
+                 f"matches the recorded action {hits / max(seen, 1):.1%}")
+    return w
+
+def info(directory):
+    lines = []
+    for kind in SPECS:
+        paths = shard_paths(directory, kind)
+        data = Dataset(directory, kind)
+        size = sum(os.path.getsize(p) for p in paths)
+        lines.append(f"{kind}: {len(data)} records in {len(paths)} shards, {size / 2**20:.1f} MB compressed "
+                     f"({size / max(len(data), 1):.1f} bytes/record)")
+        if len(data):
+            tricks = data.column('tricks')
+            margin = data.column('margin')
+            lines.append(f"  team tricks {tricks[tricks >= 0].mean():.2f} on average, margin {margin.mean():+.2f}")
+    return "\n".join(lines)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Self-play data and training for the learned bots")
+    sub = parser.add_subparsers(dest='cmd', required=True)
+    p = sub.add_parser('generate', help="play rounds and record every decision")
+    p.add_argument('dir')
+    p.add_argument('--rounds', type=int, default=10000)
+    p.add_argument('--seats', default='bot,bot,bot,bot',
+                   help=f"four comma separated policies ({', '.join(POLICIES)})")
+    p.add_argument('--explore', type=float, default=EXPLORE, help="chance of a random legal action")
+    p.add_argument('--seed', type=int, default=0, help="master seed")
+    p.add_argument('--workers', type=int, default=None, help="default: one per core")
+    p.add_argument('--shard-rows', type=int, default=SHARD_ROWS)
+    p.add_argument('--queue', type=int, default=QUEUE_SIZE, help="batches in flight")
+    p = sub.add_parser('info', help="summarize a data directory")
+    p.add_argument('dir')
+    p = sub.add_parser('train', help="fit the bid and play networks")
+    p.add_argument('dir')
+    p.add_argument('--out', default=model_path())
+    p.add_argument('--kinds', default='bid,play', help="heads to train")
+    p.add_argument('--hidden', type=int, default=HIDDEN)
+    p.add_argument('--epochs', type=int, default=EPOCHS)
+    p.add_argument('--batch', type=int, default=BATCH)
+    p.add_argument('--lr', type=float, default=LEARNING_RATE)
+    p.add_argument('--beta', type=float, default=BETA, help="advantage weighting (0 = plain imitation)")
+    p.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    if args.cmd == 'generate':
+        seats = args.seats.split(',')
+        if len(seats) != 4:
+            parser.error("--seats needs exactly four policies")
+        for name in seats:
+            if name not in POLICIES:
+                parser.error(f"unknown policy '{name}' (choose from {', '.join(POLICIES)})")
+        r = generate(args.dir, args.rounds, seats, args.workers, args.explore, args.seed,
+                     args.shard_rows, args.queue)
+        print(f"{r['records']} records ({r['rows']['bid']} bids, {r['rows']['play']} cards) from {r['rounds']} "
+              f"rounds in {r['seconds']:.1f}s: {r['records_per_s']:.0f} records/s, "
+              f"{r['bytes'] / max(r['records'], 1):.1f} bytes/record compressed")
+        print(f"Workers waited {r['stalled']:.2f}s in total on a full queue "
+              f"(mean depth {r['mean_queue_depth']:.1f} of {args.queue})")
+    elif args.cmd == 'info':
+        print(info(args.dir))
+    else:
+        heads = {}
+        for kind in args.kinds.split(','):
+            data = Dataset(args.dir, kind)
+            if not len(data):
+                parser.error(f"no {kind} records in {args.dir}")
+            heads[kind] = train(data, args.hidden, args.epochs, args.batch, args.lr, args.beta, args.seed)
+        save_model(args.out, heads)
+        print(f"Wrote {args.out}")
@@ -0,0 +1,447 @@
+import argparse
+import asyncio
+import json
+import queue
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from bitboard import lowest
+from engine import (TarneebEngine, STATE_BIDDING, STATE_CHOOSE_TRUMP, STATE_ROUND_END,
+                    bot_bid, bot_trump)
+from policies import POLICIES, make_policy
+from snapshot import load, save
+
+# Multi-table game server. One asyncio process hosts any number of tables;
+# each runs the headless engine, human players hold the seats they joined and
+# bots play the rest. A table exists while at least one human sits at it.
+#
+# The protocol is newline-delimited JSON over TCP, one message per line.
+# Cards are codes and hands 52-bit masks (see bitboard.py). After the join
+# reply the server only sends what changed:
+#
+#   client -> server
+#     {"op": "join", "table": name, "seat": 0-3 or null for any free seat}
+#     {"op": "bid", "bid": 7-13 or 0 to pass}
+#     {"op": "trump", "suit": 0-3}
+#     {"op": "play", "card": code}
+#     {"op": "leave"}
+#
+#   server -> client
+#     {"t": "joined", "table", "seat", "state": snapshot of the table}
+#     {"t": "deal", "dealer", "hand", "scores"} your hand only
+#     {"t": "bid", "seat", "bid"}               every decision, yours included
+#     {"t": "trump", "seat", "suit"}
+#     {"t": "play", "seat", "card"}
+#     {"t": "round", "tricks", "delta", "scores"}
+#     {"t": "turn", "kind": "bid" | "trump" | "play", "highest" | "legal"}
+#     {"t": "error", "msg"}
+#
+# Everything else (whose turn it is, who won a trick, redeals after four
+# passes) follows from the rules. A player who joins mid-round takes the
+# seat over from its bot at the next deal, and hears nothing until then.
+
+PORT = 7777
+# Policies cheap enough to decide on the event loop; any other bot decides
+# on the offload pool so the loop keeps serving the other tables
+INLINE_POLICIES = {'bot', 'random', 'lowest', 'timid', 'heuristic', 'counting'}
+# Policies whose decisions are awaited from a batching service (decisions.py)
+BATCHED_POLICIES = {'batched'}
+YIELD_EVERY = 16        # inline bot decisions between yields to other tables
+MAX_BUFFER = 1 << 20    # bytes queued for a client before it is dropped as stalled
+ACTION_KEY = {'bid': 'bid', 'trump': 'suit', 'play': 'card'}
+
+def encode(msg):
+    return (json.dumps(msg, separators=(',', ':')) + '\n').encode()
+
+class Connection:
+    def __init__(self, writer):
+        self.writer = writer
+        self.table = None
+        self.seat = None
+
+    def send(self, msg):
+        self.send_bytes(encode(msg))
+
+    def send_bytes(self, data):
+        writer = self.writer
+        if writer.is_closing(): return
+        writer.write(data)
+        if writer.transport.get_write_buffer_size() > MAX_BUFFER:
+            writer.close()
+
+class Table:
+    def __init__(self, name, server, seed=None, state=None):
+        # state: a snapshot to pick the game up from
+        self.name = name
+        self.server = server
+        policies = [make_policy(server.bot, None if seed is None else seed + i) for i in range(4)]
+        self.engine = TarneebEngine(seed, policies) if state is None else load(state, policies)
+        self.seats = [None] * 4     # Connection per human seat
+        self.live = [False] * 4     # seat is played by its human (from their first deal)
+        self.waiting = None         # (seat, kind, future) while a human is to act
+        self.task = None
+        self.decisions = 0
+
+    def snapshot(self, seat):
+        # The table as `seat` may see it
+        e = self.engine
+        return {'dealer': e.dealer_idx, 'scores': [e.team_a_score, e.team_b_score],
+                'state': e.state, 'hand': e.hands[seat], 'bids': e.bid_log,
+                'highest': e.highest_bid, 'bid_winner': e.bid_winner, 'trump': e.trump_suit,
+                'trick': e.current_trick, 'tricks': e.tricks_won, 'played': e.played,
+                'humans': [c is not None for c in self.seats]}
+
+    def join(self, conn, seat=None):
+        free = [s for s in range(4) if self.seats[s] is None]
+        if seat is None:
+            if not free: raise ValueError(f"Table {self.name} is full")
+            seat = free[0]
+        elif seat not in (0, 1, 2, 3) or self.seats[seat] is not None:
+            raise ValueError(f"Seat {seat} is not free at table {self.name}")
+        self.seats[seat] = conn
+        conn.table, conn.seat = self, seat
+        conn.send({'t': 'joined', 'table': self.name, 'seat': seat, 'state': self.snapshot(seat)})
+        if self.task is None:
+            self.task = asyncio.create_task(self.run())
+
+    def leave(self, conn):
+        seat = conn.seat
+        if conn.table is not self or self.seats[seat] is not conn: return
+        self.seats[seat] = None
+        self.live[seat] = False
+        conn.table = conn.seat = None
+        w = self.waiting
+        if w is not None and w[0] == seat and not w[2].done():
+            w[2].set_result(None)  # the bot decides instead
+
+    def broadcast(self, msg):
+        # To the seats dealt in; one who joined mid-round hears from the next deal
+        data = encode(msg)
+        for conn, live in zip(self.seats, self.live):
+            if live: conn.send_bytes(data)
+
+    def send_deal(self):
+        e = self.engine
+        for seat, conn in enumerate(self.seats):
+            if conn is not None:
+                self.live[seat] = True
+                conn.send({'t': 'deal', 'dealer': e.dealer_idx, 'hand': e.dealt[seat],
+                           'scores': [e.team_a_score, e.team_b_score]})
+
+    def next_decision(self):
+        # (seat, kind) of the next decision, or None when the engine's next
+        # step is automatic (a passed seat, the bid won, a redeal)
+        e = self.engine
+        if e.state == STATE_BIDDING:
+            if all(e.passed) or (e.passed.count(False) == 1 and e.highest_bid > 6):
+                return None
+            seat = e.current_bidder_idx
+            return None if e.passed[seat] else (seat, 'bid')
+        if e.state == STATE_CHOOSE_TRUMP:
+            return e.bid_winner, 'trump'
+        return e.turn_idx, 'play'
+
+    def checkpoint(self):
+        if self.server.checkpoint is not None:
+            self.server.checkpoint(self.name, save(self.engine))
+
+    async def run(self):
+        e = self.engine
+        if not e.bid_log: self.send_deal()  # a table restored mid-round waits for the next deal
+        try:
+            while any(c is not None for c in self.seats):
+                if e.state == STATE_ROUND_END:
+                    self.broadcast({'t': 'round', 'tricks': e.tricks_won, 'delta': e.last_delta,
+                                    'scores': [e.team_a_score, e.team_b_score]})
+                    self.server.rounds += 1
+                    e.next_round()
+                    self.send_deal()
+                    self.checkpoint()
+                    continue
+                decision = self.next_decision()
+                if decision is None:
+                    dealt = e.dealt
+                    e.step()
+                    if e.dealt is not dealt:
+                        self.send_deal()
+                        self.checkpoint()
+                    continue
+                seat, kind = decision
+                action = await self.decide(seat, kind)
+                e.step(action)
+                self.broadcast({'t': kind, 'seat': seat, ACTION_KEY[kind]: action})
+                if kind == 'play' and not e.current_trick:
+                    self.server.tricks += 1
+                    self.checkpoint()
+        finally:
+            self.server.close_table(self)
+
+    async def decide(self, seat, kind):
+        if self.live[seat]:
+            action = await self.ask(seat, kind)
+            if action is not None: return action
+        return await self.bot_decide(seat, kind)
+
+    async def ask(self, seat, kind):
+        # The seat's human's action, or None if they leave first
+        e = self.engine
+        turn = {'t': 'turn', 'kind': kind}
+        if kind == 'bid': turn['highest'] = e.highest_bid
+        elif kind == 'play': turn['legal'] = e.legal_mask(seat)
+        fut = asyncio.get_running_loop().create_future()
+        self.waiting = (seat, kind, fut)
+        self.seats[seat].send(turn)
+        try:
+            return await fut
+        finally:
+            self.waiting = None
+
+    async def bot_decide(self, seat, kind):
+        e = self.engine
+        policy = e.policies[seat]
+        fn = {'bid': policy.bid, 'trump': policy.choose_trump, 'play': policy.play}[kind]
+        server = self.server
+        if server.bot_delay:
+            await asyncio.sleep(server.bot_delay)
+        if server.bot in BATCHED_POLICIES:
+            future = policy.request_async(kind, e, seat)
+            if future is not None:
+                return await future
+        if server.pool is not None:
+            return await asyncio.get_running_loop().run_in_executor(server.pool, fn, e, seat)
+        self.decisions += 1
+        if self.decisions % YIELD_EVERY == 0:
+            await asyncio.sleep(0)
+        return fn(e, seat)
+
+    def submit(self, conn, msg):
+        # A human's action; checked here so engine.step never sees a bad one
+        w = self.waiting
+        if w is None or self.seats[w[0]] is not conn or msg.get('op') != w[1]:
+            conn.send({'t': 'error', 'msg': "not your turn"})
+            return
+        seat, kind, fut = w
+        action = msg.get(ACTION_KEY[kind])
+        e = self.engine
+        if type(action) is not int:
+            ok = False
+        elif kind == 'bid':
+            ok = action == 0 or e.highest_bid < action <= 13
+        elif kind == 'trump':
+            ok = 0 <= action < 4
+        else:
+            ok = 0 <= action < 52 and e.legal_mask(seat) >> action & 1
+        if not ok:
+            conn.send({'t': 'error', 'msg': f"illegal {kind}: {action}"})
+        elif not fut.done():
+            fut.set_result(action)
+
+class TableServer:
+    def __init__(self, bot='bot', bot_delay=0.0, workers=None, seed=None, checkpoint=None):
+        # checkpoint(name, snapshot) is called with a table's snapshot after
+        # every trick and deal; restore() reopens a table from one
+        if bot not in POLICIES:
+            raise ValueError(f"Unknown policy '{bot}' (choose from {', '.join(POLICIES)})")
+        self.bot = bot
+        self.bot_delay = bot_delay
+        offload = bot not in INLINE_POLICIES and bot not in BATCHED_POLICIES
+        self.pool = ThreadPoolExecutor(workers, thread_name_prefix="bot") if offload else None
+        self.seed = seed
+        self.checkpoint = checkpoint
+        self.tables = {}
+        self.opened = 0
+        self.connections = 0
+        self.tricks = 0     # totals over the server's life, for load tests
+        self.rounds = 0
+
+    def decision_stats(self):
+        # The batching service's stats() with bot 'batched', else None
+        if self.bot not in BATCHED_POLICIES: return None
+        from decisions import shared_service
+        service = shared_service()
+        return service and service.stats()
+
+    def table(self, name, state=None):
+        table = self.tables.get(name)
+        if table is None:
+            seed = None if self.seed is None else self.seed + 4 * self.opened
+            table = self.tables[name] = Table(name, self, seed, state)
+            self.opened += 1
+        return table
+
+    def restore(self, name, state):
+        # Reopens a table at a snapshot (from checkpoint, maybe another
+        # process); it runs once a player joins
+        if name in self.tables:
+            raise ValueError(f"Table {name} is already open")
+        return self.table(name, state)
+
+    def close_table(self, table):
+        if self.tables.get(table.name) is table:
+            del self.tables[table.name]
+
+    def dispatch(self, conn, msg):
+        op = msg.get('op')
+        if op == 'join':
+            if conn.table is not None:
+                conn.send({'t': 'error', 'msg': "already seated"})
+                return
+            name = str(msg.get('table', 'default'))
+            table = self.table(name)
+            try:
+                table.join(conn, msg.get('seat'))
+            except ValueError as e:
+                if table.task is None: self.close_table(table)
+                conn.send({'t': 'error', 'msg': str(e)})
+        elif op == 'leave':
+            if conn.table is not None: conn.table.leave(conn)
+        elif conn.table is not None:
+            conn.table.submit(conn, msg)
+        else:
+            conn.send({'t': 'error', 'msg': "join a table first"})
+
+    async def handle(self, reader, writer):
+        conn = Connection(writer)
+        self.connections += 1
+        try:
+            async for line in reader:
+                try:
+                    msg = json.loads(line)
+                except ValueError:
+                    msg = None
+                if not isinstance(msg, dict):
+                    conn.send({'t': 'error', 'msg': "bad message"})
+                    continue
+                self.dispatch(conn, msg)
+        except ConnectionError:
+            pass
+        finally:
+            self.connections -= 1
+            if conn.table is not None: conn.table.leave(conn)
+            writer.close()
+
+    async def start(self, host='127.0.0.1', port=PORT, **kwargs):
+        # kwargs go to asyncio.start_server (e.g. backlog)
+        return await asyncio.start_server(self.handle, host, port, **kwargs)
+
+# --- Clients ---
+class BlockingClient:
+    # Connection for a synchronous program (the pygame client): a background
+    # thread reads server messages into a queue
+    def __init__(self, host, port=PORT, table='default', seat=None):
+        self.sock = socket.create_connection((host, port))
+        self.file = self.sock.makefile('rb')
+        self.send({'op': 'join', 'table': table, 'seat': seat})
+        reply = json.loads(self.file.readline() or b'{"t": "error", "msg": "connection closed"}')
+        if reply['t'] == 'error':
+            self.sock.close()
+            raise ConnectionError(reply['msg'])
+        self.seat = reply['seat']
+        self.state = reply['state']
+        self.events = queue.Queue()
+        threading.Thread(target=self.read_loop, name="server", daemon=True).start()
+
+    def read_loop(self):
+        try:
+            for line in self.file:
+                self.events.put(json.loads(line))
+        except OSError:
+            pass
+        self.events.put(None)
+
+    def send(self, msg):
+        self.sock.sendall(encode(msg))
+
+    def next_event(self, block=True):
+        # The next server message; None if block is false and none has arrived
+        try:
+            msg = self.events.get(block)
+        except queue.Empty:
+            return None
+        if msg is None:
+            self.events.put(None)
+            raise ConnectionError("server closed the connection")
+        return msg
+
+    def close(self):
+        self.sock.close()
+
+async def scripted_client(host, port, table, rounds, seat=None):
+    # A simulated player: joins, bids and picks trump like the default bot,
+    # plays its lowest legal card, and leaves after `rounds` rounds
+    reader, writer = await asyncio.open_connection(host, port)
+    writer.write(encode({'op': 'join', 'table': table, 'seat': seat}))
+    hand, done = 0, 0
+    async for line in reader:
+        msg = json.loads(line)
+        t = msg['t']
+        if t == 'deal':
+            hand = msg['hand']
+        elif t == 'turn':
+            kind = msg['kind']
+            if kind == 'bid': reply = {'op': 'bid', 'bid': bot_bid(hand, msg['highest'])}
+            elif kind == 'trump': reply = {'op': 'trump', 'suit': bot_trump(hand)}
+            else: reply = {'op': 'play', 'card': lowest(msg['legal'])}
+            writer.write(encode(reply))
+        elif t == 'round':
+            done += 1
+            if done >= rounds: break
+        elif t == 'error':
+            raise RuntimeError(msg['msg'])
+    writer.close()
+    return done
+
+async def simulate(tables, humans, rounds, bot='bot', seed=0):
+    # Starts a server on a free loopback port and fills `tables` tables with
+    # `humans` scripted clients each
+    server = TableServer(bot, seed=seed)
+    srv = await server.start('127.0.0.1', 0)
+    port = srv.sockets[0].getsockname()[1]
+    t0 = time.perf_counter()
+    done = await asyncio.gather(*(scripted_client('127.0.0.1', port, f"sim{t}", rounds, s)
+                                  for t in range(tables) for s in range(humans)))
+    dt = time.perf_counter() - t0
+    srv.close()
+    await srv.wait_closed()
+    return sum(done), dt
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Tarneeb multi-table game server")
+    sub = parser.add_subparsers(dest='cmd', required=True)
+    serve = sub.add_parser('serve', help="host tables until interrupted")
+    serve.add_argument('--host', default='127.0.0.1')
+    serve.add_argument('--port', type=int, default=PORT)
+    serve.add_argument('--bot-delay', type=float, default=0.0, help="seconds each bot decision takes")
+    serve.add_argument('--workers', type=int, default=None, help="offload pool size for slow bots")
+    sim = sub.add_parser('sim', help="run scripted clients against a local server")
+    sim.add_argument('--tables', type=int, default=100)
+    sim.add_argument('--humans', type=int, default=2, help="scripted clients per table")
+    sim.add_argument('--rounds', type=int, default=10, help="rounds each client plays")
+    for p in (serve, sim):
+        p.add_argument('--bot', default='bot', help=f"policy for empty seats ({', '.join(POLICIES)})")
+        p.add_argument('--model', default=None, help="model for the learned and batched bots (selfplay.py)")
+        p.add_argument('--seed', type=int, default=None)
+    args = parser.parse_args()
+    if args.model:
+        from learned import use_model
+        use_model(args.model)
+
+    if args.cmd == 'serve':
+        async def main():
+            server = TableServer(args.bot, args.bot_delay, args.workers, args.seed)
+            srv = await server.start(args.host, args.port)
+            print(f"Serving on {args.host}:{args.port}")
+            async with srv:
+                await srv.serve_forever()
+        try:
+            asyncio.run(main())
+        except KeyboardInterrupt:
+            pass
+    else:
+        if not 1 <= args.humans <= 4:
+            parser.error("--humans must be 1-4")
+        rounds, dt = asyncio.run(simulate(args.tables, args.humans, args.rounds, args.bot, args.seed))
+        print(f"{args.tables} tables, {args.tables * args.humans} clients: "
+              f"{rounds // args.humans} rounds in {dt:.2f}s ({rounds / args.humans / dt:.0f} rounds/s)")
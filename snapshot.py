@@ -0,0 +1,107 @@
+import os
+import struct
+
+from bitboard import hand_mask
+from engine import (TarneebEngine, STATE_BIDDING, STATE_CHOOSE_TRUMP, STATE_PLAYING, STATE_ROUND_END,
+                    score_round, trick_winner)
+
+# Compact snapshots of a game in progress, mid-bid and mid-trick included, for
+# checkpointing tables and moving them between processes. A snapshot is the
+# engine's state and nothing else (no pygame objects), as one fixed block and
+# two short variable parts:
+#
+#   4s magic, u8 version
+#   u64 deal seed, u8 dealer, u8 redeals, u8 state
+#   2 x i32 scores, 2 x i16 last score change
+#   4 x u64  hands as dealt, 4 x u64  hands now
+#   u8 highest bid, i8 bid winner, i8 trump (-1 = none yet)
+#   i8 bidder, i8 trick starter, i8 turn (-1 = not started)
+#   u8 passed seats (bit per seat), u16 voids (nibble per seat), 4 x u8 tricks won
+#   u8 n, then n bidding decisions as seat << 4 | bid (0 = pass)
+#   u8 n, then n card codes in play order
+#
+# The rest (cards played, the trick on the table and who is winning it, the
+# bids per seat) follows from these. Under 170 bytes, and saving or loading
+# one takes microseconds (bench.py snapshot.*).
+#
+# The engine's rng is not saved (its state alone is 2.5 KB). A restored game
+# draws its later deals from a generator seeded by the snapshot, so it plays
+# on the same way every time it is restored, though not with the deals the
+# original game would have had.
+
+MAGIC = b'TRNS'
+VERSION = 1
+FIXED = struct.Struct('<4sBQBBB2i2h4Q4QBbbbbbBH4B')
+STATES = (STATE_BIDDING, STATE_CHOOSE_TRUMP, STATE_PLAYING, STATE_ROUND_END)
+
+def resume_seed(deal_seed):
+    # Seed of the generator for deals after a restore
+    return deal_seed ^ 0x5EED
+
+def save(engine):
+    e = engine
+    if e.state not in STATES:
+        raise ValueError(f"Cannot snapshot engine state {e.state}")
+    trump = -1 if e.trump_suit is None else e.trump_suit
+    passed = sum(1 << s for s in range(4) if e.passed[s])
+    voids = e.voids[0] | e.voids[1] << 4 | e.voids[2] << 8 | e.voids[3] << 12
+    bids = bytes(seat << 4 | bid for seat, bid in e.bid_log)
+    return (FIXED.pack(MAGIC, VERSION, e.deal_seed, e.dealer_idx, e.redeals, e.state,
+                       e.team_a_score, e.team_b_score, *e.last_delta, *e.dealt, *e.hands,
+                       e.highest_bid, e.bid_winner, trump, e.current_bidder_idx, e.trick_starter, e.turn_idx,
+                       passed, voids, *e.tricks_won)
+            + bytes((len(bids),)) + bids + bytes((len(e.plays),)) + bytes(e.plays))
+
+def load(data, policies=None):
+    # A new engine at the snapshot's position, seats played by `policies`
+    if len(data) < FIXED.size + 2 or data[:4] != MAGIC:
+        raise ValueError("Not a Tarneeb snapshot")
+    f = FIXED.unpack_from(data)
+    if f[1] != VERSION:
+        raise ValueError(f"Unsupported snapshot version {f[1]}")
+    at = FIXED.size
+    n = data[at]
+    bids = [(b >> 4, b & 15) for b in data[at + 1:at + 1 + n]]
+    at += 1 + n
+    plays = list(data[at + 1:at + 1 + data[at]])
+
+    e = TarneebEngine(resume_seed(f[2]), policies, hands=f[10:14])
+    e.deal_seed, e.dealer_idx, e.redeals, e.state = f[2:6]
+    e.team_a_score, e.team_b_score = f[6:8]
+    e.last_delta = f[8:10]
+    e.hands = list(f[14:18])
+    e.highest_bid, e.bid_winner = f[18], f[19]
+    e.trump_suit = None if f[20] < 0 else f[20]
+    e.current_bidder_idx, e.trick_starter, e.turn_idx = f[21:24]
+    e.passed = [f[24] >> s & 1 == 1 for s in range(4)]
+    e.voids = [f[25] >> 4 * s & 15 for s in range(4)]
+    e.tricks_won = list(f[26:30])
+    e.bid_log = bids
+    for seat, bid in bids:
+        if bid: e.bids[seat] = bid
+    e.plays = plays
+    e.played = hand_mask(plays)
+
+    if e.state == STATE_PLAYING:
+        # The trick on the table is the tail of the plays
+        n = len(plays) % 4
+        e.current_trick = [((e.trick_starter + i) % 4, c) for i, c in enumerate(plays[len(plays) - n:])]
+        if n: e.trick_winner_idx, e.trick_best = trick_winner(e.current_trick, e.trump_suit)
+        e.message = ""
+    elif e.state == STATE_CHOOSE_TRUMP:
+        e.message = f"Seat {e.bid_winner} wins bid with {e.highest_bid}"
+    elif e.state == STATE_ROUND_END:
+        t = e.tricks_won
+        e.message = score_round(t[0] + t[2], t[1] + t[3], e.bid_winner, e.highest_bid)[2]
+    return e
+
+def save_file(path, engine):
+    # Written to a temporary file first, so a crash never leaves half a snapshot
+    tmp = path + '.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(save(engine))
+    os.replace(tmp, path)
+
+def load_file(path, policies=None):
+    with open(path, 'rb') as f:
+        return load(f.read(), policies)
@@ -1,13 +1,45 @@
+from time import perf_counter_ns
+STARTED = perf_counter_ns()  # before the imports, for the startup report
+
+import os
 import pygame
 import random
 import sys
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import bitboard as bb
+from animation import Animator
+from profiler import Profiler, StartupTimer, WAIT
+from dealing import RiggedDeal
+from replay import LogWriter, Replay, RoundRecord
+from snapshot import load_file, resume_seed, save_file
+from bitboard import SUITS, RANKS
+from engine import TarneebEngine, STATE_BIDDING, STATE_CHOOSE_TRUMP, STATE_PLAYING, STATE_ANIMATING, STATE_ROUND_END
+from engine import bot_bid, bot_trump, bot_play, score_round, trick_winner
+from knowledge import HandKnowledge
 
 # --- Constants ---
 SCREEN_WIDTH, SCREEN_HEIGHT = 1024, 768
 BG_COLOR = (34, 100, 34)  # Darker Felt Green
 CARD_WIDTH, CARD_HEIGHT = 60, 90
 FPS = 60
-ANIMATION_SPEED = 0.15
+IDLE_FPS = 20
+TEXT_CACHE_SIZE = 256
+PROFILER_KEY = pygame.K_F3
+PROFILER_REFRESH = 15  # frames between overlay updates
+
+# Animation durations (ms); motion is time-based, independent of FPS
+DEAL_TIME = 650
+PLAY_TIME = 350
+COLLECT_TIME = 300
+
+# Pacing (ms). These are non-blocking timers; the loop keeps running.
+BOT_BID_DELAY = 500
+BOT_PLAY_DELAY = 800
+TRICK_PAUSE = 1000
+RESHUFFLE_PAUSE = 2000
+DEAL_POLL = 50  # networked game waiting for a deal
 
 # Colors
 WHITE = (240, 240, 240)
@@ -17,82 +49,234 @@ GOLD = (255, 215, 0)
 SCORE_BG = (20, 50, 20)
 GRAY = (150, 150, 150)
 
-SUITS = ['♠', '♥', '♣', '♦']
 SUIT_COLORS = {'♠': BLACK, '♥': RED, '♣': BLACK, '♦': RED}
-RANKS = {
-    2: '2', 3: '3', 4: '4', 5: '5', 6: '6', 7: '7', 8: '8', 9: '9', 
-    10: '10', 11: 'J', 12: 'Q', 13: 'K', 14: 'A'
-}
-
-# States
-STATE_BIDDING = 0
-STATE_CHOOSE_TRUMP = 1
-STATE_PLAYING = 2
-STATE_ANIMATING = 3
-STATE_ROUND_END = 4
 
 class Card:
     def __init__(self, rank, suit):
         self.rank = rank
         self.suit = suit
-        self.rect = pygame.Rect(0, 0, CARD_WIDTH, CARD_HEIGHT)
-        self.x, self.y = 0, 0
-        self.target_x, self.target_y = 0, 0
-        self.is_moving = False
+        self.code = bb.make_card(rank, SUITS.index(suit))  # bitboard index
         self.selected = False
 
+    # Position lives in the shared card animator, in the card's code slot
+    @property
+    def x(self):
+        return card_motion().pos[self.code, 0]
+
+    @property
+    def y(self):
+        return card_motion().pos[self.code, 1]
+
+    @property
+    def is_moving(self):
+        return card_motion().active[self.code]
+
+    @property
+    def rect(self):
+        return pygame.Rect(int(self.x), int(self.y), CARD_WIDTH, CARD_HEIGHT)
+
     def set_pos(self, x, y):
-        self.x, self.y = x, y
-        self.target_x, self.target_y = x, y
-        self.rect.topleft = (int(x), int(y))
-
-    def move_to(self, x, y):
-        self.target_x = x
-        self.target_y = y
-        self.is_moving = True
-
-    def update(self):
-        if self.is_moving:
-            dx = self.target_x - self.x
-            dy = self.target_y - self.y
-            if abs(dx) < 1 and abs(dy) < 1:
-                self.x, self.y = self.target_x, self.target_y
-                self.is_moving = False
-            else:
-                self.x += dx * ANIMATION_SPEED
-                self.y += dy * ANIMATION_SPEED
-            self.rect.topleft = (int(self.x), int(self.y))
-        return self.is_moving
+        card_motion().place(self.code, x, y)
+
+    def move_to(self, x, y, duration=PLAY_TIME, on_done=None):
+        card_motion().move(self.code, (x, y), duration, on_done=on_done)
 
     def draw(self, surface, hidden=False):
-        if hidden:
-            pygame.draw.rect(surface, (60, 60, 100), (self.x, self.y, CARD_WIDTH, CARD_HEIGHT), border_radius=4)
-            pygame.draw.rect(surface, WHITE, (self.x, self.y, CARD_WIDTH, CARD_HEIGHT), 2, border_radius=4)
-            # Simple Pattern
-            pygame.draw.line(surface, (80, 80, 140), (self.x+5, self.y+5), (self.x+CARD_WIDTH-5, self.y+CARD_HEIGHT-5), 2)
-            pygame.draw.line(surface, (80, 80, 140), (self.x+CARD_WIDTH-5, self.y+5), (self.x+5, self.y+CARD_HEIGHT-5), 2)
+        atlas = card_atlas()
+        area = atlas.back if hidden else atlas.face(self.code, self.selected)
+        surface.blit(atlas.surface, (int(self.x), int(self.y)), area)
+
+# One Card per code, reused every round
+CARDS = [Card(bb.RANK_OF[c], SUITS[bb.SUIT_OF[c]]) for c in bb.DECK]
+
+class CardAtlas:
+    # Every face (plain and selected) and the card back in a single surface,
+    # each face rendered the first time it is drawn. Drawing a card is then
+    # one blit of a region of it.
+    def __init__(self):
+        # Rows 0-3: faces by suit, rows 4-7: selected faces, row 8: the back
+        self.surface = pygame.Surface((13 * CARD_WIDTH, 9 * CARD_HEIGHT), pygame.SRCALPHA)
+        if pygame.display.get_surface():
+            self.surface = self.surface.convert_alpha()
+        self.faces = [None] * 104  # code * 2 + selected -> Rect, once rendered
+        self.back = pygame.Rect(0, 8 * CARD_HEIGHT, CARD_WIDTH, CARD_HEIGHT)
+        self.draw_back(self.back)
+
+    def face(self, code, selected):
+        r = self.faces[code * 2 + selected]
+        if r is None:
+            rank, s_idx = bb.RANK_OF[code], bb.SUIT_OF[code]
+            r = self.faces[code * 2 + selected] = pygame.Rect(
+                (rank - 2) * CARD_WIDTH, (s_idx + 4 * selected) * CARD_HEIGHT, CARD_WIDTH, CARD_HEIGHT)
+            self.draw_face(r, rank, SUITS[s_idx], selected)
+        return r
+
+    def draw_face(self, r, rank, suit, selected):
+        font_small, font_large = font('bold', 18), font('regular', 32)
+        s = self.surface
+        pygame.draw.rect(s, WHITE, r, border_radius=4)
+        border_col = GOLD if selected else (50, 50, 50)
+        thickness = 3 if selected else 1
+        pygame.draw.rect(s, border_col, r, thickness, border_radius=4)
+
+        col = SUIT_COLORS[suit]
+        s.blit(font_small.render(RANKS[rank], True, col), (r.x + 3, r.y + 2))
+        s.blit(font_small.render(suit, True, col), (r.x + 3, r.y + 18))
+
+        center_txt = font_large.render(suit, True, col)
+        cw, ch = center_txt.get_size()
+        s.blit(center_txt, (r.x + (CARD_WIDTH-cw)//2, r.y + (CARD_HEIGHT-ch)//2))
+
+    def draw_back(self, r):
+        s = self.surface
+        pygame.draw.rect(s, (60, 60, 100), r, border_radius=4)
+        pygame.draw.rect(s, WHITE, r, 2, border_radius=4)
+        # Simple Pattern
+        pygame.draw.line(s, (80, 80, 140), (r.x+5, r.y+5), (r.right-5, r.bottom-5), 2)
+        pygame.draw.line(s, (80, 80, 140), (r.right-5, r.y+5), (r.x+5, r.bottom-5), 2)
+
+# Bundled fonts (DejaVu subsets, see fonts/LICENSE), so startup never waits
+# on a system font scan
+FONT_FILES = {'regular': 'DejaVuSans.ttf', 'bold': 'DejaVuSans-Bold.ttf', 'mono': 'DejaVuSansMono.ttf'}
+
+def data_path(*parts):
+    # Frozen builds unpack data files under sys._MEIPASS
+    base = getattr(sys, '_MEIPASS', os.path.dirname(os.path.abspath(__file__)))
+    return os.path.join(base, *parts)
+
+_fonts = {}
+
+def font(style, size):
+    # One shared font per (style, size), opened on first use. Without the
+    # bundled files pygame's default font stands in
+    f = _fonts.get((style, size))
+    if f is None:
+        path = data_path('fonts', FONT_FILES[style])
+        if os.path.exists(path):
+            f = pygame.font.Font(path, size)
         else:
-            pygame.draw.rect(surface, WHITE, (self.x, self.y, CARD_WIDTH, CARD_HEIGHT), border_radius=4)
-            border_col = GOLD if self.selected else (50, 50, 50)
-            thickness = 3 if self.selected else 1
-            pygame.draw.rect(surface, border_col, (self.x, self.y, CARD_WIDTH, CARD_HEIGHT), thickness, border_radius=4)
-            
-            font_small = pygame.font.SysFont('Arial', 18, bold=True)
-            font_large = pygame.font.SysFont('Arial', 32)
-            col = SUIT_COLORS[self.suit]
-            
-            surface.blit(font_small.render(RANKS[self.rank], True, col), (self.x + 3, self.y + 2))
-            surface.blit(font_small.render(self.suit, True, col), (self.x + 3, self.y + 18))
-            
-            center_txt = font_large.render(self.suit, True, col)
-            cw, ch = center_txt.get_size()
-            surface.blit(center_txt, (self.x + (CARD_WIDTH-cw)//2, self.y + (CARD_HEIGHT-ch)//2))
+            f = pygame.font.Font(None, size)
+            f.set_bold(style == 'bold')
+        _fonts[style, size] = f
+    return f
+
+def ticks():
+    # Milliseconds since startup (pygame.time.get_ticks needs pygame.init())
+    return (perf_counter_ns() - STARTED) // 1000000
+
+_card_atlas = None
+
+def card_atlas():
+    # Built on first use, after the display exists
+    global _card_atlas
+    if _card_atlas is None:
+        _card_atlas = CardAtlas()
+    return _card_atlas
+
+_card_motion = None
+
+def card_motion():
+    # One animator for the 52 cards, slot = card code
+    global _card_motion
+    if _card_motion is None:
+        _card_motion = Animator(52)
+    return _card_motion
+
+class TextCache:
+    # Rendered text surfaces keyed by (text, font, color), least recently
+    # used evicted first once `size` surfaces are held
+    def __init__(self, size=TEXT_CACHE_SIZE):
+        self.size = size
+        self.surfaces = OrderedDict()
+        self.hits = self.misses = 0
+
+    def render(self, text, font, color):
+        key = (text, font, color)
+        surf = self.surfaces.get(key)
+        if surf is not None:
+            self.surfaces.move_to_end(key)
+            self.hits += 1
+            return surf
+        self.misses += 1
+        surf = self.surfaces[key] = font.render(text, True, color)
+        if len(self.surfaces) > self.size:
+            self.surfaces.popitem(last=False)
+        return surf
+
+class DirtyRenderer:
+    # Retained display list. Each frame the game add()s what it would draw, in
+    # z-order, with a signature of its contents; end() repaints only the
+    # regions whose items appeared, vanished, moved or changed, over a cached
+    # background, and returns them for display.update()
+    def __init__(self, screen, background):
+        self.screen = screen
+        self.background = background
+        self.prev = {}
+        self.cur = {}
+        self.items = []
+        self.full = True
+
+    def invalidate(self):
+        self.full = True
+
+    def begin(self):
+        self.items.clear()
+        self.prev, self.cur = self.cur, self.prev
+        self.cur.clear()
+
+    def add(self, key, sig, build):
+        # build() -> (rect, draw fn) is only called when the signature differs
+        # from last frame's, so an unchanged item costs a dict lookup
+        item = self.prev.get(key)
+        if item is None or item[1] != sig:
+            item = (key, sig) + build()
+        self.items.append(item)
+        self.cur[key] = item
+
+    def end(self):
+        dirty = []
+        prev = self.prev
+        for item in self.items:
+            old = prev.get(item[0])
+            if old is not item:
+                dirty.append(item[2])
+                if old is not None: dirty.append(old[2])
+        for key, old in prev.items():
+            if key not in self.cur:
+                dirty.append(old[2])
+
+        screen = self.screen
+        if self.full:
+            dirty = [screen.get_rect()]
+            self.full = False
+        if not dirty: return dirty
+
+        # Merge overlapping rects so shared areas are painted once
+        merged = []
+        for r in dirty:
+            r = r.clip(screen.get_rect())
+            if not r.w or not r.h: continue
+            i = r.collidelist(merged)
+            while i != -1:
+                r = r.union(merged.pop(i))
+                i = r.collidelist(merged)
+            merged.append(r)
+
+        for r in merged:
+            screen.set_clip(r)
+            screen.blit(self.background, r, r)
+            for item in self.items:
+                if item[2].colliderect(r):
+                    item[3](screen)
+        screen.set_clip(None)
+        return merged
 
 class Player:
     def __init__(self, name, p_id, is_bot=True):
         self.name = name
         self.id = p_id
-        self.hand = []
+        self.hand = []   # Card views, for rendering
+        self.mask = 0    # Bitboard of the same hand, for rules and bots
         self.is_bot = is_bot
         self.tricks_won = 0
         self.bid_val = 0  # 0 = no bid yet
@@ -101,15 +285,36 @@ class Player:
     def sort_hand(self):
         self.hand.sort(key=lambda c: (c.suit, c.rank))
 
+    def set_hand(self, cards):
+        self.hand = cards
+        self.mask = bb.hand_mask(c.code for c in cards)
+        self.sort_hand()
+
+    def remove_card(self, card):
+        self.hand.remove(card)
+        self.mask &= ~(1 << card.code)
+
 class TarneebGame:
-    def __init__(self):
-        pygame.init()
+    def __init__(self, seed=None, log_path=None, deal_policy=None, trace_path=None, save_path=None, bot=None):
+        # Frame profiler: F3 toggles its overlay; trace_path records a trace
+        # of the whole session, written on exit. A game at save_path is
+        # resumed, and the game is saved there on exit. `bot` names a policy
+        # (policies.POLICIES) for the bot seats instead of the built-in play
+        self.startup = StartupTimer(STARTED)
+        self.startup_log = None  # set (to '-' or a file) to report the startup and quit after the first frame
+        self.prof = Profiler()
+        self.trace_path = trace_path
+        if trace_path is not None: self.prof.start_trace()
+        # Only what the game uses: no audio or joystick start-up
+        pygame.display.init()
+        pygame.font.init()
         self.screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
         pygame.display.set_caption("Tarneeb Pro: Clean UI")
+        self.startup.mark('display')
         self.clock = pygame.time.Clock()
-        self.font = pygame.font.SysFont('Arial', 18)
-        self.font_bold = pygame.font.SysFont('Arial', 24, bold=True)
-        self.font_big = pygame.font.SysFont('Arial', 36, bold=True)
+        self.renderer = DirtyRenderer(self.screen, self.build_background())
+        self.text = TextCache()
+        self.dim_layers = {}
         
         self.players = [
             Player("You", 0, is_bot=False),
@@ -126,138 +331,110 @@ class TarneebGame:
             (100, SCREEN_HEIGHT//2)                 # Left
         ]
 
+        # Bot decisions run on a worker thread; the main loop polls the future
+        self.bot_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="bot")
+        self.bot_job = None
+        self.bot_job_seat = -1
+        self.bot_job_ready_at = 0
+        self.bot_policy = None
+        if bot is not None:
+            from policies import make_policy
+            self.bot_policy = make_policy(bot, seed)
+        self.timer_at = 0
+        self.timer_action = None
+
+        # Deals come from per-round seeds drawn from this rng; finished
+        # rounds are appended to the game log, if any
+        self.rng = random.Random(seed)
+        self.deal_policy = deal_policy or RiggedDeal()
+        self.log = LogWriter(log_path) if log_path else None
+        self.speed = 1.0  # pacing multiplier (replays)
+        self.redeals = 0
+
         self.team_a_score = 0
         self.team_b_score = 0
         self.dealer_idx = 0
+        self.layout_pending = False
         self.reset_round()
+        self.save_path = save_path
+        if save_path is not None and os.path.exists(save_path):
+            self.restore(load_file(save_path))
+        self.startup.mark('game')
+
+    # Fonts come from the shared registry, opened when first drawn
+    @property
+    def font(self):
+        return font('regular', 18)
+
+    @property
+    def font_bold(self):
+        return font('bold', 24)
+
+    @property
+    def font_big(self):
+        return font('bold', 36)
+
+    @property
+    def font_mono(self):
+        return font('mono', 14)  # profiler overlay
+
+    # --- Async bot jobs & timers ---
+    def submit_bot_job(self, seat, fn, *args, min_ms=0):
+        # The result is released no earlier than min_ms from now, so fast bots
+        # keep the same pacing and slow ones never freeze the frame loop
+        self.bot_job = self.bot_pool.submit(self.prof.wrap('bot.' + fn.__name__.removeprefix('bot_'), fn), *args)
+        self.bot_job_seat = seat
+        self.bot_job_ready_at = ticks() + min_ms / self.speed
+
+    def poll_bot_job(self):
+        # Returns (True, result) once the pending job is done, else (False, None)
+        job = self.bot_job
+        if job is None or not job.done() or ticks() < self.bot_job_ready_at:
+            return False, None
+        self.bot_job = None
+        self.bot_job_seat = -1
+        return True, job.result()
+
+    def start_timer(self, ms, action):
+        self.timer_at = ticks() + ms / self.speed
+        self.timer_action = action
+
+    def update_timers(self):
+        if self.timer_action and ticks() >= self.timer_at:
+            action, self.timer_action = self.timer_action, None
+            action()
 
-    # --- Add this helper method inside the Class ---
     def get_trick_winner(self, trick):
+        # (seat, card) taking the trick, by the engine's rules
         if not trick: return -1
-        
-        # The winner is the player who played the highest card 
-        # (accounting for Trump and Lead suit)
-        winner_idx = trick[0][0]
-        lead_suit = trick[0][1].suit
-        best_card = trick[0][1]
-
-        for p_idx, card in trick[1:]:
-            # 1. Trump overrides non-trump
-            if card.suit == self.trump_suit:
-                if best_card.suit != self.trump_suit:
-                    best_card = card
-                    winner_idx = p_idx
-                elif card.rank > best_card.rank: # Higher trump wins
-                    best_card = card
-                    winner_idx = p_idx
-            # 2. Follow suit (if best card isn't trump)
-            elif card.suit == lead_suit:
-                if best_card.suit == lead_suit and card.rank > best_card.rank:
-                    best_card = card
-                    winner_idx = p_idx
-        
-        return winner_idx, best_card
+        winner_idx, best = trick_winner([(s, c.code) for s, c in trick], SUITS.index(self.trump_suit))
+        return winner_idx, CARDS[best]
 
-    # --- Replace the old bot_play_card with this smart version ---
     def bot_play_card(self, player):
-        lead_suit = self.current_trick[0][1].suit if self.current_trick else None
-        valid = self.get_valid_moves(player.hand, lead_suit)
-        
-        # Sort valid cards: Index 0 is Low, Index -1 is High
-        valid.sort(key=lambda c: c.rank)
-
-        # SCENARIO 1: Bot is Leading (Trick is empty)
-        if not self.current_trick:
-            # Play highest card to force others to spend high cards
-            return valid[-1]
+        # Same play as the original card-object version (highest card to
+        # lead, lowest when the partner is winning or the trick is lost),
+        # read off the seat's tracked knowledge instead of rescanning
+        if self.bot_policy is not None:
+            return CARDS[self.bot_policy.play(self.to_engine(), player.id)]
+        k = self.knowledge[player.id]
+        if len(k.trick) == 4:
+            return CARDS[bot_play(k.hand, (), k.trump, player.id)]  # the last trick, cleared on our lead
+        return CARDS[bot_play(k.hand, k.trick, k.trump, player.id, k.winner, k.best)]
 
-        # SCENARIO 2: Analyze the table
-        current_winner_idx, best_card_on_table = self.get_trick_winner(self.current_trick)
-        partner_idx = (player.id + 2) % 4
-        
-        is_partner_winning = (current_winner_idx == partner_idx)
-
-        if is_partner_winning:
-            # SMART MOVE: If partner is winning, do NOT waste high cards.
-            # Play the absolute lowest valid card (trash).
-            return valid[0] 
-        
-        else:
-            # SCENARIO 3: Partner is losing (Opponent is winning)
-            # We must try to win if possible.
-            
-            # Check if our highest card can beat the table
-            my_best = valid[-1]
-            
-            # Logic to check if 'my_best' actually beats 'best_card_on_table'
-            can_win = False
-            if my_best.suit == self.trump_suit:
-                if best_card_on_table.suit != self.trump_suit:
-                    can_win = True # We trumped their non-trump
-                elif my_best.rank > best_card_on_table.rank:
-                    can_win = True # Over-trumped
-            elif my_best.suit == lead_suit:
-                if best_card_on_table.suit == lead_suit and best_card_on_table.suit != self.trump_suit:
-                     if my_best.rank > best_card_on_table.rank:
-                         can_win = True
-            
-            if can_win:
-                return valid[-1] # Play to win!
-            else:
-                # If we can't win, don't waste a medium card. Dump the lowest.
-                return valid[0]
+    def deal_hands(self):
+        # Four hand masks from this round's seed
+        return self.deal_policy.deal(random.Random(self.deal_seed))
 
     def reset_round(self):
-        # 1. Generate the deck
-        self.deck = [Card(r, s) for r in RANKS for s in SUITS]
-        random.shuffle(self.deck)
-        
-        # 2. Create 4 temporary hands from the shuffle
-        temp_hands = []
-        for i in range(4):
-            temp_hands.append(self.deck[i*13 : (i+1)*13])
-
-        # 3. Define a "Strength" function (Favors High Cards heavily)
-        def get_hand_strength(hand):
-            # Weigh face cards (11-14) exponentially higher
-            score = 0
-            for card in hand:
-                if card.rank >= 10:
-                    score += card.rank ** 2  # Exponential weight for 10, J, Q, K, A
-                else:
-                    score += card.rank
-            return score
-
-        # 4. Sort hands by strength (Index 0 = God Hand, Index 3 = Weakest)
-        temp_hands.sort(key=get_hand_strength, reverse=True)
-
-        # 5. Pick "Lucky" players (1 or 2 players get the best hands)
-        # We start with [0, 1, 2, 3] and pick 1 or 2 to be favored
-        all_indices = [0, 1, 2, 3]
-        lucky_count = random.randint(1, 2)
-        lucky_players = random.sample(all_indices, lucky_count)
-        
-        # print(f"DEBUG: Round Rigged for Players: {lucky_players}") # Console tracker
-
-        # 6. Assign hands
-        final_hands = [None] * 4
-        
-        # Give the best hands (0 and maybe 1) to the lucky players
-        for i, p_idx in enumerate(lucky_players):
-            final_hands[p_idx] = temp_hands[i]
-
-        # Give the remaining (weaker) hands to the others
-        remaining_players = [x for x in all_indices if x not in lucky_players]
-        remaining_hands = temp_hands[lucky_count:]
-        random.shuffle(remaining_players) # Shuffle so the worst hand isn't predictable
-        
-        for i, p_idx in enumerate(remaining_players):
-            final_hands[p_idx] = remaining_hands[i]
+        # Each deal has its own seed so a logged round can be re-dealt alone
+        self.deal_seed = self.rng.getrandbits(63)
+        hands = self.deal_hands()
 
-        # 7. Apply to Player Objects
+        # Apply to Player Objects, reusing the pooled cards
         for i in range(4):
-            self.players[i].hand = final_hands[i]
-            self.players[i].sort_hand()
+            cards = [CARDS[c] for c in bb.cards_of(hands[i])]
+            for c in cards: c.selected = False
+            self.players[i].set_hand(cards)
             self.players[i].tricks_won = 0
             self.players[i].bid_val = 0
             self.players[i].status = "WAITING"
@@ -268,108 +445,113 @@ class TarneebGame:
                 elif i == 1: c.set_pos(SCREEN_WIDTH + 50, SCREEN_HEIGHT//2)
                 elif i == 2: c.set_pos(SCREEN_WIDTH//2, -100)
                 elif i == 3: c.set_pos(-50, SCREEN_HEIGHT//2)
+        self.dealt = tuple(p.mask for p in self.players)
+        self.round_bids = []   # (seat, bid) per bidding decision, 0 = pass
+        self.round_plays = []  # card codes in play order
         
+        # Game State Reset; bidding opens once the cards land
+        self.state = STATE_ANIMATING
         self.animate_deal()
-        
-        # Game State Reset
-        self.state = STATE_BIDDING
         self.current_bidder_idx = (self.dealer_idx + 1) % 4
         self.highest_bid = 6
         self.bid_winner = -1
         self.trump_suit = None
         self.current_trick = []
+        self.knowledge = []
         self.trick_starter = -1
         self.turn_idx = -1
         self.message = "Bidding Phase"
-        self.waiting_for_animation = False
+
+        # Drop anything pending from the previous deal (a late result is ignored)
+        self.bot_job = None
+        self.bot_job_seat = -1
+        self.timer_action = None
         
         self.players[self.current_bidder_idx].status = "THINKING"
 
-    def animate_deal(self):
+    def hand_layout(self):
+        # (codes, resting positions) of every card in the hands
         # Spacing increased to 55 for player
         hand_spacing = 55
+        codes, targets = [], []
         for i, p in enumerate(self.players):
-            if i == 0: 
-                start_x = (SCREEN_WIDTH - (13 * hand_spacing)) // 2
-                for j, c in enumerate(p.hand):
-                    c.move_to(start_x + j * hand_spacing, SCREEN_HEIGHT - 120)
-            elif i == 1:
-                for j, c in enumerate(p.hand):
-                    c.move_to(SCREEN_WIDTH - 80, 100 + j * 15)
-            elif i == 2:
-                for j, c in enumerate(p.hand):
-                    c.move_to(300 + j * 20, 20)
-            elif i == 3:
-                for j, c in enumerate(p.hand):
-                    c.move_to(20, 100 + j * 15)
-
-    def get_valid_moves(self, hand, lead_suit):
-        if not lead_suit: return hand
-        follows = [c for c in hand if c.suit == lead_suit]
-        return follows if follows else hand
+            for j, c in enumerate(p.hand):
+                codes.append(c.code)
+                if i == 0: 
+                    start_x = (SCREEN_WIDTH - (len(p.hand) * hand_spacing)) // 2
+                    targets.append((start_x + j * hand_spacing, SCREEN_HEIGHT - 120))
+                elif i == 1:
+                    targets.append((SCREEN_WIDTH - 80, 100 + j * 15))
+                elif i == 2:
+                    targets.append((300 + j * 20, 20))
+                elif i == 3:
+                    targets.append((20, 100 + j * 15))
+        return codes, targets
+
+    def animate_deal(self):
+        codes, targets = self.hand_layout()
+        motion = card_motion()
+        motion.cancel()
+        motion.move(codes, targets, DEAL_TIME, on_done=self.deal_landed)
+
+    def deal_landed(self):
+        self.state = STATE_BIDDING
+
+    def get_valid_moves(self, player, lead_suit):
+        if not lead_suit: return player.hand[:]
+        valid = bb.valid_mask(player.mask, SUITS.index(lead_suit))
+        if valid == player.mask: return player.hand[:]
+        return [c for c in player.hand if valid >> c.code & 1]
 
     def bot_make_bid(self, player):
-        score = 0
-        for suit in SUITS:
-            count = sum(1 for c in player.hand if c.suit == suit)
-            highs = sum(1 for c in player.hand if c.suit == suit and c.rank >= 11)
-            score = max(score, count + highs)
-        
-        target = 0
-        if score >= 9: target = 9
-        elif score >= 8: target = 8
-        elif score >= 6: target = 7
-        
-        if target > self.highest_bid: return target
-        return 0
+        if self.bot_policy is not None:
+            return self.bot_policy.bid(self.to_engine(), player.id)
+        return bot_bid(player.mask, self.highest_bid)
     
+    def bot_pick_trump(self, player):
+        if self.bot_policy is not None:
+            return SUITS[self.bot_policy.choose_trump(self.to_engine(), player.id)]
+        return SUITS[bot_trump(player.mask)]
+
+    def redeal(self):
+        # Move the deal to the next player and reset
+        self.dealer_idx = (self.dealer_idx + 1) % 4
+        self.redeals += 1
+        self.reset_round()
+
     def process_bidding(self):
+        if self.timer_action: return  # Re-shuffle pause in progress
+
         if all(p.status == "PASS" for p in self.players):
             self.message = "Everyone Passed! Re-shuffling..."
-            self.draw_scene()       # Force a frame render so we see the message
-            pygame.display.flip()
-            pygame.time.delay(2000) # Wait 2 seconds so players realize what happened
-            
-            # Move the deal to the next player and reset
-            self.dealer_idx = (self.dealer_idx + 1) % 4
-            self.reset_round()
+            # Leave the message up for 2 seconds so players realize what happened
+            self.start_timer(RESHUFFLE_PAUSE, self.redeal)
             return
         # ------------------------------------------
 
         curr_p = self.players[self.current_bidder_idx]
         
-        # Count active bidders (players who haven't passed)
-        active = [p for p in self.players if p.status != "PASS"]
-        
-        curr_p = self.players[self.current_bidder_idx]
-        
         # Count active bidders
         active = [p for p in self.players if p.status != "PASS"]
         
         # Logic: If only one person left and bid is > 6, they win
         if len(active) == 1 and self.highest_bid > 6:
-            self.bid_winner = active[0].id
-            self.message = f"{active[0].name} wins bid with {self.highest_bid}!"
-            
-            # Clear statuses for play phase
-            for p in self.players: p.status = "" 
-            
-            if active[0].is_bot:
-                suit_counts = {s: sum(1 for c in active[0].hand if c.suit == s) for s in SUITS}
-                self.trump_suit = max(suit_counts, key=suit_counts.get)
-                self.start_play_phase(self.bid_winner)
-            else:
-                self.state = STATE_CHOOSE_TRUMP
+            winner = active[0]
+            self.bid_winner = winner.id
+            self.message = f"{winner.name} wins bid with {self.highest_bid}!"
+            self.state = STATE_CHOOSE_TRUMP  # a bot picks in process_trump, the human on screen
             return
 
         # If Bot Turn
         if curr_p.is_bot and curr_p.status != "PASS":
-            curr_p.status = "THINKING..."
-            self.draw_scene() # Force redraw to show thinking
-            pygame.display.flip()
-            pygame.time.wait(500) 
-            
-            bid = self.bot_make_bid(curr_p)
+            if self.bot_job is None:
+                curr_p.status = "THINKING..."
+                self.submit_bot_job(curr_p.id, self.bot_make_bid, curr_p, min_ms=BOT_BID_DELAY)
+                return
+            done, bid = self.poll_bot_job()
+            if not done: return
+
+            self.round_bids.append((curr_p.id, bid if bid > self.highest_bid else 0))
             if bid > self.highest_bid:
                 self.highest_bid = bid
                 self.bid_winner = curr_p.id
@@ -389,79 +571,223 @@ class TarneebGame:
             # It is human turn, set status to highlight
             if curr_p.status == "WAITING": curr_p.status = "YOUR TURN"
 
+    def process_trump(self):
+        # The bot that won the bid picks trump
+        winner = self.players[self.bid_winner]
+        if self.bot_job is None:
+            self.submit_bot_job(winner.id, self.bot_pick_trump, winner)
+            return
+        done, trump = self.poll_bot_job()
+        if not done: return
+        self.trump_suit = trump
+        self.start_play_phase(winner.id)
+
+    # --- Human decisions (seat 0) ---
+    def human_bid(self, bid):
+        # 0 passes
+        self.round_bids.append((0, bid))
+        if bid:
+            self.highest_bid = bid
+            self.bid_winner = 0
+            self.players[0].bid_val = bid
+            self.players[0].status = f"BID: {bid}"
+            self.message = f"You bid {bid}"
+        else:
+            self.players[0].status = "PASS"
+        self.current_bidder_idx = 1
+
+    def human_trump(self, suit):
+        self.trump_suit = suit
+        self.start_play_phase(0)
+
+    def human_play(self, card):
+        self.execute_play_card(0, card)
+        self.turn_idx = 1
+
     def start_play_phase(self, winner_id):
+        # Clear statuses for play phase
+        for p in self.players: p.status = ""
         self.state = STATE_PLAYING
         self.trick_starter = winner_id
         self.turn_idx = winner_id
         self.current_trick = []
+        # Each seat's view of the play, updated as cards are played
+        trump = SUITS.index(self.trump_suit)
+        self.knowledge = [HandKnowledge(p.id, p.mask, trump) for p in self.players]
 
-    def execute_play_card(self, p_idx, card):
-        self.players[p_idx].hand.remove(card)
+    def trick_spot(self, p_idx):
+        # Where p_idx's card lies in the trick
         cx, cy = SCREEN_WIDTH // 2 - CARD_WIDTH // 2, SCREEN_HEIGHT // 2 - CARD_HEIGHT // 2
         offsets = {0: (0, 40), 1: (50, 0), 2: (0, -40), 3: (-50, 0)}
-        tx, ty = cx + offsets[p_idx][0], cy + offsets[p_idx][1]
-        card.move_to(tx, ty)
+        return cx + offsets[p_idx][0], cy + offsets[p_idx][1]
+
+    def execute_play_card(self, p_idx, card):
+        self.players[p_idx].remove_card(card)
+        tx, ty = self.trick_spot(p_idx)
         self.current_trick.append((p_idx, card))
+        self.round_plays.append(card.code)
+        for k in self.knowledge: k.observe(p_idx, card.code)
         self.state = STATE_ANIMATING
+        card.move_to(tx, ty, on_done=self.card_landed)
 
-    def evaluate_trick(self):
-        winner_idx = self.current_trick[0][0]
-        lead_suit = self.current_trick[0][1].suit
-        best_card = self.current_trick[0][1]
-
-        for p_idx, card in self.current_trick[1:]:
-            if card.suit == self.trump_suit:
-                if best_card.suit != self.trump_suit:
-                    best_card = card
-                    winner_idx = p_idx
-                elif card.rank > best_card.rank:
-                    best_card = card
-                    winner_idx = p_idx
-            elif card.suit == lead_suit:
-                if best_card.suit == lead_suit and card.rank > best_card.rank:
-                    best_card = card
-                    winner_idx = p_idx
+    def card_landed(self):
+        if len(self.current_trick) == 4:
+            # Leave the full trick on the table for a moment
+            self.start_timer(TRICK_PAUSE, self.collect_trick)
+        else:
+            self.state = STATE_PLAYING
+
+    def collect_trick(self):
+        # Sweep the trick towards the winner, then score it
+        winner_idx, _ = self.get_trick_winner(self.current_trick)
+        wx, wy = self.ui_positions[winner_idx]
+        codes = [c.code for _, c in self.current_trick]
+        targets = [(wx - CARD_WIDTH // 2, wy - CARD_HEIGHT // 2)] * 4
+        card_motion().move(codes, targets, COLLECT_TIME, ease='in_out_cubic', on_done=self.finish_trick)
 
+    def evaluate_trick(self):
+        winner_idx, _ = self.get_trick_winner(self.current_trick)
         self.players[winner_idx].tricks_won += 1
         self.trick_starter = winner_idx
         self.turn_idx = winner_idx
         self.current_trick = []
         
         if len(self.players[0].hand) == 0:
+            a0, b0 = self.team_a_score, self.team_b_score
             self.calculate_scores()
+            self.log_round(self.team_a_score - a0, self.team_b_score - b0)
             self.state = STATE_ROUND_END
 
+    def log_round(self, da, db):
+        if self.log is None: return
+        self.log.write(RoundRecord(self.deal_seed, self.dealer_idx, self.redeals, self.dealt,
+                                   self.bid_winner, self.highest_bid, SUITS.index(self.trump_suit),
+                                   [p.tricks_won for p in self.players], (da, db),
+                                   (self.team_a_score, self.team_b_score), self.round_bids, self.round_plays))
+        self.log.flush()
+
+    def finish_trick(self):
+        self.evaluate_trick()
+        if self.state != STATE_ROUND_END: self.state = STATE_PLAYING
+
     def calculate_scores(self):
-        team_a_tricks = self.players[0].tricks_won + self.players[2].tricks_won
-        team_b_tricks = self.players[1].tricks_won + self.players[3].tricks_won
-        bidder_team = 'A' if self.bid_winner in [0, 2] else 'B'
-        
-        if bidder_team == 'A':
-            if team_a_tricks >= self.highest_bid:
-                self.team_a_score += team_a_tricks
-                self.message = f"Team A Won! (+{team_a_tricks})"
-            else:
-                self.team_a_score -= self.highest_bid
-                self.team_b_score += team_b_tricks
-                self.message = f"Team A Failed! (-{self.highest_bid})"
+        t = [p.tricks_won for p in self.players]
+        da, db, self.message = score_round(t[0] + t[2], t[1] + t[3], self.bid_winner, self.highest_bid)
+        self.team_a_score += da
+        self.team_b_score += db
+
+    # --- Snapshots (snapshot.py) ---
+    def to_engine(self):
+        # The position as a headless engine. A card in flight counts as
+        # played, and a full trick still on the table as already scored, as
+        # the engine would have it
+        trick = [(s, c.code) for s, c in self.current_trick]
+        hands = [p.mask for p in self.players]
+        for s, c in trick: hands[s] |= 1 << c
+        e = TarneebEngine(resume_seed(self.deal_seed), hands=self.dealt)
+        e.deal_seed, e.dealer_idx, e.redeals = self.deal_seed, self.dealer_idx, self.redeals
+        e.team_a_score, e.team_b_score = self.team_a_score, self.team_b_score
+        e.hands = hands
+        e.tricks_won = [p.tricks_won for p in self.players]
+        e.bids = [p.bid_val for p in self.players]
+        e.passed = [p.status == "PASS" for p in self.players]
+        e.bid_log = list(self.round_bids)
+        e.plays = self.round_plays[:len(self.round_plays) - len(trick)]
+        e.played = bb.hand_mask(e.plays)
+        e.current_bidder_idx = self.current_bidder_idx
+        e.highest_bid, e.bid_winner = self.highest_bid, self.bid_winner
+        e.trick_starter, e.turn_idx = self.trick_starter, self.turn_idx
+        if self.knowledge: e.voids = list(self.knowledge[0].voids)
+        if self.state == STATE_CHOOSE_TRUMP:
+            e.state = STATE_CHOOSE_TRUMP
+        elif self.trump_suit is None:
+            e.state = STATE_BIDDING  # the deal may still be landing
         else:
-            if team_b_tricks >= self.highest_bid:
-                self.team_b_score += team_b_tricks
-                self.message = f"Team B Won! (+{team_b_tricks})"
+            e.trump_suit = SUITS.index(self.trump_suit)
+            if self.state == STATE_ROUND_END:
+                t = e.tricks_won
+                e.last_delta = score_round(t[0] + t[2], t[1] + t[3], e.bid_winner, e.highest_bid)[:2]
+                e.state = STATE_ROUND_END
             else:
-                self.team_b_score -= self.highest_bid
-                self.team_a_score += team_a_tricks
-                self.message = f"Team B Failed! (-{self.highest_bid})"
+                e.start_play_phase(self.trick_starter)
+                for s, c in trick: e.execute_play_card(s, c)
+        return e
+
+    def restore(self, engine):
+        # Picks the game up at an engine position. Only state is set here;
+        # the cards are laid out when the next frame is drawn
+        e = engine
+        card_motion().cancel()
+        self.rng = random.Random(resume_seed(e.deal_seed))
+        self.deal_seed, self.dealer_idx, self.redeals = e.deal_seed, e.dealer_idx, e.redeals
+        self.team_a_score, self.team_b_score = e.team_a_score, e.team_b_score
+        for p in self.players:
+            cards = [CARDS[c] for c in bb.cards_of(e.hands[p.id])]
+            for c in cards: c.selected = False
+            p.set_hand(cards)
+            p.tricks_won = e.tricks_won[p.id]
+            p.bid_val = e.bids[p.id]
+            p.status = ""
+        self.dealt = tuple(e.dealt)
+        self.round_bids = list(e.bid_log)
+        self.round_plays = list(e.plays)
+        self.current_bidder_idx = e.current_bidder_idx
+        self.highest_bid, self.bid_winner = e.highest_bid, e.bid_winner
+        self.trump_suit = None if e.trump_suit is None else SUITS[e.trump_suit]
+        self.current_trick = [(s, CARDS[c]) for s, c in e.current_trick]
+        self.trick_starter, self.turn_idx = e.trick_starter, e.turn_idx
+        self.knowledge = [HandKnowledge.from_engine(e, s) for s in range(4)] if self.trump_suit else []
+        self.bot_job = None
+        self.bot_job_seat = -1
+        self.timer_action = None
+
+        self.state = e.state
+        if e.state in (STATE_BIDDING, STATE_CHOOSE_TRUMP):
+            for p in self.players:
+                p.status = "PASS" if e.passed[p.id] else f"BID: {p.bid_val}" if p.bid_val else "WAITING"
+        if e.state == STATE_BIDDING:
+            self.message = "Bidding Phase"
+        elif e.state == STATE_ROUND_END:
+            self.message = e.message
+        else:
+            self.message = f"{self.players[e.bid_winner].name} wins bid with {e.highest_bid}!"
+        self.layout_pending = True
+        self.renderer.invalidate()
+
+    def lay_out_cards(self):
+        # Puts every card at rest where it belongs, without animating
+        self.layout_pending = False
+        codes, targets = self.hand_layout()
+        for s, c in self.current_trick:
+            codes.append(c.code)
+            targets.append(self.trick_spot(s))
+        for code, (x, y) in zip(codes, targets):
+            CARDS[code].set_pos(x, y)
+
+    def build_background(self):
+        bg = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT)).convert()
+        bg.fill(BG_COLOR)
+        return bg
+
+    def add_panel(self, key, color, rect, radius=0):
+        # Panels sit above the hands, so they are items rather than background
+        def build():
+            r = pygame.Rect(rect)
+            return r, lambda s: pygame.draw.rect(s, color, r, border_radius=radius)
+        self.renderer.add(key, None, build)
+
+    def add_text(self, key, text, font, color, pos):
+        def build():
+            surf = self.text.render(text, font, color)
+            return surf.get_rect(topleft=pos), lambda s: s.blit(surf, pos)
+        self.renderer.add(key, (text, color, pos), build)
 
     def draw_ui(self):
         # Sidebar
-        pygame.draw.rect(self.screen, SCORE_BG, (0, 0, 200, 150))
-        title = self.font_bold.render("SCOREBOARD", True, GOLD)
-        t_a = self.font.render(f"You+Mate: {self.team_a_score}", True, WHITE)
-        t_b = self.font.render(f"Bots:        {self.team_b_score}", True, WHITE)
-        self.screen.blit(title, (10, 10))
-        self.screen.blit(t_a, (10, 40))
-        self.screen.blit(t_b, (10, 65))
+        self.add_panel('sidebar', SCORE_BG, (0, 0, 200, 150))
+        self.add_text('title', "SCOREBOARD", self.font_bold, GOLD, (10, 10))
+        self.add_text('score_a', f"You+Mate: {self.team_a_score}", self.font, WHITE, (10, 40))
+        self.add_text('score_b', f"Bots:        {self.team_b_score}", self.font, WHITE, (10, 65))
 
         # --- Player Status & Trick Counters ---
         for i, p in enumerate(self.players):
@@ -470,174 +796,414 @@ class TarneebGame:
             # Status (Bidding)
             if self.state == STATE_BIDDING and p.status:
                 s_col = GOLD if "BID" in p.status else (GRAY if "PASS" in p.status else WHITE)
-                s_txt = self.font_bold.render(p.status, True, s_col)
                 # Position text nicely based on player location
                 sx = px - 50 if i == 1 else (px + 20 if i == 3 else px - 30)
                 sy = py - 30 if i == 0 else (py + 20 if i == 2 else py)
-                self.screen.blit(s_txt, (sx, sy))
+                self.add_text(('status', i), p.status, self.font_bold, s_col, (sx, sy))
 
             # Trick Counter (Always visible)
             t_col = (100, 255, 100) if p.tricks_won > 0 else (150, 150, 150)
-            t_txt = self.font.render(f"Tricks: {p.tricks_won}", True, t_col)
-            
             tx = px - 30 if i in [0, 2] else px
             ty = py + 20 if i in [0, 2] else py + 30
-            self.screen.blit(t_txt, (tx, ty))
+            self.add_text(('tricks', i), f"Tricks: {p.tricks_won}", self.font, t_col, (tx, ty))
 
+            # Thinking indicator while this bot's decision is in flight
+            if self.bot_job is not None and self.bot_job_seat == i and self.state != STATE_BIDDING:
+                dots = "." * (1 + ticks() // 300 % 3)
+                self.add_text(('thinking', i), "Thinking" + dots, self.font, GOLD, (tx, ty + 20))
 
         # Center Message
-        info_rect = pygame.draw.rect(self.screen, (0,0,0), (SCREEN_WIDTH//2 - 200, 10, 400, 40), border_radius=10)
-        status = self.font.render(self.message, True, GOLD)
-        self.screen.blit(status, (SCREEN_WIDTH//2 - status.get_width()//2, 20))
+        self.add_panel('message_box', (0,0,0), (SCREEN_WIDTH//2 - 200, 10, 400, 40), radius=10)
+        w = self.text.render(self.message, self.font, GOLD).get_width()
+        self.add_text('message', self.message, self.font, GOLD, (SCREEN_WIDTH//2 - w//2, 20))
         
         # Current Trump Display
         if self.trump_suit:
-            ts_rect = pygame.Rect(SCREEN_WIDTH - 60, 10, 50, 50)
-            pygame.draw.rect(self.screen, WHITE, ts_rect, border_radius=5)
-            col = SUIT_COLORS[self.trump_suit]
-            txt = self.font_big.render(self.trump_suit, True, col)
-            self.screen.blit(txt, (ts_rect.x + 10, ts_rect.y + 5))
+            def build(suit=self.trump_suit):
+                ts_rect = pygame.Rect(SCREEN_WIDTH - 60, 10, 50, 50)
+                txt = self.text.render(suit, self.font_big, SUIT_COLORS[suit])
+                def draw(s):
+                    pygame.draw.rect(s, WHITE, ts_rect, border_radius=5)
+                    s.blit(txt, (ts_rect.x + 10, ts_rect.y + 5))
+                return ts_rect, draw
+            self.renderer.add('trump', self.trump_suit, build)
+
+    def dim_layer(self, alpha):
+        # Full-screen translucent layers are built once per alpha
+        layer = self.dim_layers.get(alpha)
+        if layer is None:
+            layer = self.dim_layers[alpha] = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT), pygame.SRCALPHA)
+            layer.fill((0, 0, 0, alpha))
+        return layer
+
+    def draw_overlays(self):
+        if self.state == STATE_CHOOSE_TRUMP and not self.players[self.bid_winner].is_bot:
+            def build():
+                overlay = self.dim_layer(150)
+                txt = self.text.render("PICK TRUMP", self.font_bold, WHITE)
+                boxes = [(pygame.Rect(350 + i*80, 350, 60, 60), self.text.render(suit, self.font_big, SUIT_COLORS[suit]))
+                         for i, suit in enumerate(SUITS)]
+                def draw(s):
+                    s.blit(overlay, (0,0))
+                    s.blit(txt, (SCREEN_WIDTH//2 - 50, 300))
+                    for r, t in boxes:
+                        pygame.draw.rect(s, WHITE, r, border_radius=8)
+                        s.blit(t, (r.x + 18, r.y + 10))
+                return self.screen.get_rect(), draw
+            self.renderer.add('overlay', 'pick', build)
+
+        if self.state == STATE_ROUND_END:
+            def build():
+                overlay = self.dim_layer(200)
+                msg = self.text.render(self.message, self.font_big, GOLD)
+                cont = self.text.render("Click to Continue", self.font, WHITE)
+                def draw(s):
+                    s.blit(overlay, (0,0))
+                    s.blit(msg, (SCREEN_WIDTH//2 - msg.get_width()//2, SCREEN_HEIGHT//2 - 50))
+                    s.blit(cont, (SCREEN_WIDTH//2 - cont.get_width()//2, SCREEN_HEIGHT//2 + 20))
+                return self.screen.get_rect(), draw
+            self.renderer.add('overlay', ('end', self.message), build)
 
     def draw_scene(self):
-        self.screen.fill(BG_COLOR)
+        # Describes the frame to the renderer, which repaints only what
+        # changed since the last frame; returns the dirty rects
+        self.renderer.begin()
+        if self.layout_pending: self.lay_out_cards()
         
         # Hands
         hand_spacing = 55 # Matches animate_deal
         hand_start_x = (SCREEN_WIDTH - (len(self.players[0].hand) * hand_spacing)) // 2
+        mx, my = pygame.mouse.get_pos()
         
         for i, card in enumerate(self.players[0].hand):
-            mx, my = pygame.mouse.get_pos()
             y_off = -20 if (card.rect.collidepoint(mx, my) and self.state == STATE_PLAYING and self.turn_idx==0) else 0
             if not card.is_moving:
                 card.set_pos(hand_start_x + i * hand_spacing, SCREEN_HEIGHT - 120 + y_off)
-            card.draw(self.screen)
+            self.add_card(card)
 
         for i in [1, 2, 3]:
             for c in self.players[i].hand:
-                c.draw(self.screen, hidden=True)
+                self.add_card(c, hidden=True)
 
         for _, card in self.current_trick:
-            card.draw(self.screen)
+            self.add_card(card)
             
         self.draw_ui()
+        self.draw_overlays()
+        if self.prof.overlay: self.draw_profiler()
+        return self.renderer.end()
+
+    def draw_profiler(self):
+        # Frame-time overlay under the scoreboard. The numbers change every
+        # refresh, so they are rendered directly rather than through the
+        # text cache
+        def build():
+            lines = [self.font_mono.render(line, True, WHITE) for line in self.prof.summary()]
+            h = self.font_mono.get_linesize()
+            r = pygame.Rect(0, 155, max(l.get_width() for l in lines) + 20, len(lines) * h + 10)
+            def draw(s):
+                pygame.draw.rect(s, BLACK, r)
+                for i, l in enumerate(lines):
+                    s.blit(l, (10, r.y + 5 + i * h))
+            return r, draw
+        self.renderer.add('profiler', self.prof.count // PROFILER_REFRESH, build)
+
+    def add_card(self, card, hidden=False):
+        x, y = int(card.x), int(card.y)
+        def build():
+            return pygame.Rect(x, y, CARD_WIDTH, CARD_HEIGHT), lambda s: card.draw(s, hidden)
+        self.renderer.add(card.code, (x, y, hidden, card.selected), build)
 
     def run(self):
         running = True
+        dt = 0
         while running:
+            self.prof.frame()
+
             # Events
-            for event in pygame.event.get():
-                if event.type == pygame.QUIT: running = False
+            with self.prof.span('events'):
+                for event in pygame.event.get():
+                    if event.type == pygame.QUIT: running = False
+                    if event.type in (pygame.VIDEOEXPOSE, pygame.WINDOWEXPOSED): self.renderer.invalidate()
+                    if event.type == pygame.KEYDOWN and event.key == PROFILER_KEY: self.prof.toggle_overlay()
                 
-                # Bidding
-                if self.state == STATE_BIDDING and self.current_bidder_idx == 0:
-                    if event.type == pygame.KEYDOWN:
-                        new_bid = 0
-                        if event.key == pygame.K_p:
-                            self.players[0].status = "PASS"
-                            self.current_bidder_idx = 1
-                        elif event.key == pygame.K_UP: new_bid = self.highest_bid + 1
-                        elif pygame.K_7 <= event.key <= pygame.K_9: new_bid = int(pygame.key.name(event.key))
-
-                        if new_bid > 0:
-                            if new_bid > 13: new_bid = 13
-                            if new_bid > self.highest_bid:
-                                self.highest_bid = new_bid
-                                self.bid_winner = 0
-                                self.players[0].bid_val = new_bid
-                                self.players[0].status = f"BID: {new_bid}"
-                                self.message = f"You bid {new_bid}"
-                                self.current_bidder_idx = 1
-
-                # Trump Pick
-                if self.state == STATE_CHOOSE_TRUMP:
-                    if event.type == pygame.MOUSEBUTTONDOWN:
-                         mx, my = pygame.mouse.get_pos()
-                         for i, suit in enumerate(SUITS):
-                             r = pygame.Rect(350 + i*80, 350, 60, 60)
-                             if r.collidepoint(mx, my):
-                                 self.trump_suit = suit
-                                 self.start_play_phase(0)
-
-                # Play
-                if self.state == STATE_PLAYING and self.turn_idx == 0:
-                    if event.type == pygame.MOUSEBUTTONDOWN:
-                        mx, my = pygame.mouse.get_pos()
-                        lead = self.current_trick[0][1].suit if self.current_trick else None
-                        valid = self.get_valid_moves(self.players[0].hand, lead)
-                        for card in reversed(self.players[0].hand): # Check top card first
-                            if card.rect.collidepoint(mx, my) and card in valid:
-                                self.execute_play_card(0, card)
-                                self.turn_idx = 1
-                                break
+                    # Bidding
+                    if self.state == STATE_BIDDING and self.current_bidder_idx == 0 and not self.timer_action:
+                        if event.type == pygame.KEYDOWN:
+                            new_bid = 0
+                            if event.key == pygame.K_p:
+                                self.human_bid(0)
+                            elif event.key == pygame.K_UP: new_bid = self.highest_bid + 1
+                            elif pygame.K_7 <= event.key <= pygame.K_9: new_bid = int(pygame.key.name(event.key))
+
+                            if new_bid > 0:
+                                if new_bid > 13: new_bid = 13
+                                if new_bid > self.highest_bid:
+                                    self.human_bid(new_bid)
+
+                    # Trump Pick
+                    if self.state == STATE_CHOOSE_TRUMP and self.bid_winner == 0:
+                        if event.type == pygame.MOUSEBUTTONDOWN:
+                             mx, my = pygame.mouse.get_pos()
+                             for i, suit in enumerate(SUITS):
+                                 r = pygame.Rect(350 + i*80, 350, 60, 60)
+                                 if r.collidepoint(mx, my):
+                                     self.human_trump(suit)
+
+                    # Play
+                    if self.state == STATE_PLAYING and self.turn_idx == 0:
+                        if event.type == pygame.MOUSEBUTTONDOWN:
+                            mx, my = pygame.mouse.get_pos()
+                            lead = self.current_trick[0][1].suit if self.current_trick else None
+                            valid = self.get_valid_moves(self.players[0], lead)
+                            for card in reversed(self.players[0].hand): # Check top card first
+                                if card.rect.collidepoint(mx, my) and card in valid:
+                                    self.human_play(card)
+                                    break
                 
-                # Round End
-                if self.state == STATE_ROUND_END:
-                    if event.type == pygame.MOUSEBUTTONDOWN or event.type == pygame.KEYDOWN:
-                        self.dealer_idx = (self.dealer_idx + 1) % 4
-                        self.reset_round()
-
-            # Logic
-            any_moving = False
-            for p in self.players:
-                for c in p.hand:
-                    if c.update(): any_moving = True
-            for _, c in self.current_trick:
-                if c.update(): any_moving = True
-            
-            if self.state == STATE_BIDDING and not any_moving:
-                self.process_bidding()
-
-            if self.state == STATE_ANIMATING and not any_moving:
-                if len(self.current_trick) == 4:
-                    pygame.time.delay(1000)
-                    self.evaluate_trick()
-                    if self.state != STATE_ROUND_END: self.state = STATE_PLAYING
-                else:
-                    self.state = STATE_PLAYING
-
-            if self.state == STATE_PLAYING and not any_moving:
-                if self.players[self.turn_idx].is_bot:
-                    if not self.waiting_for_animation:
-                        self.start_wait = pygame.time.get_ticks()
-                        self.waiting_for_animation = True
-                    if pygame.time.get_ticks() - self.start_wait > 800:
-                        card = self.bot_play_card(self.players[self.turn_idx])
-                        self.execute_play_card(self.turn_idx, card)
-                        self.turn_idx = (self.turn_idx + 1) % 4
-                        self.waiting_for_animation = False
-
-            # Draw
-            self.draw_scene()
-
-            # Overlays
-            if self.state == STATE_CHOOSE_TRUMP:
-                overlay = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT), pygame.SRCALPHA)
-                overlay.fill((0, 0, 0, 150))
-                self.screen.blit(overlay, (0,0))
-                txt = self.font_bold.render("PICK TRUMP", True, WHITE)
-                self.screen.blit(txt, (SCREEN_WIDTH//2 - 50, 300))
-                for i, suit in enumerate(SUITS):
-                    r = pygame.Rect(350 + i*80, 350, 60, 60)
-                    pygame.draw.rect(self.screen, WHITE, r, border_radius=8)
-                    col = SUIT_COLORS[suit]
-                    t = self.font_big.render(suit, True, col)
-                    self.screen.blit(t, (r.x + 18, r.y + 10))
+                    # Round End
+                    if self.state == STATE_ROUND_END:
+                        if event.type == pygame.MOUSEBUTTONDOWN or event.type == pygame.KEYDOWN:
+                            self.dealer_idx = (self.dealer_idx + 1) % 4
+                            self.redeals = 0
+                            self.reset_round()
 
-            if self.state == STATE_ROUND_END:
-                overlay = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT), pygame.SRCALPHA)
-                overlay.fill((0, 0, 0, 200))
-                self.screen.blit(overlay, (0,0))
-                msg = self.font_big.render(self.message, True, GOLD)
-                cont = self.font.render("Click to Continue", True, WHITE)
-                self.screen.blit(msg, (SCREEN_WIDTH//2 - msg.get_width()//2, SCREEN_HEIGHT//2 - 50))
-                self.screen.blit(cont, (SCREEN_WIDTH//2 - cont.get_width()//2, SCREEN_HEIGHT//2 + 20))
+            # Logic; landing cards advance the state through callbacks
+            with self.prof.span('animate'):
+                moving = card_motion().step(dt * self.speed)
+            with self.prof.span('timers'):
+                self.update_timers()
+
+            if self.state == STATE_BIDDING:
+                with self.prof.span('bidding'):
+                    self.process_bidding()
+
+            if self.state == STATE_CHOOSE_TRUMP and self.players[self.bid_winner].is_bot:
+                with self.prof.span('bidding'):
+                    self.process_trump()
+
+            if self.state == STATE_PLAYING:
+                with self.prof.span('play'):
+                    if self.players[self.turn_idx].is_bot:
+                        if self.bot_job is None:
+                            p = self.players[self.turn_idx]
+                            self.submit_bot_job(p.id, self.bot_play_card, p, min_ms=BOT_PLAY_DELAY)
+                        else:
+                            done, card = self.poll_bot_job()
+                            if done:
+                                self.execute_play_card(self.turn_idx, card)
+                                self.turn_idx = (self.turn_idx + 1) % 4
+
+            # Draw (only the regions that changed)
+            with self.prof.span('draw'):
+                dirty = self.draw_scene()
+            if dirty:
+                with self.prof.span('present'):
+                    pygame.display.update(dirty)
+            if not self.startup.done:
+                self.startup.finish()
+                if self.startup_log is not None: running = False
 
-            pygame.display.flip()
-            self.clock.tick(FPS)
+            # Nothing to animate or wait on: poll input at a lower rate
+            idle = not dirty and not moving and self.bot_job is None and not self.timer_action
+            with self.prof.span(WAIT):
+                dt = self.clock.tick(IDLE_FPS if idle else FPS)
 
+        if self.startup_log is not None:
+            print(self.startup.report())
+            if self.startup_log != '-': self.startup.save(self.startup_log)
+        if self.save_path is not None:
+            save_file(self.save_path, self.to_engine())
+            print(f"Game saved to {self.save_path}")
+        if self.trace_path is not None:
+            n = self.prof.save_trace(self.trace_path)
+            print(f"{n} trace events written to {self.trace_path}")
+        self.bot_pool.shutdown(wait=False, cancel_futures=True)
+        if self.log is not None: self.log.close()
         pygame.quit()
         sys.exit()
 
+class ReplayGame(TarneebGame):
+    # Plays logged rounds back in the window; every seat follows the log
+    def __init__(self, records, start_trick=0, speed=1.0):
+        self.records = iter(records)
+        self.start_trick = start_trick
+        super().__init__()
+        self.speed = speed
+        for p in self.players: p.is_bot = True
+        pygame.display.set_caption("Tarneeb Replay")
+
+    def reset_round(self):
+        self.record = next(self.records, None)
+        if self.record is None:
+            pygame.event.post(pygame.event.Event(pygame.QUIT))
+            return
+        self.bids = iter(self.record.bids)
+        self.play_idx = 0
+        super().reset_round()
+
+    def deal_hands(self):
+        self.dealer_idx = self.record.dealer
+        return self.record.hands
+
+    def deal_landed(self):
+        if self.start_trick:
+            self.fast_forward(self.start_trick)
+            self.start_trick = 0
+        else:
+            super().deal_landed()
+
+    def fast_forward(self, trick):
+        # Jumps straight to the start of `trick` using the replay snapshots
+        engine = Replay(self.record).at_trick(trick)
+        for p in self.players:
+            p.set_hand([c for c in p.hand if engine.hands[p.id] >> c.code & 1])
+            p.tricks_won = engine.tricks_won[p.id]
+            p.status = ""
+        self.highest_bid = engine.highest_bid
+        self.bid_winner = engine.bid_winner
+        self.trump_suit = SUITS[engine.trump_suit]
+        self.play_idx = len(engine.plays)
+        self.message = f"Replay from trick {trick + 1}"
+        self.start_play_phase(engine.turn_idx)
+        self.knowledge = [HandKnowledge.from_engine(engine, s) for s in range(4)]
+
+    def bot_make_bid(self, player):
+        return next(self.bids)[1]
+
+    def bot_pick_trump(self, player):
+        return SUITS[self.record.trump]
+
+    def bot_play_card(self, player):
+        code = self.record.plays[self.play_idx]
+        self.play_idx += 1
+        return next(c for c in player.hand if c.code == code)
+
+class NetGame(TarneebGame):
+    # Thin client for a table on the game server (server.py). The server runs
+    # the rules; this window shows our seat at the bottom, sends the human's
+    # decisions and takes every other seat's from the server's messages, in
+    # order. The other hands are unknown, so they are dealt stand-in cards
+    # that are swapped for the real ones as they are played.
+    def __init__(self, client):
+        self.client = client
+        self.seat = client.seat
+        self.dealt_in = False  # a round under way when we joined is not ours
+        self.deal = None
+        print(f"Seat {self.seat}; waiting for the next deal...")
+        super().__init__()
+        scores = client.state['scores']
+        self.team_a_score, self.team_b_score = scores[self.seat % 2], scores[1 - self.seat % 2]
+        pygame.display.set_caption(f"Tarneeb - seat {self.seat}")
+
+    def local(self, seat):
+        # Server seat -> seat on screen (0 = us)
+        return (seat - self.seat) % 4
+
+    def next_message(self, kind, block=True):
+        # Next decision or deal from the server; our own decisions come back
+        # too and are skipped, as are turn prompts, round summaries and
+        # anything before our first deal. None if block is false and the
+        # message has not arrived yet
+        while True:
+            msg = self.client.next_event(block)
+            if msg is None: return None
+            t = msg['t']
+            if t == 'deal': self.dealt_in = True
+            if t in ('turn', 'round', 'error') or not self.dealt_in: continue
+            if t in ('bid', 'trump', 'play') and msg['seat'] == self.seat: continue
+            if t != kind:
+                raise ConnectionError(f"expected {kind} from the server, got {t}")
+            return msg
+
+    def reset_round(self):
+        super().reset_round()
+        if self.deal is None:
+            # The frame loop keeps running while the server has not dealt
+            for p in self.players: p.status = ""
+            self.message = "Waiting for the next deal..."
+            self.start_timer(DEAL_POLL, self.reset_round)
+
+    def deal_hands(self):
+        # Empty hands until the deal arrives (see reset_round)
+        msg = self.deal = self.next_message('deal', block=False)
+        if msg is None: return [0, 0, 0, 0]
+        self.dealer_idx = self.local(msg['dealer'])
+        scores = msg['scores']  # includes any round that ended before we were dealt in
+        self.team_a_score, self.team_b_score = scores[self.seat % 2], scores[1 - self.seat % 2]
+        hand = msg['hand']
+        rest = bb.cards_of(bb.FULL_DECK & ~hand)
+        return [hand] + [bb.hand_mask(rest[i:i + 13]) for i in (0, 13, 26)]
+
+    def animate_deal(self):
+        if self.deal is not None: super().animate_deal()
+
+    def decision(self, kind, player):
+        msg = self.next_message(kind)
+        if self.local(msg['seat']) != player.id:
+            raise ConnectionError(f"server has seat {msg['seat']} deciding, expected {player.id}")
+        return msg
+
+    def bot_make_bid(self, player):
+        return self.decision('bid', player)['bid']
+
+    def bot_pick_trump(self, player):
+        return SUITS[self.decision('trump', player)['suit']]
+
+    def bot_play_card(self, player):
+        return CARDS[self.decision('play', player)['card']]
+
+    def execute_play_card(self, p_idx, card):
+        player = self.players[p_idx]
+        if not player.mask >> card.code & 1:
+            # Trade places with one of the player's stand-ins; both are face down
+            holder = next(p for p in self.players[1:] if p.mask >> card.code & 1)
+            stand_in = player.hand[0]
+            player.set_hand([card if c is stand_in else c for c in player.hand])
+            holder.set_hand([stand_in if c is card else c for c in holder.hand])
+            (x, y), (sx, sy) = (card.x, card.y), (stand_in.x, stand_in.y)
+            card.set_pos(sx, sy)
+            stand_in.set_pos(x, y)
+        super().execute_play_card(p_idx, card)
+
+    def human_bid(self, bid):
+        self.client.send({'op': 'bid', 'bid': bid})
+        super().human_bid(bid)
+
+    def human_trump(self, suit):
+        self.client.send({'op': 'trump', 'suit': SUITS.index(suit)})
+        super().human_trump(suit)
+
+    def human_play(self, card):
+        self.client.send({'op': 'play', 'card': card.code})
+        super().human_play(card)
+
 if __name__ == "__main__":
-    game = TarneebGame()
+    import argparse
+    parser = argparse.ArgumentParser(description="Tarneeb")
+    parser.add_argument('--seed', type=int, default=None, help="seed the deals")
+    parser.add_argument('--log', default=None, help="append every finished round to this game log")
+    parser.add_argument('--trace', default=None, help="write a frame trace (Chrome trace format) on exit")
+    parser.add_argument('--save', default=None, help="resume the game saved here, if any, and save it on exit")
+    parser.add_argument('--startup', nargs='?', const='-', metavar='LOG',
+                        help="print startup timings and quit after the first frame; "
+                             "also append them to LOG (JSON lines) if given")
+    parser.add_argument('--bot', default=None, help="policy for the bot seats, e.g. ismcts (see policies.py)")
+    parser.add_argument('--profile', action='store_true', help="start with the frame profiler overlay (F3)")
+    parser.add_argument('--connect', metavar='HOST[:PORT]', help="play at a table on a game server (server.py)")
+    parser.add_argument('--table', default='default', help="table to join with --connect")
+    parser.add_argument('--seat', type=int, default=None, help="seat to take with --connect (default: any free)")
+    args = parser.parse_args()
+    if args.bot is not None:
+        from policies import POLICIES
+        if args.bot not in POLICIES:
+            parser.error(f"unknown policy '{args.bot}' (choose from {', '.join(POLICIES)})")
+    if args.connect:
+        from server import PORT, BlockingClient
+        host, _, port = args.connect.partition(':')
+        game = NetGame(BlockingClient(host, int(port or PORT), args.table, args.seat))
+    else:
+        game = TarneebGame(args.seed, args.log, trace_path=args.trace, save_path=args.save, bot=args.bot)
+    if args.profile: game.prof.toggle_overlay()
+    game.startup_log = args.startup
     game.run()
\ No newline at end of file
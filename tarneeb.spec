@@ -5,7 +5,7 @@ a = Analysis(
     ['tarneeb.py'],
     pathex=[],
     binaries=[],
-    datas=[],
+    datas=[('bid_table.npz', '.'), ('fonts', 'fonts')],
     hiddenimports=[],
     hookspath=[],
     hooksconfig={},
@@ -26,7 +26,7 @@ exe = EXE(
     debug=False,
     bootloader_ignore_signals=False,
     strip=False,
-    upx=True,
+    upx=False,  # decompressing UPX-packed libraries slows every start
     upx_exclude=[],
     runtime_tmpdir=None,
     console=True,
@@ -0,0 +1,22 @@
+import numpy as np
+
+from animation import Animator
+
+def test_move_lands_and_calls_back():
+    a = Animator(4)
+    landed = []
+    a.move([0, 1], [(10, 20), (30, 40)], 100, on_done=lambda: landed.append(True))
+    assert a.step(50) and not landed
+    assert not a.step(60)
+    assert landed == [True]
+    assert np.array_equal(a.pos[:2], [(10, 20), (30, 40)])
+
+def test_place_every_moving_slot_mid_motion():
+    a = Animator(4)
+    landed = []
+    a.move([0, 1], [(10, 20), (30, 40)], 100, on_done=lambda: landed.append(True))
+    a.place(0, 0, 0)
+    a.place(1, 0, 0)
+    assert not a.step(16)
+    assert landed == [True]
+    assert np.array_equal(a.pos[:2], [(0, 0), (0, 0)])
@@ -0,0 +1,20 @@
+import os
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+
+import numpy as np
+
+import batch
+
+def test_batch_matches_scalar_rules():
+    assert batch.validate(50000, seed=1) == 50000
+
+def test_batch_matches_game_window_rules():
+    assert batch.validate_game_rules(5000, seed=2) == 5000
+
+def test_ranks_and_suits_form():
+    cards, leaders, trumps = batch.random_tricks(1000, seed=3)
+    winners, col = batch.resolve_codes(cards, leaders, trumps)
+    w, ranks, suits = batch.resolve_tricks_full(cards % 13 + 2, cards // 13, leaders, trumps)
+    rows = np.arange(len(col))
+    assert np.array_equal(w, winners)
+    assert np.array_equal(suits * 13 + ranks - 2, cards[rows, col])
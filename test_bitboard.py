@@ -0,0 +1,53 @@
+import random
+
+import bitboard as bb
+from bitboard import SUITS
+
+# Every mask operation against the same question asked of a plain list of
+# (rank, suit) cards, as the UI holds them
+
+def list_hands(n=500, seed=0):
+    rng = random.Random(seed)
+    deck = [(rank, suit) for suit in SUITS for rank in range(2, 15)]
+    for _ in range(n):
+        yield rng.sample(deck, rng.randint(0, 13))
+
+def mask_of(hand):
+    return bb.hand_mask(bb.make_card(rank, SUITS.index(suit)) for rank, suit in hand)
+
+def as_list(codes):
+    return [(bb.RANK_OF[c], SUITS[bb.SUIT_OF[c]]) for c in codes]
+
+def ui_sorted(hand):
+    # Player.sort_hand
+    return sorted(hand, key=lambda c: (c[1], c[0]))
+
+def test_masks_match_card_lists():
+    for hand in list_hands():
+        check(hand)
+
+def check(hand):
+    mask = mask_of(hand)
+    codes = bb.cards_of(mask)
+    assert as_list(codes) == sorted(hand, key=lambda c: (SUITS.index(c[1]), c[0]))
+    assert as_list(bb.sorted_cards(mask)) == ui_sorted(hand)
+    assert bb.suit_counts(mask) == [sum(1 for _, s in hand if s == suit) for suit in SUITS]
+    for lead in range(4):
+        follow = [c for c in hand if c[1] == SUITS[lead]]
+        assert bb.valid_mask(mask, lead) == mask_of(follow or hand)
+        assert bb.has_suit(mask, lead) == bool(follow)
+        assert bb.top_card(mask, lead) == (bb.make_card(max(follow)[0], lead) if follow else -1)
+        assert bb.bottom_card(mask, lead) == (bb.make_card(min(follow)[0], lead) if follow else -1)
+    assert bb.valid_mask(mask, None) == mask
+    assert bb.hand_strength(mask) == sum(r * r if r >= 10 else r for r, _ in hand)
+    if hand:
+        # A stable sort by rank of the UI's hand: ties go to the later card for
+        # the highest and the earlier one for the lowest
+        by_rank = sorted(ui_sorted(hand), key=lambda c: c[0])
+        assert bb.highest(mask) == mask_of([by_rank[-1]]).bit_length() - 1
+        assert bb.lowest(mask) == mask_of([by_rank[0]]).bit_length() - 1
+
+def test_card_names():
+    assert bb.card_name(bb.make_card(14, 0)) == 'A♠'
+    assert bb.card_name(bb.make_card(10, 3)) == '10♦'
+    assert bb.hand_mask(bb.DECK) == bb.FULL_DECK
@@ -0,0 +1,71 @@
+import random
+
+from bitboard import SUIT_MASKS, SUIT_OF, cards_of, hand_mask
+from dds import DoubleDummy
+from engine import TarneebEngine, STATE_PLAYING, trick_winner
+
+# The solver against plain minimax over every legal card, on endgames small
+# enough to enumerate, with and without a trick in progress
+
+def legal(hand, trick):
+    return cards_of(hand & SUIT_MASKS[SUIT_OF[trick[0][1]]] or hand if trick else hand)
+
+def brute(hands, leader, trump, trick=()):
+    # Tricks for team A from here, everyone playing perfectly
+    if len(trick) == 4:
+        winner, _ = trick_winner(trick, trump)
+        won = winner % 2 == 0
+        return won + (brute(hands, winner, trump) if hands[winner] else 0)
+    seat = (leader + len(trick)) % 4
+    values = []
+    for c in legal(hands[seat], trick):
+        h = list(hands)
+        h[seat] &= ~(1 << c)
+        values.append(brute(h, leader, trump, trick + ((seat, c),)))
+    return max(values) if seat % 2 == 0 else min(values)
+
+def random_endgame(rng, tricks, in_trick):
+    deck = list(range(52))
+    rng.shuffle(deck)
+    hands = [hand_mask(deck[i * tricks:(i + 1) * tricks]) for i in range(4)]
+    leader = rng.randrange(4)
+    trick = ()
+    for j in range(in_trick):
+        seat = (leader + j) % 4
+        c = rng.choice(legal(hands[seat], trick))
+        hands[seat] &= ~(1 << c)
+        trick += ((seat, c),)
+    return hands, leader, trick
+
+def test_solve_matches_brute_force():
+    rng = random.Random(5)
+    for _ in range(150):
+        hands, leader, trick = random_endgame(rng, rng.choice((1, 2, 3, 4)), rng.randrange(4))
+        trump = rng.choice((None, 0, 1, 2, 3))
+        assert DoubleDummy(trump).solve(hands, leader, trick) == brute(hands, leader, trump, trick)
+
+def test_score_moves_match_brute_force():
+    rng = random.Random(6)
+    for _ in range(80):
+        hands, leader, trick = random_endgame(rng, rng.choice((2, 3)), rng.randrange(4))
+        trump = rng.randrange(4)
+        seat = (leader + len(trick)) % 4
+        scores = DoubleDummy(trump).score_moves(hands, leader, trick)
+        n = max(h.bit_count() for h in hands)  # tricks left, the one in progress included
+        assert sorted(scores) == legal(hands[seat], trick)
+        for c, v in scores.items():
+            h = list(hands)
+            h[seat] &= ~(1 << c)
+            a = brute(h, leader, trump, trick + ((seat, c),))
+            assert v == (a if seat % 2 == 0 else n - a)
+
+def test_engine_positions_mid_trick():
+    for seed in range(12):
+        e = TarneebEngine(seed)
+        while e.state != STATE_PLAYING:
+            e.step()
+        # Three whole tricks left, after 0-3 cards of the trick before them
+        while sum(h.bit_count() for h in e.hands) > 12 + seed % 4:
+            e.step()
+        hands, leader, trick = list(e.hands), e.trick_starter, tuple(e.current_trick)
+        assert DoubleDummy(e.trump_suit).solve(hands, leader, trick) == brute(hands, leader, e.trump_suit, trick)
@@ -0,0 +1,54 @@
+import asyncio
+
+import numpy as np
+
+from decisions import BatchedPolicy, DecisionService, play_games
+from engine import TarneebEngine, STATE_BIDDING, STATE_PLAYING, STATE_ROUND_END
+from learned import Evaluator, bid_observation, init_weights, play_observation
+
+def model(seed=0):
+    rng = np.random.default_rng(seed)
+    return Evaluator({kind: init_weights(kind, 64, rng) for kind in ('play', 'bid')})
+
+def decisions(games=30, seed=0):
+    # (kind, observation, engine state) at every decision of a few rounds
+    out = []
+    for i in range(games):
+        e = TarneebEngine(seed + i)
+        while e.state != STATE_ROUND_END:
+            seat = e.to_act()
+            if e.state == STATE_BIDDING and not e.passed[seat] and e.passed.count(False) > 1:
+                out.append(('bid', bid_observation(e, seat), e.highest_bid, None))
+            elif e.state == STATE_PLAYING:
+                out.append(('play', play_observation(e, seat), None, e.legal_mask(seat)))
+            e.step()
+    return out
+
+def test_batched_decisions_match_one_at_a_time():
+    m = model()
+    cases = decisions()
+    service = DecisionService(m, max_batch=64)
+    try:
+        futures = [service.submit(kind, obs) for kind, obs, _, _ in cases]
+        actions = [f.result(timeout=30) for f in futures]
+    finally:
+        service.close()
+    assert service.stats()['batches'] < len(cases)
+    for (kind, obs, highest, legal), action in zip(cases, actions):
+        if kind == 'play':
+            assert action == m.play_one(obs)
+            assert legal >> action & 1
+        else:
+            assert action == m.bid_one(obs)
+            assert action == 0 or highest < action <= 13
+
+def test_games_on_one_event_loop_stay_legal():
+    # engine.step() raises on an illegal bid or card
+    service = DecisionService(model(1), max_batch=32)
+    try:
+        n = asyncio.run(play_games(BatchedPolicy(service), 40, 1, seed=5))
+    finally:
+        service.close()
+    stats = service.stats()
+    assert n == stats['decided'] > 0
+    assert stats['mean_batch'] > 1
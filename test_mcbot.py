@@ -0,0 +1,47 @@
+import random
+import time
+
+from engine import BotPolicy, TarneebEngine, STATE_PLAYING
+from mcbot import MonteCarloPolicy, Position, sample_hands, score_sample
+
+BUDGET = 0.05
+SLACK = 0.02  # one sample's rollouts are checked move by move
+
+def playing(policy, seed=0):
+    engine = TarneebEngine(seed, [policy, BotPolicy(), BotPolicy(), BotPolicy()])
+    while engine.state != STATE_PLAYING:
+        engine.step()
+    return engine
+
+def move_times(policy, engine, moves=4):
+    times = []
+    while engine.state == STATE_PLAYING and len(times) < moves:
+        if engine.turn_idx == 0 and engine.legal_mask(0).bit_count() > 1:
+            t0 = time.perf_counter()
+            engine.step()
+            times.append(time.perf_counter() - t0)
+        else:
+            engine.step()
+    return times
+
+def test_moves_keep_to_the_budget():
+    policy = MonteCarloPolicy(budget=BUDGET, seed=1)
+    times = move_times(policy, playing(policy))
+    assert times and max(times) < BUDGET + SLACK
+
+def test_first_move_with_workers_keeps_to_the_budget():
+    policy = MonteCarloPolicy(budget=BUDGET, workers=1, seed=1)
+    try:
+        times = move_times(policy, playing(policy), moves=2)
+    finally:
+        policy.close()
+    assert times and max(times) < BUDGET + SLACK
+    assert policy.last_search.samples > 0
+
+def test_sample_stops_at_the_deadline():
+    engine = playing(BotPolicy())
+    pos = Position.from_engine(engine, engine.turn_idx)
+    hands = sample_hands(pos, random.Random(0))
+    moves = pos.legal_moves()
+    assert len(score_sample(pos, hands, moves)) == len(moves)
+    assert score_sample(pos, hands, moves, deadline=time.perf_counter()) is None
@@ -0,0 +1,27 @@
+import sys
+import threading
+
+from profiler import Profiler
+
+def test_spans_from_other_threads_are_not_lost():
+    # Worker threads record spans while the main thread closes frames
+    prof = Profiler(history=100000)
+    prof.toggle_overlay()
+    prof.frame()
+    workers, spans = 4, 20000
+    def work():
+        for _ in range(spans):
+            prof.record('bot', 0, 1000)
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+        threads = [threading.Thread(target=work) for _ in range(workers)]
+        for t in threads: t.start()
+        while any(t.is_alive() for t in threads):
+            prof.frame()
+        for t in threads: t.join()
+    finally:
+        sys.setswitchinterval(interval)
+    prof.frame()
+    assert prof.count < len(prof.frames)
+    assert round(prof.spans['bot'][:prof.count].sum() * 1e3) == workers * spans
@@ -0,0 +1,39 @@
+import pytest
+
+from replay import LogWriter, Replay, RoundRecord, read_record_at, read_records, record_games, record_offsets
+
+def test_write_read_verify(tmp_path):
+    path = str(tmp_path / 'game.log')
+    engine = record_games(path, 20, seed=3)
+    records = list(read_records(path))
+    assert len(records) == 20 == len(record_offsets(path))
+    for record in records:
+        replay = Replay(record)
+        assert tuple(replay.engine.tricks_won) == record.tricks
+        assert replay.engine.last_delta == record.delta
+    assert records[-1].scores == (engine.team_a_score, engine.team_b_score)
+    assert read_record_at(path, record_offsets(path)[7]).pack() == records[7].pack()
+    assert [r.pack() for r in read_records(path, 15)] == [r.pack() for r in records[15:]]
+
+def test_append_after_torn_record(tmp_path):
+    path = str(tmp_path / 'game.log')
+    record_games(path, 5, seed=1)
+    records = list(read_records(path))
+    with open(path, 'ab') as f:
+        f.write(records[0].pack()[:30])  # a crash mid-write
+    assert len(record_offsets(path)) == 5
+    with LogWriter(path) as log:
+        for record in records[:2]:
+            log.write(record)
+    assert [r.pack() for r in read_records(path)] == [r.pack() for r in records + records[:2]]
+    for record in read_records(path):
+        Replay(record, snapshot_every=0)
+
+def test_short_record_is_rejected(tmp_path):
+    path = str(tmp_path / 'game.log')
+    record_games(path, 1, seed=2)
+    r = next(read_records(path))
+    short = RoundRecord(r.seed, r.dealer, r.redeals, r.hands, r.bid_winner, r.bid, r.trump,
+                        r.tricks, r.delta, r.scores, r.bids[:1], r.plays)
+    with pytest.raises(ValueError):
+        Replay(short)
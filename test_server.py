@@ -0,0 +1,33 @@
+import asyncio
+import json
+
+from server import TableServer, encode, simulate
+
+async def errors(reader):
+    # Skips the table's broadcasts up to our next error reply
+    while True:
+        msg = json.loads(await reader.readline())
+        if msg['t'] == 'error': return msg['msg']
+
+def test_malformed_messages_keep_the_seat():
+    async def main():
+        server = TableServer(bot_delay=0.05, seed=1)
+        srv = await server.start('127.0.0.1', 0)
+        port = srv.sockets[0].getsockname()[1]
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+        writer.write(encode({'op': 'join', 'table': 't', 'seat': 2}))
+        assert json.loads(await reader.readline())['t'] == 'joined'
+        for line in (b'[1]\n', b'"x"\n', b'7\n', b'null\n', b'{not json\n'):
+            writer.write(line)
+            assert await errors(reader) == "bad message"
+        # Still connected and seated
+        writer.write(encode({'op': 'join', 'table': 't'}))
+        assert await errors(reader) == "already seated"
+        assert server.tables['t'].seats[2] is not None
+        writer.close()
+        srv.close()
+    asyncio.run(main())
+
+def test_simulated_tables_finish_their_rounds():
+    rounds, _ = asyncio.run(simulate(3, 2, 2, seed=4))
+    assert rounds == 3 * 2 * 2
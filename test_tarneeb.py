@@ -0,0 +1,91 @@
+import os
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+
+import pytest
+
+import bitboard as bb
+from bitboard import SUITS
+from engine import TarneebEngine, STATE_ANIMATING, STATE_CHOOSE_TRUMP, STATE_PLAYING, bot_play, bot_trump
+from snapshot import load, save
+from tarneeb import TarneebGame, NetGame, CARDS
+
+# The window's game logic, driven directly (no frame loop): cards are played
+# and tricks scored as the callbacks would once the animations finish.
+
+@pytest.fixture
+def game():
+    g = TarneebGame(seed=11)
+    yield g
+    g.bot_pool.shutdown(wait=False, cancel_futures=True)
+
+def test_ui_bot_plays_like_engine_bot(game):
+    for trump in range(4):
+        game.reset_round()
+        game.highest_bid, game.bid_winner = 7, trump
+        game.trump_suit = SUITS[trump]
+        game.start_play_phase(trump)
+        leads = 0
+        while game.players[0].hand:
+            for _ in range(4):
+                seat = game.turn_idx
+                player = game.players[seat]
+                trick = [(s, c.code) for s, c in game.current_trick]
+                expected = bot_play(player.mask, trick, trump, seat)
+                assert game.bot_play_card(player).code == expected, (trick, seat)
+                leads += not trick
+                game.execute_play_card(seat, CARDS[expected])
+                game.turn_idx = (seat + 1) % 4
+            game.finish_trick()
+        assert leads == 13
+
+class FakeClient:
+    # Server messages fed by the test instead of read off a socket
+    def __init__(self, seat):
+        self.seat = seat
+        self.state = {'scores': [0, 0]}
+        self.events = []
+        self.sent = []
+
+    def next_event(self, block=True):
+        if self.events: return self.events.pop(0)
+        assert not block, "the frame loop would freeze"
+        return None
+
+    def send(self, msg):
+        self.sent.append(msg)
+
+def test_net_game_joined_mid_round_waits_for_deal():
+    client = FakeClient(seat=1)
+    # The tail of a round already under way when we joined
+    client.events += [{'t': 'play', 'seat': 0, 'card': 12}, {'t': 'round', 'scores': [7, -9]}]
+    g = NetGame(client)
+    try:
+        assert g.state == STATE_ANIMATING and g.deal is None and g.timer_action
+        hand = bb.hand_mask(range(13, 26))
+        client.events.append({'t': 'deal', 'dealer': 3, 'hand': hand, 'scores': [7, -9]})
+        g.timer_action()  # the poll, as the frame loop would run it
+        assert g.players[0].mask == hand and g.dealer_idx == 2
+        assert (g.team_a_score, g.team_b_score) == (-9, 7)
+    finally:
+        g.bot_pool.shutdown(wait=False, cancel_futures=True)
+
+def test_restore_bot_choosing_trump(game):
+    # Seats 0, 2 and 3 pass; seat 1, a bot, wins the bid and is to pick trump
+    e = TarneebEngine(5)
+    e.current_bidder_idx = 0
+    for bid in (0, 8, 0, 0):
+        e.step(bid)
+    e.step()
+    assert e.state == STATE_CHOOSE_TRUMP and e.bid_winner == 1
+    game.restore(load(save(e)))
+    assert game.state == STATE_CHOOSE_TRUMP
+    assert [p.status for p in game.players] == ["PASS", "BID: 8", "PASS", "PASS"]
+    assert game.to_engine().passed == e.passed
+
+    game.process_trump()
+    assert game.bot_job_seat == 1
+    game.bot_job.result()
+    game.process_trump()
+    assert game.state == STATE_PLAYING and game.turn_idx == 1
+    assert game.trump_suit == SUITS[bot_trump(e.hands[1])]
+    assert game.round_bids == e.bid_log
@@ -0,0 +1,120 @@
+import argparse
+import math
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from engine import TarneebEngine
+from policies import POLICIES, make_policy
+
+# Bot-versus-bot tournaments: seeded deals are split into fixed-size shards,
+# each shard is played in a worker process and the per-shard sums are merged.
+# Shard seeds derive only from the master seed and shard index, so results do
+# not depend on the number of workers.
+
+TEAMS = {'A': (0, 2), 'B': (1, 3)}
+
+def shard_seeds(master_seed, shards):
+    rng = random.Random(master_seed)
+    return [rng.getrandbits(63) for _ in range(shards)]
+
+def empty_stats():
+    stats = {'rounds': 0, 'redeals': 0, 'diff_sum': 0, 'diff_sq': 0}
+    for t in TEAMS:
+        stats[t] = {'bids': 0, 'made': 0, 'over_sum': 0, 'over_sq': 0, 'points': 0}
+    return stats
+
+def play_shard(job):
+    # job = (seat policy names, rounds, shard seed); runs in a worker process
+    seats, rounds, seed = job
+    policies = [make_policy(name, seed + i) for i, name in enumerate(seats)]
+    engine = TarneebEngine(seed, policies)
+    stats = empty_stats()
+    for _ in range(rounds):
+        a0, b0 = engine.team_a_score, engine.team_b_score
+        res = engine.play_round()
+        da, db = engine.team_a_score - a0, engine.team_b_score - b0
+
+        team = 'A' if res['bid_winner'] in TEAMS['A'] else 'B'
+        t = stats[team]
+        tricks = sum(res['tricks'][i] for i in TEAMS[team])
+        over = tricks - res['bid']
+        t['bids'] += 1
+        t['made'] += over >= 0
+        t['over_sum'] += over
+        t['over_sq'] += over * over
+        stats['A']['points'] += da
+        stats['B']['points'] += db
+        stats['rounds'] += 1
+        stats['redeals'] += res['redeals']
+        stats['diff_sum'] += da - db
+        stats['diff_sq'] += (da - db) ** 2
+        engine.next_round()
+    return stats
+
+def merge(total, part):
+    for k, v in part.items():
+        if isinstance(v, dict):
+            merge(total[k], v)
+        else:
+            total[k] += v
+    return total
+
+def mean_ci(s, sq, n, z=1.96):
+    # Mean and half-width of the normal-approximation confidence interval
+    if n == 0: return 0.0, 0.0
+    mean = s / n
+    var = (sq - n * mean * mean) / (n - 1) if n > 1 else 0.0
+    return mean, z * math.sqrt(max(var, 0.0) / n)
+
+def run_tournament(seats, rounds, master_seed=0, workers=None, shard_size=500):
+    shards = (rounds + shard_size - 1) // shard_size
+    seeds = shard_seeds(master_seed, shards)
+    jobs = [(tuple(seats), min(shard_size, rounds - i * shard_size), seeds[i]) for i in range(shards)]
+    total = empty_stats()
+    if workers == 1:
+        for job in jobs:
+            merge(total, play_shard(job))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for part in pool.map(play_shard, jobs):
+                merge(total, part)
+    return total
+
+def summarize(stats):
+    n = stats['rounds']
+    lines = [f"Rounds: {n}  (all-pass redeals: {stats['redeals']})"]
+    for team, seats in TEAMS.items():
+        t = stats[team]
+        rate = t['made'] / t['bids'] if t['bids'] else 0.0
+        over, over_ci = mean_ci(t['over_sum'], t['over_sq'], t['bids'])
+        lines.append(f"Team {team} (seats {seats[0]},{seats[1]}): won bid {t['bids']}x, "
+                     f"made {rate:.1%}, tricks vs bid {over:+.2f} ± {over_ci:.2f}, "
+                     f"points {t['points']}")
+    diff, diff_ci = mean_ci(stats['diff_sum'], stats['diff_sq'], n)
+    lines.append(f"Score differential A-B per round: {diff:+.3f} ± {diff_ci:.3f} (95% CI)")
+    return "\n".join(lines)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bot-versus-bot Tarneeb tournament")
+    parser.add_argument('--seats', default='bot,bot,bot,bot',
+                        help=f"four comma separated policies ({', '.join(POLICIES)})")
+    parser.add_argument('--rounds', type=int, default=100000)
+    parser.add_argument('--seed', type=int, default=0, help="master seed")
+    parser.add_argument('--workers', type=int, default=None, help="default: one per core")
+    parser.add_argument('--shard-size', type=int, default=500)
+    args = parser.parse_args()
+
+    seats = args.seats.split(',')
+    if len(seats) != 4:
+        parser.error("--seats needs exactly four policies")
+    for name in seats:
+        if name not in POLICIES:
+            parser.error(f"unknown policy '{name}' (choose from {', '.join(POLICIES)})")
+
+    t0 = time.perf_counter()
+    stats = run_tournament(seats, args.rounds, args.seed, args.workers, args.shard_size)
+    dt = time.perf_counter() - t0
+    print(summarize(stats))
+    print(f"{args.rounds / dt:.0f} rounds/s with {args.workers or os.cpu_count()} workers")